@@ -0,0 +1,565 @@
+"""Module with the audio backends of Rhasspy Desktop Satellite.
+
+The recorder and the player use PyAudio by default. The other backends are
+stand-ins for :class:`pyaudio.PyAudio` with a single device:
+
+- The file input backend records the audio of a WAV file or of a WAV stream
+  on the standard input, at real-time speed or faster.
+- The null output backend discards the played audio.
+- The file output backend writes the played audio to WAV files.
+
+The stand-ins pace their streams like audio devices at a configurable speed
+relative to real time, so recordings can be replayed deterministically and
+satellites can be load-tested without audio hardware.
+
+The stand-ins don't need PyAudio, so PyAudio is only imported when a
+recorder or player uses it.
+"""
+import os
+import sys
+import threading
+import time
+import wave
+
+from rhasspy_desktop_satellite.dsp import create_dsp
+
+PYAUDIO = 'pyaudio'
+FILE = 'file'
+NULL = 'null'
+INPUT_BACKENDS = (PYAUDIO, FILE)
+OUTPUT_BACKENDS = (PYAUDIO, NULL, FILE)
+
+STDIN = '-'
+DEFAULT_RATE = 48000
+MAX_CHANNELS = 2
+READ_FRAMES = 4096  # frames read from a WAV file at once
+UINT8_BIAS = 128  # offset of unsigned 8-bit samples, as in WAV files and paUInt8
+
+# The PortAudio sample formats and stream callback flags, with the values of
+# PyAudio.
+PA_FLOAT32 = 1
+PA_INT32 = 2
+PA_INT24 = 4
+PA_INT16 = 8
+PA_INT8 = 16
+PA_UINT8 = 32
+PA_CONTINUE = 0
+PA_INPUT_OVERFLOW = 2
+PA_INPUT_OVERFLOWED = -9981  # PortAudio error of a read after an input overflow
+SAMPLE_SIZES = {PA_FLOAT32: 4, PA_INT32: 4, PA_INT24: 3, PA_INT16: 2, PA_INT8: 1, PA_UINT8: 1}
+
+
+def device_info(index, name, input_channels=0, output_channels=0, rate=DEFAULT_RATE):
+    """Return the information of an audio device like PyAudio does."""
+    return {'index': index, 'name': name, 'hostApi': 0,
+            'maxInputChannels': input_channels, 'maxOutputChannels': output_channels,
+            'defaultSampleRate': float(rate)}
+
+
+class AudioBackend:
+    """This class is the base class of the stand-ins for
+    :class:`pyaudio.PyAudio`.
+
+    Attributes:
+        devices (list): The information of the audio devices.
+        speed (float): The speed of the streams relative to real time. 0
+            runs as fast as possible.
+    """
+
+    stream_class = None
+
+    def __init__(self, devices, speed=1.0):
+        """Initialize an audio backend.
+
+        Args:
+            devices (list): The information of the audio devices.
+            speed (float, optional): The speed of the streams relative to
+                real time. Defaults to 1.
+        """
+        self.devices = devices
+        self.speed = speed
+
+    def get_device_count(self):
+        """Return the number of audio devices."""
+        return len(self.devices)
+
+    def get_device_info_by_index(self, index):
+        """Return the information of an audio device."""
+        return self.devices[index]
+
+    def get_default_input_device_info(self):
+        """Return the information of the default input device.
+
+        Raises:
+            :exc:`OSError`: If the backend has no input device.
+        """
+        for device in self.devices:
+            if device['maxInputChannels']:
+                return device
+        raise OSError('No Default Input Device Available')
+
+    def get_default_output_device_info(self):
+        """Return the information of the default output device.
+
+        Raises:
+            :exc:`OSError`: If the backend has no output device.
+        """
+        for device in self.devices:
+            if device['maxOutputChannels']:
+                return device
+        raise OSError('No Default Output Device Available')
+
+    def is_format_supported(self, rate, input_device=None, input_channels=None,
+                            input_format=None, output_device=None, output_channels=None,
+                            output_format=None):
+        """Return True if a device supports an audio format, like
+        :meth:`pyaudio.PyAudio.is_format_supported`. The stand-ins convert
+        audio to any format, so they support all of them.
+
+        Raises:
+            :exc:`ValueError`: If the device has too few channels.
+        """
+        # pylint: disable=too-many-arguments,unused-argument
+        if input_device is not None and \
+                input_channels > self.devices[input_device]['maxInputChannels']:
+            raise ValueError('Invalid number of channels')
+        if output_device is not None and \
+                output_channels > self.devices[output_device]['maxOutputChannels']:
+            raise ValueError('Invalid number of channels')
+        return True
+
+    def get_format_from_width(self, width, unsigned=True):
+        """Return the PortAudio sample format for a sample width, like
+        :func:`pyaudio.get_format_from_width`.
+
+        Raises:
+            :exc:`ValueError`: If the sample width is invalid.
+        """
+        if width == 1:
+            return PA_UINT8 if unsigned else PA_INT8
+        formats = {2: PA_INT16, 3: PA_INT24, 4: PA_FLOAT32}
+        if width not in formats:
+            raise ValueError('Invalid width: {}'.format(width))
+        return formats[width]
+
+    def get_sample_size(self, sample_format):
+        """Return the sample width of a PortAudio sample format.
+
+        Raises:
+            :exc:`ValueError`: If the sample format is invalid.
+        """
+        if sample_format not in SAMPLE_SIZES:
+            raise ValueError('Invalid format: {}'.format(sample_format))
+        return SAMPLE_SIZES[sample_format]
+
+    def open(self, *args, **kwargs):
+        """Open an audio stream with the arguments of
+        :meth:`pyaudio.PyAudio.open`."""
+        return self.stream_class(self, *args, **kwargs)
+
+    def terminate(self):
+        """Terminate the backend."""
+
+
+class BackendStream:
+    """This class is the base class of the streams of the audio backends.
+
+    Input streams produce audio paced at the speed of the backend, either
+    from :meth:`read` or from a callback thread. Output streams take as long
+    to write audio as an audio device takes to play it.
+    """
+
+    def __init__(self, audio, rate, channels, format, input=False, output=False,
+                 input_device_index=None, output_device_index=None,
+                 frames_per_buffer=1024, start=True, stream_callback=None):
+        """Initialize a stream with the arguments of
+        :meth:`pyaudio.PyAudio.open`."""
+        # pylint: disable=redefined-builtin,too-many-arguments
+        self.audio = audio
+        self.rate = rate
+        self.channels = channels
+        self.width = audio.get_sample_size(format)
+        self.frame_bytes = self.width * channels
+        self.input = input
+        self.output = output
+        self.frames_per_buffer = frames_per_buffer
+        self.callback = stream_callback
+        self.active = False
+        self.closed = False
+        self.started = 0.0
+        self.produced = 0
+        self.played = 0.0
+        if start:
+            self.start_stream()
+        if input and stream_callback is not None:
+            threading.Thread(target=self.run_callback, daemon=True).start()
+
+    def start_stream(self):
+        """Start the stream, which restarts the clock of the audio."""
+        self.started = time.monotonic()
+        self.produced = 0
+        self.active = True
+
+    def stop_stream(self):
+        """Stop the stream."""
+        self.active = False
+
+    def is_active(self):
+        """Return True if the stream is active."""
+        return self.active
+
+    def is_stopped(self):
+        """Return True if the stream is stopped."""
+        return not self.active
+
+    def get_output_latency(self):
+        """Return the output latency in seconds. Writes take as long as
+        the audio plays, so nothing is left to play after a write."""
+        return 0.0
+
+    def close(self):
+        """Close the stream."""
+        self.active = False
+        self.closed = True
+
+    def wait(self, frames):
+        """Wait until a number of audio frames has been recorded since the
+        stream started at the speed of the backend."""
+        if self.audio.speed > 0:
+            due = self.started + frames / self.rate / self.audio.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def capture(self, num_frames):
+        """Produce the next recorded audio frames.
+
+        Returns:
+            bytearray: The audio frames.
+        """
+        raise NotImplementedError
+
+    def playback(self, frames):
+        """Handle played audio frames."""
+
+    def read(self, num_frames, exception_on_overflow=True):
+        """Read audio frames from an input stream."""
+        self.wait(self.produced + num_frames)
+        self.produced += num_frames
+        return bytes(self.capture(num_frames))
+
+    def write(self, frames, num_frames=None, exception_on_underflow=False):
+        """Write audio frames to an output stream."""
+        now = time.monotonic()
+        self.playback(frames)
+        if num_frames is None:
+            num_frames = len(frames) // self.frame_bytes
+        if self.audio.speed > 0:
+            # Audio written after a pause starts playing right away.
+            self.played = max(self.played, now) + num_frames / self.rate / self.audio.speed
+            time.sleep(self.played - now)
+
+    def run_callback(self):
+        """Deliver the audio of an input stream to the stream callback."""
+        while not self.closed:
+            if not self.active:
+                time.sleep(0.01)
+                continue
+            chunk = self.read(self.frames_per_buffer)
+            if self.closed:
+                break
+            if self.active:
+                _, flag = self.callback(chunk, self.frames_per_buffer, {}, 0)
+                if flag != PA_CONTINUE:
+                    self.active = False
+
+
+class FileInputStream(BackendStream):
+    """This class represents an input stream of the file input backend."""
+
+    def capture(self, num_frames):
+        """Return the next audio frames of the recording."""
+        return self.audio.frames(num_frames, self.rate, self.width, self.channels)
+
+
+class FileOutputStream(BackendStream):
+    """This class represents an output stream of the file output backend."""
+
+    def __init__(self, audio, *args, **kwargs):
+        """Initialize a :class:`.FileOutputStream` object and create its WAV
+        file."""
+        super().__init__(audio, *args, **kwargs)
+        self.wav = wave.open(audio.filename(), 'wb')
+        self.wav.setframerate(self.rate)
+        self.wav.setsampwidth(self.width)
+        self.wav.setnchannels(self.channels)
+
+    def playback(self, frames):
+        """Write played audio frames to the WAV file."""
+        self.wav.writeframes(frames)
+
+    def close(self):
+        """Close the stream and its WAV file."""
+        if not self.closed:
+            self.wav.close()
+        super().close()
+
+
+class WavConverter:
+    """This class converts the audio of a WAV file to another audio format.
+
+    The audio is downmixed to mono and copied to every channel of the new
+    format. 8-bit audio is unsigned, like in WAV files and the default
+    8-bit PortAudio format, so it's converted to signed audio for the DSP
+    backend and back.
+    """
+
+    def __init__(self, wav, rate, width, channels, dsp=None):
+        """Initialize a :class:`.WavConverter` object.
+
+        Args:
+            wav (:class:`wave.Wave_read`): The WAV file.
+            rate (int): The sample rate of the new format.
+            width (int): The sample width of the new format.
+            channels (int): The number of channels of the new format.
+            dsp (optional): The DSP backend. Defaults to the default DSP
+                backend.
+        """
+        self.dsp = create_dsp() if dsp is None else dsp
+        self.wav_width = wav.getsampwidth()
+        self.wav_channels = wav.getnchannels()
+        self.width = width
+        self.channels = channels
+        self.resampler = None
+        if wav.getframerate() != rate:
+            self.resampler = self.dsp.resampler(width, 1, wav.getframerate(), rate)
+
+    def convert(self, frames):
+        """Convert audio frames of the WAV file.
+
+        Args:
+            frames (bytes): The audio frames of the WAV file.
+
+        Returns:
+            bytes: The audio frames in the new format.
+        """
+        if self.wav_width == 1:
+            frames = self.dsp.bias(frames, 1, UINT8_BIAS)
+        frames = self.dsp.tomono(frames, self.wav_width, self.wav_channels)
+        frames = self.dsp.lin2lin(frames, self.wav_width, self.width)
+        if self.resampler is not None:
+            frames = self.resampler.convert(frames)
+        if self.width == 1:
+            frames = self.dsp.bias(frames, 1, UINT8_BIAS)
+        return self.dsp.tochannels(frames, self.width, self.channels)
+
+
+class FileInputAudio(AudioBackend):
+    """This class is an input backend that records the audio of a WAV file.
+
+    The position in the file is kept when streams are closed and opened
+    again, so a recording is replayed exactly once unless it loops. After
+    the end of the recording, the input records silence, or nothing at all
+    when it runs as fast as possible.
+
+    Attributes:
+        filename (str): The filename of the WAV file, or '-' for a WAV
+            stream on the standard input.
+        loop (bool): Whether the recording is replayed from the start at
+            the end of the file.
+        finished (bool): Whether the end of the recording was reached.
+    """
+
+    stream_class = FileInputStream
+
+    def __init__(self, filename, speed=1.0, loop=False):
+        """Initialize a :class:`.FileInputAudio` object.
+
+        Args:
+            filename (str): The filename of the WAV file, or '-' for the
+                standard input.
+            speed (float, optional): The speed of the replay relative to real
+                time. 0 replays as fast as possible. Defaults to 1.
+            loop (bool, optional): Whether the recording is replayed from the
+                start at the end of the file. Defaults to False.
+
+        Raises:
+            :exc:`FileNotFoundError`: If the WAV file doesn't exist.
+            :exc:`wave.Error`: If the file isn't a WAV file.
+        """
+        if filename == STDIN:
+            self.wav = wave.open(sys.stdin.buffer, 'rb')
+            name = 'standard input'
+        else:
+            self.wav = wave.open(filename, 'rb')
+            name = os.path.basename(filename)
+        super().__init__([device_info(0, 'File input ({})'.format(name),
+                                      input_channels=MAX_CHANNELS,
+                                      rate=self.wav.getframerate())],
+                         speed)
+        self.filename = filename
+        self.loop = loop and filename != STDIN
+        self.finished = False
+        self._converter = None
+        self._format = None
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+
+    def frames(self, num_frames, rate, width, channels):
+        """Return the next audio frames of the recording in an audio format.
+
+        Args:
+            num_frames (int): The number of audio frames.
+            rate (int): The sample rate.
+            width (int): The sample width in bytes.
+            channels (int): The number of channels.
+
+        Returns:
+            bytearray: The audio frames, padded with silence after the end
+            of the recording, or empty if the backend runs as fast as
+            possible.
+        """
+        length = num_frames * width * channels
+        with self._lock:
+            if self._format != (rate, width, channels):
+                self._format = (rate, width, channels)
+                self._converter = WavConverter(self.wav, rate, width, channels)
+                self._buffer.clear()
+            while len(self._buffer) < length and not self.finished:
+                data = self.wav.readframes(READ_FRAMES)
+                if not data:
+                    if self.loop:
+                        self.wav.rewind()
+                        continue
+                    self.finished = True
+                    break
+                self._buffer += self._converter.convert(data)
+            chunk = self._buffer[:length]
+            del self._buffer[:length]
+        if len(chunk) < length and self.speed > 0:
+            silence = b'\x80' if width == 1 else b'\x00'
+            chunk += silence * (length - len(chunk))
+        return chunk
+
+    def terminate(self):
+        """Close the WAV file."""
+        if self.filename != STDIN:
+            self.wav.close()
+
+
+class NullOutputAudio(AudioBackend):
+    """This class is an output backend that discards the played audio."""
+
+    stream_class = BackendStream
+
+    def __init__(self, rate=DEFAULT_RATE, speed=1.0):
+        """Initialize a :class:`.NullOutputAudio` object.
+
+        Args:
+            rate (int, optional): The default sample rate of the output
+                device. Defaults to 48000.
+            speed (float, optional): The speed of the playback relative to
+                real time. 0 plays as fast as possible. Defaults to 1.
+        """
+        super().__init__([device_info(0, 'Null output', output_channels=MAX_CHANNELS,
+                                      rate=rate)],
+                         speed)
+
+
+class FileOutputAudio(AudioBackend):
+    """This class is an output backend that writes the played audio to WAV
+    files.
+
+    Every output stream writes a new file. Audio messages that are played
+    on the same stream, because they follow each other within the idle
+    timeout of the player, end up in the same file.
+
+    Attributes:
+        directory (str): The directory of the WAV files.
+    """
+
+    stream_class = FileOutputStream
+
+    def __init__(self, directory, rate=DEFAULT_RATE, speed=1.0):
+        """Initialize a :class:`.FileOutputAudio` object.
+
+        Args:
+            directory (str): The directory of the WAV files, which is created
+                if it doesn't exist.
+            rate (int, optional): The default sample rate of the output
+                device. Defaults to 48000.
+            speed (float, optional): The speed of the playback relative to
+                real time. 0 plays as fast as possible. Defaults to 1.
+        """
+        super().__init__([device_info(0, 'File output ({})'.format(directory),
+                                      output_channels=MAX_CHANNELS, rate=rate)],
+                         speed)
+        self.directory = directory
+        self.files = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def filename(self):
+        """Return the filename of a new WAV file."""
+        self.files += 1
+        return os.path.join(self.directory, 'playback-{}-{:04d}.wav'.format(
+            time.strftime('%Y%m%d-%H%M%S'), self.files))
+
+
+def create_input_audio(backend, audio=None, filename=None, speed=1.0, loop=False):
+    """Create the audio backend of the recorder.
+
+    Args:
+        backend (str): 'pyaudio' or 'file'.
+        audio (optional): The PyAudio object, used by the 'pyaudio'
+            backend.
+        filename (str, optional): The WAV file of the 'file' backend, or '-'
+            for the standard input.
+        speed (float, optional): The speed of the 'file' backend relative to
+            real time. Defaults to 1.
+        loop (bool, optional): Whether the 'file' backend loops the
+            recording. Defaults to False.
+
+    Returns:
+        The audio backend.
+
+    Raises:
+        :exc:`ValueError`: If the backend is unknown or misses its file.
+    """
+    if backend == PYAUDIO:
+        return audio
+    if backend == FILE:
+        if not filename:
+            raise ValueError('The file audio input needs a file')
+        return FileInputAudio(filename, speed, loop)
+    raise ValueError('Unknown audio input backend {}'.format(backend))
+
+
+def create_output_audio(backend, audio=None, directory=None, rate=None, speed=1.0):
+    """Create the audio backend of the player.
+
+    Args:
+        backend (str): 'pyaudio', 'null' or 'file'.
+        audio (optional): The PyAudio object, used by the 'pyaudio'
+            backend.
+        directory (str, optional): The directory of the 'file' backend.
+        rate (int, optional): The default sample rate of the 'null' and
+            'file' backends. Defaults to 48000.
+        speed (float, optional): The speed of the 'null' and 'file' backends
+            relative to real time. Defaults to 1.
+
+    Returns:
+        The audio backend.
+
+    Raises:
+        :exc:`ValueError`: If the backend is unknown or misses its directory.
+    """
+    rate = rate or DEFAULT_RATE
+    if backend == PYAUDIO:
+        return audio
+    if backend == NULL:
+        return NullOutputAudio(rate, speed)
+    if backend == FILE:
+        if not directory:
+            raise ValueError('The file audio output needs a directory')
+        return FileOutputAudio(directory, rate, speed)
+    raise ValueError('Unknown audio output backend {}'.format(backend))
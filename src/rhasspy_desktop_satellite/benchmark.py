@@ -0,0 +1,461 @@
+"""Module with benchmarks of the audio processing of Rhasspy Desktop Satellite.
+
+Run it with `python3 -m rhasspy_desktop_satellite.benchmark`. The results
+are written as JSON.
+
+Besides the DSP backends, the benchmarks drive a complete satellite with a
+synthetic stand-in for PyAudio and an in-process MQTT broker, so the
+performance of the audio pipeline can be measured without audio hardware
+or a running Rhasspy.
+"""
+from bisect import bisect_left
+import json
+import logging
+import math
+import sys
+import threading
+import time
+
+from paho.mqtt.client import Client
+import plac
+
+from rhasspy_desktop_satellite.broker import Broker
+from rhasspy_desktop_satellite.capture import CallbackAudioCapture
+from rhasspy_desktop_satellite.config import ServerConfig
+from rhasspy_desktop_satellite.config.mqtt import MQTTConfig
+from rhasspy_desktop_satellite.config.player import PlayerConfig
+from rhasspy_desktop_satellite.config.recorder import RecorderConfig
+from rhasspy_desktop_satellite.dsp import DSP_BACKENDS, create_dsp
+from rhasspy_desktop_satellite.framing import wav_header
+from rhasspy_desktop_satellite.server import SatelliteServer
+from rhasspy_desktop_satellite.site import ASR_START_LISTENING, AUDIO_FRAME, \
+    PLAY_BYTES, PLAY_FINISHED
+from rhasspy_desktop_satellite.synthetic import MARKER, TONE, SyntheticAudio, tone
+
+CHUNK_TIME = 120  # duration of the benchmarked audio chunks (ms)
+SITE = 'benchmark'
+PIPELINE_RATES = (16000, 44100, 48000)
+PIPELINE_CHANNELS = (1, 2)
+PIPELINE_MODES = ((False, False), (True, False), (True, True))  # (wakeup, vad)
+PLAY_RATE = 22050
+START_TIMEOUT = 5  # maximum time for the satellite to subscribe (s)
+SUITES = ('dsp', 'capture', 'pipeline', 'playback')
+
+
+def chunks(frames, rate, width, channels, chunk_time=CHUNK_TIME):
+    """Split audio frames in chunks like the recorder reads them."""
+    chunk_bytes = int(rate * chunk_time / 1000) * width * channels
+    return [frames[index:index + chunk_bytes]
+            for index in range(0, len(frames), chunk_bytes)]
+
+
+def dsp_operations(dsp, rate, width, channels):
+    """Return the benchmarked DSP operations of a backend.
+
+    Each operation is a function that processes a list of audio chunks and
+    returns the processed chunks.
+    """
+    def tomono(audio_chunks):
+        return [dsp.tomono(chunk, width, channels) for chunk in audio_chunks]
+
+    def resample(audio_chunks):
+        resampler = dsp.resampler(width, channels, rate, 16000)
+        return [resampler.convert(chunk) for chunk in audio_chunks]
+
+    def lin2lin(audio_chunks):
+        return [dsp.lin2lin(chunk, width, 4) for chunk in audio_chunks]
+
+    def gain(audio_chunks):
+        return [dsp.gain(chunk, width, 0.8) for chunk in audio_chunks]
+
+    def ulaw(audio_chunks):
+        return [dsp.ulaw2lin(dsp.lin2ulaw(dsp.lin2lin(chunk, width, 2)))
+                for chunk in audio_chunks]
+
+    return {'tomono': tomono, 'resample': resample,
+            'lin2lin': lin2lin, 'gain': gain, 'ulaw': ulaw}
+
+
+def benchmark_dsp(seconds=10, rate=44100, width=2, channels=2, backends=DSP_BACKENDS):
+    """Benchmark the DSP backends.
+
+    Args:
+        seconds (float, optional): The duration of the processed audio.
+            Defaults to 10.
+        rate (int, optional): The sample rate. Defaults to 44100.
+        width (int, optional): The sample width. Defaults to 2.
+        channels (int, optional): The number of channels. Defaults to 2.
+        backends (iterable, optional): The names of the backends to
+            benchmark. Defaults to all backends.
+
+    Returns:
+        dict: For each available backend and operation the processing time
+        per second of audio and the real-time factor. When more than one
+        backend is available, whether each backend produces the same output
+        as the first one.
+    """
+    audio_chunks = chunks(tone(seconds, rate, width, channels), rate, width, channels)
+    results = {'audio': {'seconds': seconds, 'rate': rate, 'width': width,
+                         'channels': channels, 'chunk_time': CHUNK_TIME}}
+    reference = None
+    for backend in backends:
+        try:
+            dsp = create_dsp(backend)
+        except ImportError:
+            results[backend] = None
+            continue
+        backend_results = {}
+        outputs = {}
+        for name, operation in dsp_operations(dsp, rate, width, channels).items():
+            start = time.process_time()
+            outputs[name] = operation(audio_chunks)
+            elapsed = time.process_time() - start
+            backend_results[name] = {
+                'cpu_ms_per_audio_second': 1000 * elapsed / seconds,
+                'realtime_factor': seconds / elapsed if elapsed else None}
+        if reference is None:
+            reference = outputs
+        else:
+            backend_results['parity'] = {name: outputs[name] == reference[name]
+                                         for name in outputs}
+        results[backend] = backend_results
+    return results
+
+
+def benchmark_capture(seconds=10, rate=16000, width=2, channels=1):
+    """Benchmark reading chunks from the ring buffer of the callback capture.
+
+    The PortAudio callback is called directly with the audio, so the
+    benchmark measures the ring buffer and not the audio device. Reading
+    each chunk into a new buffer is compared with reading it into the
+    rotating chunk buffers of the capture. All read chunks are kept, so the
+    number of distinct chunk objects is the number of allocated chunks.
+
+    Args:
+        seconds (float, optional): The duration of the captured audio.
+            Defaults to 10.
+        rate (int, optional): The sample rate. Defaults to 16000.
+        width (int, optional): The sample width. Defaults to 2.
+        channels (int, optional): The number of channels. Defaults to 1.
+
+    Returns:
+        dict: For each way of reading, the number of chunks, the number of
+        allocated chunk buffers and the processing time per second of
+        audio.
+    """
+    chunk_size = int(rate * CHUNK_TIME / 1000)
+    audio_chunks = chunks(tone(seconds, rate, width, channels), rate, width, channels)
+    audio_chunks = [chunk for chunk in audio_chunks if len(chunk) == chunk_size * width * channels]
+    results = {'audio': {'seconds': seconds, 'rate': rate, 'width': width,
+                         'channels': channels, 'chunk_time': CHUNK_TIME}}
+    for name in ('copy', 'rotating'):
+        capture = CallbackAudioCapture(None, rate, width, channels, chunk_size)
+        if name == 'copy':
+            def read():
+                return capture.ring.read(capture.chunk_bytes, timeout=0)
+        else:
+            read = capture.read
+        read_chunks = []
+        start = time.process_time()
+        for chunk in audio_chunks:
+            capture.callback(chunk, chunk_size, {}, 0)
+            read_chunks.append(read())
+        elapsed = time.process_time() - start
+        results[name] = {'chunks': len(read_chunks),
+                         'allocated_chunks': len({id(chunk) for chunk in read_chunks}),
+                         'cpu_ms_per_audio_second': 1000 * elapsed / seconds}
+    return results
+
+
+def percentiles(values):
+    """Summarize latencies.
+
+    Args:
+        values (list): The latencies in seconds.
+
+    Returns:
+        dict: The number of values and the 50th, 90th and 99th percentile
+        and maximum in milliseconds, or `None` without values.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    summary = {'count': len(values)}
+    for percentile in (50, 90, 99):
+        index = max(0, math.ceil(percentile / 100 * len(values)) - 1)
+        summary['p{}'.format(percentile)] = 1000 * values[index]
+    summary['max'] = 1000 * values[-1]
+    return summary
+
+
+class Observer:
+    """This class receives the messages of the benchmarked satellite from
+    the broker and publishes messages to it.
+
+    Attributes:
+        messages (list): The time, topic and payload of every received
+            message.
+    """
+
+    def __init__(self, port):
+        """Initialize an :class:`.Observer` object and connect it to the
+        broker.
+
+        Args:
+            port (int): The port number of the broker on localhost.
+        """
+        self.messages = []
+        self.received = threading.Condition()
+        self.mqtt = Client()
+        self.mqtt.on_message = self.on_message
+        self.mqtt.connect('127.0.0.1', port)
+        self.mqtt.subscribe(AUDIO_FRAME.format('+'))
+        self.mqtt.subscribe(PLAY_FINISHED.format('+'))
+        self.mqtt.loop_start()
+
+    def on_message(self, client, userdata, message):
+        """Keep a received message."""
+        with self.received:
+            self.messages.append((time.monotonic(), message.topic, message.payload))
+            self.received.notify_all()
+
+    def wait_for(self, predicate, timeout):
+        """Wait until a predicate on the received messages is true."""
+        with self.received:
+            return self.received.wait_for(lambda: predicate(self.messages), timeout)
+
+    def publish(self, topic, payload):
+        """Publish a message."""
+        self.mqtt.publish(topic, payload)
+
+    def close(self):
+        """Disconnect from the broker."""
+        self.mqtt.disconnect()
+        self.mqtt.loop_stop()
+
+
+def start_server(config, audio, broker):
+    """Start a satellite in a thread and wait until it subscribed to its
+    topics.
+
+    Returns:
+        tuple: The :class:`.SatelliteServer` object and its thread.
+    """
+    server = SatelliteServer(config, False, logging.getLogger(__name__), audio)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + START_TIMEOUT
+    topic = ASR_START_LISTENING if config.recorder.enabled else PLAY_BYTES.format(config.site)
+    while not broker.subscribed(topic.replace('+', 'id')) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return server, thread
+
+
+def benchmark_recorder(broker, observer, site, seconds, rate, channels, wakeup, vad,
+                       source=TONE, speed=1.0):
+    """Benchmark a recorder configuration of the satellite.
+
+    Every configuration runs with its own site ID, so audio frames that are
+    still underway from the previous configuration aren't counted. Without
+    real-time pacing the chunk queue blocks instead of dropping audio, so
+    the frame rate is the sustained throughput of the pipeline. The
+    synthetic input stops producing audio after the recorded duration, so
+    the throughput is measured against the audio that was actually
+    recorded.
+
+    Returns:
+        dict: The configuration, the sustained audioFrame messages and
+        seconds of published audio per second, the process CPU time per
+        second of recorded audio and the capture to publish latencies. The
+        CPU time includes the broker and the observer in the same process.
+    """
+    audio = SyntheticAudio(source, speed, limit=seconds)
+    recorder_json = {'sampleRate': rate, 'channels': channels, 'wakeup': wakeup,
+                     'queuePolicy': 'drop-oldest' if speed > 0 else 'block'}
+    if vad:
+        # Any VAD settings enable voice activity detection.
+        recorder_json['vad'] = {}
+    recorder = RecorderConfig.from_json(recorder_json)
+    config = ServerConfig(site=site, recorder=recorder,
+                          mqtt=MQTTConfig(host='127.0.0.1', port=broker.port))
+    # With wakeup the site records as soon as it starts, so its audio frames
+    # are counted from before the start.
+    received = len(observer.messages)
+    server, thread = start_server(config, audio, broker)
+    satellite = server.sites[0]
+    start = time.monotonic()
+    cpu_start = time.process_time()
+    if not wakeup:
+        observer.publish(ASR_START_LISTENING, json.dumps({'siteId': site}))
+
+    deadline = start + (seconds / speed if speed > 0 else seconds) * 2 + START_TIMEOUT
+    while audio.produced_seconds < seconds and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # The source is exhausted, so the recorder gets time to queue its last
+    # chunk before recording stops.
+    time.sleep(0.1)
+    # Stop recording and wait until the queued audio is published.
+    server.call_in_loop(satellite.set_record_audio, False)
+    while not satellite.chunk_queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(2 * satellite.frame_time / 1000 + 0.1)
+    cpu = time.process_time() - cpu_start
+    audio_seconds = audio.produced_seconds
+    server.stop()
+    thread.join()
+
+    frames = [message for message in observer.messages[received:]
+              if message[1] == AUDIO_FRAME.format(site)]
+    elapsed = (frames[-1][0] if frames else time.monotonic()) - start
+    latencies = []
+    published = 0
+    for received_time, _, payload in frames:
+        data = memoryview(payload)[44:]
+        published += len(data)
+        for offset in range(0, len(data), satellite.recorder_chunk_bytes):
+            captured = audio.captured.get(MARKER.unpack_from(data, offset)[0])
+            if captured is not None:
+                latencies.append(received_time - captured)
+
+    return {'rate': rate, 'channels': channels, 'wakeup': wakeup, 'vad': vad,
+            'audio_seconds': audio_seconds,
+            'wall_seconds': elapsed,
+            'frames': len(frames),
+            'frames_per_second': len(frames) / elapsed if elapsed else None,
+            'published_audio_seconds': published / (2 * rate * channels),
+            'audio_seconds_per_second': published / (2 * rate * channels) / elapsed
+                                        if elapsed else None,
+            'cpu_ms_per_audio_second': 1000 * cpu / audio_seconds if audio_seconds else None,
+            'dropped_ms': satellite.chunk_queue.dropped_ms,
+            'latency_ms': percentiles(latencies)}
+
+
+def benchmark_pipeline(seconds=5, source=TONE, speed=1.0, rates=PIPELINE_RATES,
+                       channels=PIPELINE_CHANNELS, modes=PIPELINE_MODES):
+    """Benchmark the recorder pipeline from the audio input to the MQTT
+    broker.
+
+    Args:
+        seconds (float, optional): The duration of the recorded audio of each
+            configuration. Defaults to 5.
+        source (str, optional): 'tone', 'noise' or the filename of a WAV
+            file. Defaults to 'tone'.
+        speed (float, optional): The speed of the synthetic audio relative
+            to real time. 0 records as fast as possible. Defaults to 1.
+        rates (iterable, optional): The sample rates to benchmark.
+        channels (iterable, optional): The numbers of channels to benchmark.
+        modes (iterable, optional): The combinations of wakeup and VAD to
+            benchmark.
+
+    Returns:
+        list: The results of :func:`benchmark_recorder` for each
+        configuration.
+    """
+    broker = Broker()
+    broker.start()
+    observer = Observer(broker.port)
+    try:
+        configurations = [(rate, channel_count, wakeup, vad)
+                          for rate in rates
+                          for channel_count in channels
+                          for wakeup, vad in modes]
+        return [benchmark_recorder(broker, observer, '{}{}'.format(SITE, index), seconds,
+                                   *configuration, source, speed)
+                for index, configuration in enumerate(configurations)]
+    finally:
+        observer.close()
+        broker.stop()
+
+
+def benchmark_playback(messages=10, seconds=1, rate=PLAY_RATE, speed=1.0):
+    """Benchmark the playback of playBytes messages.
+
+    The messages are published one after the other, each after the
+    satellite finished playing the previous one.
+
+    Args:
+        messages (int, optional): The number of audio messages. Defaults to
+            10.
+        seconds (float, optional): The duration of each audio message.
+            Defaults to 1.
+        rate (int, optional): The sample rate of the audio messages, which
+            is converted to the rate of the output device. Defaults to 22050.
+        speed (float, optional): The speed of the synthetic output device
+            relative to real time. Defaults to 1.
+
+    Returns:
+        dict: The latencies from publishing an audio message to writing its
+        first samples to the output device and to receiving the playFinished
+        message.
+    """
+    frames = tone(seconds, rate)
+    payload = wav_header(rate, 2, 1, len(frames)) + frames
+    broker = Broker()
+    broker.start()
+    observer = Observer(broker.port)
+    audio = SyntheticAudio(speed=speed)
+    config = ServerConfig(site=SITE, player=PlayerConfig.from_json({}),
+                          mqtt=MQTTConfig(host='127.0.0.1', port=broker.port))
+    server, thread = start_server(config, audio, broker)
+    first_sample = []
+    finished = []
+    finished_topic = PLAY_FINISHED.format(SITE)
+    try:
+        for index in range(messages):
+            request_id = 'benchmark{}'.format(index)
+            published = time.monotonic()
+            observer.publish(PLAY_BYTES.format(SITE).replace('+', request_id), payload)
+            timeout = (seconds / speed if speed > 0 else 0) + START_TIMEOUT
+            if not observer.wait_for(lambda received: any(
+                    topic == finished_topic and request_id in message.decode()
+                    for _, topic, message in received), timeout):
+                continue
+            finished_time = next(received_time
+                                 for received_time, topic, message in observer.messages
+                                 if topic == finished_topic and request_id in message.decode())
+            finished.append(finished_time - published)
+            write = bisect_left(audio.write_times, published)
+            if write < len(audio.write_times):
+                first_sample.append(audio.write_times[write] - published)
+    finally:
+        server.stop()
+        thread.join()
+        observer.close()
+        broker.stop()
+
+    return {'messages': messages, 'seconds': seconds, 'rate': rate,
+            'first_sample_latency_ms': percentiles(first_sample),
+            'finished_latency_ms': percentiles(finished)}
+
+
+def main(output: ('JSON file to write the results to', 'option', 'o') = None,
+         seconds: ('duration of the benchmarked audio in seconds', 'option', 's', float) = 10.0,
+         suites: ('comma-separated benchmark suites: dsp, capture, pipeline, playback',
+                  'option', 'b') = ','.join(SUITES),
+         pipeline_seconds: ('duration of the audio of each pipeline configuration in seconds',
+                            'option', 'p', float) = 5.0,
+         source: ('audio source of the pipeline benchmark: tone, noise or a WAV file',
+                  'option', 'a') = TONE,
+         speed: ('speed of the synthetic audio relative to real time, 0 for as fast as possible',
+                 'option', 'x', float) = 1.0):
+    """Benchmark the audio processing of Rhasspy Desktop Satellite."""
+    suites = suites.split(',')
+    results = {}
+    if 'dsp' in suites:
+        results['dsp'] = benchmark_dsp(seconds)
+    if 'capture' in suites:
+        results['capture'] = benchmark_capture(seconds)
+    if 'pipeline' in suites:
+        results['pipeline'] = benchmark_pipeline(pipeline_seconds, source, speed)
+    if 'playback' in suites:
+        results['playback'] = benchmark_playback(speed=speed)
+    if output:
+        with open(output, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    plac.call(main)
@@ -0,0 +1,184 @@
+"""Module with a minimal in-process MQTT broker.
+
+The broker implements just enough of MQTT 3.1.1 for benchmarks: clients
+connect without authentication, subscribe to topic filters with wildcards
+and publish with QoS 0 or 1. Messages are delivered with QoS 0 and
+retained messages aren't kept. It runs on its own event loop in a
+background thread.
+"""
+import asyncio
+import struct
+import threading
+
+from paho.mqtt.client import topic_matches_sub
+
+CONNECT = 1
+PUBLISH = 3
+SUBSCRIBE = 8
+UNSUBSCRIBE = 10
+PINGREQ = 12
+DISCONNECT = 14
+
+CONNACK = b'\x20\x02\x00\x00'
+PINGRESP = b'\xd0\x00'
+PUBACK = 0x40
+SUBACK = 0x90
+UNSUBACK = 0xb0
+PACKET_ID = struct.Struct('>H')
+
+
+def encode_length(length):
+    """Encode the remaining length of an MQTT packet."""
+    encoded = bytearray()
+    while True:
+        length, digit = divmod(length, 128)
+        encoded.append(digit | (0x80 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+
+def read_string(data, offset):
+    """Read a length-prefixed UTF-8 string from an MQTT packet.
+
+    Returns:
+        tuple: The string and the offset after it.
+    """
+    length = PACKET_ID.unpack_from(data, offset)[0]
+    end = offset + 2 + length
+    return data[offset + 2:end].decode('utf-8'), end
+
+
+class Broker:
+    """This class represents a minimal MQTT broker in a background thread.
+
+    Attributes:
+        host (str): The address the broker listens on.
+        port (int): The port number the broker listens on. Port 0 picks a
+            free port when the broker starts.
+        messages (int): The number of published messages.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        """Initialize a :class:`.Broker` object.
+
+        Args:
+            host (str, optional): The address to listen on. Defaults to
+                '127.0.0.1'.
+            port (int, optional): The port number to listen on. Defaults to
+                a free port.
+        """
+        self.host = host
+        self.port = port
+        self.messages = 0
+        self.loop = None
+        self.server = None
+        self._subscriptions = {}
+        self._thread = None
+        self._started = threading.Event()
+
+    def start(self):
+        """Start the broker and wait until it accepts connections."""
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def run(self):
+        """Run the event loop of the broker."""
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            # Drop the client connections, as a broker that goes down does.
+            for writer in list(self._subscriptions):
+                writer.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+    def stop(self):
+        """Stop the broker."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+
+    async def handle(self, reader, writer):
+        """Handle the packets of a client connection."""
+        self._subscriptions[writer] = set()
+        try:
+            while True:
+                header = await reader.readexactly(1)
+                length = 0
+                for shift in range(0, 28, 7):
+                    digit = (await reader.readexactly(1))[0]
+                    length |= (digit & 0x7f) << shift
+                    if not digit & 0x80:
+                        break
+                data = await reader.readexactly(length)
+                if not self.handle_packet(writer, header[0], data):
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self._subscriptions[writer]
+            writer.close()
+
+    def handle_packet(self, writer, header, data):
+        """Handle a packet of a client.
+
+        Returns:
+            bool: False if the client disconnected.
+        """
+        packet_type = header >> 4
+        if packet_type == CONNECT:
+            writer.write(CONNACK)
+        elif packet_type == PUBLISH:
+            topic, offset = read_string(data, 0)
+            if (header >> 1) & 0x03:
+                packet_id = data[offset:offset + 2]
+                offset += 2
+                writer.write(bytes((PUBACK, 2)) + packet_id)
+            self.publish(topic, data[offset:])
+        elif packet_type == SUBSCRIBE:
+            packet_id, offset = data[:2], 2
+            granted = bytearray()
+            while offset < len(data):
+                topic_filter, offset = read_string(data, offset)
+                self._subscriptions[writer].add(topic_filter)
+                offset += 1
+                granted.append(0)
+            writer.write(bytes((SUBACK,)) + encode_length(2 + len(granted))
+                         + packet_id + bytes(granted))
+        elif packet_type == UNSUBSCRIBE:
+            offset = 2
+            while offset < len(data):
+                topic_filter, offset = read_string(data, offset)
+                self._subscriptions[writer].discard(topic_filter)
+            writer.write(bytes((UNSUBACK, 2)) + data[:2])
+        elif packet_type == PINGREQ:
+            writer.write(PINGRESP)
+        elif packet_type == DISCONNECT:
+            return False
+        return True
+
+    def subscribed(self, topic):
+        """Return True if a client subscribed to a topic."""
+        return any(topic_matches_sub(topic_filter, topic)
+                   for topic_filters in list(self._subscriptions.values())
+                   for topic_filter in list(topic_filters))
+
+    def publish(self, topic, payload):
+        """Deliver a message to the subscribed clients with QoS 0."""
+        self.messages += 1
+        encoded_topic = topic.encode('utf-8')
+        packet = None
+        for writer, topic_filters in self._subscriptions.items():
+            if any(topic_matches_sub(topic_filter, topic) for topic_filter in topic_filters):
+                if packet is None:
+                    body = PACKET_ID.pack(len(encoded_topic)) + encoded_topic + payload
+                    packet = b'\x30' + encode_length(len(body)) + body
+                writer.write(packet)
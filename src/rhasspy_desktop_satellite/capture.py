@@ -0,0 +1,236 @@
+"""Module with the audio capture engines of the recorder."""
+from rhasspy_desktop_satellite.backends import PA_CONTINUE, PA_INPUT_OVERFLOW, \
+    PA_INPUT_OVERFLOWED
+from rhasspy_desktop_satellite.ringbuffer import RingBuffer
+
+BLOCKING = 'blocking'
+CALLBACK = 'callback'
+CAPTURE_MODES = (BLOCKING, CALLBACK)
+CHUNK_BUFFERS = 8  # default number of rotating chunk buffers of the callback capture
+
+
+class AudioCapture:
+    """This class captures audio with blocking reads from a PyAudio input
+    stream.
+
+    Attributes:
+        chunk_size (int): The number of frames returned by each read.
+        chunk_bytes (int): The number of bytes returned by each read.
+        overflows (int): The number of input overflows detected.
+    """
+
+    def __init__(self, audio, rate, width, channels, chunk_size,
+                 device_index=-1):
+        """Initialize an :class:`.AudioCapture` object.
+
+        Args:
+            audio (:class:`pyaudio.PyAudio`): The PyAudio object.
+            rate (int): Sample rate for recording.
+            width (int): Sample width for recording.
+            channels (int): Channels for recording.
+            chunk_size (int): The number of frames returned by each read.
+            device_index (int, optional): The index of the input device. The
+                default input device is used when negative.
+        """
+        self.audio = audio
+        self.rate = rate
+        self.width = width
+        self.channels = channels
+        self.chunk_size = chunk_size
+        self.chunk_bytes = chunk_size * width * channels
+        self.device_index = device_index
+        self.overflows = 0
+        self.stream = None
+
+    def stream_options(self):
+        """Return the keyword arguments to open the input stream with."""
+        options = {'format': self.audio.get_format_from_width(self.width),
+                   'channels': self.channels,
+                   'rate': self.rate,
+                   'input': True,
+                   'frames_per_buffer': self.chunk_size}
+        if self.device_index >= 0:
+            options['input_device_index'] = self.device_index
+        return options
+
+    def open(self):
+        """Open the input stream."""
+        self.stream = self.audio.open(**self.stream_options())
+
+    def grow_chunk_buffers(self, chunk_buffers):
+        """Make sure a number of chunks can be held before a chunk is
+        overwritten. Blocking reads return new chunks, so this does
+        nothing."""
+
+    def read(self):
+        """Read a chunk of audio.
+
+        PyAudio reports an input overflow as an :exc:`OSError` with the
+        PortAudio error code. The overflow is counted and the chunk is read
+        again, since the audio of the failed read is discarded.
+
+        Returns:
+            bytes: The audio bytes of one chunk.
+
+        Raises:
+            :exc:`OSError`: If the stream fails for another reason.
+        """
+        while True:
+            try:
+                return self.stream.read(self.chunk_size, exception_on_overflow=True)
+            except OSError as error:
+                if error.args[1:2] != (PA_INPUT_OVERFLOWED,):
+                    raise
+                self.overflows += 1
+
+    def pause(self):
+        """Pause capturing audio without closing the input stream."""
+        self.stream.stop_stream()
+
+    def resume(self):
+        """Resume capturing audio on the paused input stream."""
+        self.stream.start_stream()
+
+    def close(self):
+        """Stop and close the input stream."""
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+
+class CallbackAudioCapture(AudioCapture):
+    """This class captures audio with a PortAudio callback that writes into
+    a preallocated ring buffer, from which the recorder reads its chunks.
+
+    The chunks are read into a fixed set of preallocated chunk buffers that
+    are used in turn, so reading a chunk doesn't allocate memory. A chunk
+    is overwritten by the read that comes :attr:`chunk_buffers` reads after
+    it, so there should be more chunk buffers than chunks the consumers of
+    the recorder may hold. When consumers are added, the rotation grows
+    with :meth:`grow_chunk_buffers`.
+
+    Attributes:
+        ring (:class:`.RingBuffer`): The ring buffer fed by the callback.
+        chunk_buffers (int): The number of rotating chunk buffers.
+    """
+
+    def __init__(self, audio, rate, width, channels, chunk_size,
+                 device_index=-1, buffer_time=2, chunk_buffers=CHUNK_BUFFERS):
+        """Initialize a :class:`.CallbackAudioCapture` object.
+
+        Args:
+            audio (:class:`pyaudio.PyAudio`): The PyAudio object.
+            rate (int): Sample rate for recording.
+            width (int): Sample width for recording.
+            channels (int): Channels for recording.
+            chunk_size (int): The number of frames returned by each read.
+            device_index (int, optional): The index of the input device. The
+                default input device is used when negative.
+            buffer_time (float, optional): The capacity of the ring buffer in
+                seconds. Defaults to 2.
+            chunk_buffers (int, optional): The number of rotating chunk
+                buffers the chunks are read into. Defaults to 8.
+        """
+        super().__init__(audio, rate, width, channels, chunk_size, device_index)
+        chunks = max(2, int(buffer_time * rate / chunk_size))
+        self.ring = RingBuffer(chunks * self.chunk_bytes)
+        self.paused = False
+        self.chunk_buffers = max(2, chunk_buffers)
+        self._chunks = [bytearray(self.chunk_bytes) for _ in range(self.chunk_buffers)]
+        self._next_chunk = 0
+
+    def grow_chunk_buffers(self, chunk_buffers):
+        """Add chunk buffers to the rotation, so a number of chunks can be
+        held before a chunk is overwritten.
+
+        The buffers are added behind the buffer that was read last, so every
+        chunk that was already read is overwritten later than before. The
+        list of buffers is replaced rather than changed, so this can be
+        called while another thread reads.
+
+        Args:
+            chunk_buffers (int): The number of chunk buffers.
+        """
+        added = chunk_buffers - len(self._chunks)
+        if added > 0:
+            self._chunks = self._chunks + [bytearray(self.chunk_bytes) for _ in range(added)]
+            self.chunk_buffers = len(self._chunks)
+
+    def stream_options(self):
+        """Return the keyword arguments to open the input stream with."""
+        options = super().stream_options()
+        options['stream_callback'] = self.callback
+        return options
+
+    def callback(self, in_data, frame_count, time_info, status):
+        """Callback that is called by PortAudio with captured audio."""
+        if self.paused:
+            return (None, PA_CONTINUE)
+        ring_overflows = self.ring.overflows
+        self.ring.write(in_data)
+        if status & PA_INPUT_OVERFLOW or self.ring.overflows != ring_overflows:
+            self.overflows += 1
+        return (None, PA_CONTINUE)
+
+    def open(self):
+        """Open the input stream."""
+        self.ring.clear()
+        self.paused = False
+        super().open()
+
+    def pause(self):
+        """Pause capturing audio. The input stream keeps running and the
+        callback discards its audio, so resuming doesn't wait for the device.
+        """
+        self.paused = True
+
+    def resume(self):
+        """Resume capturing audio, starting with the next callback."""
+        self.ring.clear()
+        self.paused = False
+
+    def close(self):
+        """Stop and close the input stream and wake up a waiting reader."""
+        super().close()
+        self.ring.close()
+
+    def read(self):
+        """Read a chunk of audio from the ring buffer into the next chunk
+        buffer.
+
+        Returns:
+            bytearray: The chunk buffer with the audio bytes of one chunk, or
+            an empty bytes object if no audio arrived within a few chunk
+            periods.
+        """
+        chunks = self._chunks
+        index = self._next_chunk % len(chunks)
+        chunk = chunks[index]
+        if not self.ring.readinto(chunk, timeout=4 * self.chunk_size / self.rate):
+            return b''
+        self._next_chunk = index + 1
+        return chunk
+
+
+def create_capture(mode, audio, rate, width, channels, chunk_size,
+                   device_index=-1, buffer_time=2, chunk_buffers=CHUNK_BUFFERS):
+    """Create the audio capture engine for a capture mode.
+
+    Args:
+        mode (str): The capture mode, 'blocking' or 'callback'.
+
+    The other arguments are passed on to the capture engine.
+
+    Returns:
+        :class:`.AudioCapture`: The audio capture engine.
+
+    Raises:
+        :exc:`ValueError`: If the capture mode is unknown.
+    """
+    if mode == CALLBACK:
+        return CallbackAudioCapture(audio, rate, width, channels, chunk_size,
+                                    device_index, buffer_time, chunk_buffers)
+    if mode == BLOCKING:
+        return AudioCapture(audio, rate, width, channels, chunk_size, device_index)
+    raise ValueError('Unknown capture mode {}'.format(mode))
@@ -0,0 +1,304 @@
+"""Module with the bounded queues between the recorder and its consumers,
+such as the publisher."""
+from collections import deque
+import queue
+from threading import Condition, Lock
+import time
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop-oldest'
+DROP_NEWEST = 'drop-newest'
+COALESCE = 'coalesce'
+QUEUE_POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, COALESCE)
+
+COALESCE_LIMIT = 8  # maximum number of chunks coalesced in one queue entry
+
+
+class ChunkQueue:
+    """This class represents a bounded queue of recorded audio chunks.
+
+    When the queue is full, the policy decides what happens with a new chunk:
+
+    - 'block': the recorder waits until there's room in the queue.
+    - 'drop-oldest': the oldest queued chunk is dropped.
+    - 'drop-newest': the new chunk is dropped.
+    - 'coalesce': the new chunk is appended to the newest queued chunk, so
+      it's published in the same message. When that entry already holds
+      :data:`COALESCE_LIMIT` chunks, the oldest entry is dropped.
+
+    Attributes:
+        maxsize (int): The maximum number of queued entries.
+        policy (str): The policy when the queue is full.
+        dropped_ms (float): The duration of the dropped audio in
+            milliseconds.
+        coalesced_ms (float): The duration of the coalesced audio in
+            milliseconds.
+        listener (callable): A function without arguments that is called
+            after audio was put into the queue and when the queue is closed,
+            or `None`.
+    """
+
+    def __init__(self, maxsize, policy=DROP_OLDEST, bytes_per_ms=32, listener=None):
+        """Initialize a :class:`.ChunkQueue` object.
+
+        Args:
+            maxsize (int): The maximum number of queued entries.
+            policy (str, optional): The policy when the queue is full.
+                Defaults to 'drop-oldest'.
+            bytes_per_ms (float, optional): The number of audio bytes per
+                millisecond, to account for dropped and coalesced audio.
+                Defaults to 32 (16 kHz, 16-bit, mono).
+            listener (callable, optional): A function without arguments
+                that is called after audio was put into the queue and when
+                the queue is closed. It lets a consumer on an event loop wait
+                for audio without polling the queue.
+
+        Raises:
+            :exc:`ValueError`: If the policy is unknown.
+        """
+        if policy not in QUEUE_POLICIES:
+            raise ValueError('Unknown queue policy {}, use one of {}'.format(
+                policy, ', '.join(QUEUE_POLICIES)))
+        self.maxsize = maxsize
+        self.policy = policy
+        self.bytes_per_ms = bytes_per_ms
+        self.dropped_ms = 0.0
+        self.coalesced_ms = 0.0
+        self.listener = listener
+        self._entries = deque()
+        self._closed = False
+        self._cv = Condition()
+
+    def qsize(self):
+        """Return the number of queued entries."""
+        return len(self._entries)
+
+    def empty(self):
+        """Return True if the queue is empty."""
+        return not self._entries
+
+    def full(self):
+        """Return True if the queue is full."""
+        return len(self._entries) >= self.maxsize
+
+    def put(self, chunk, captured=None):
+        """Put an audio chunk into the queue, applying the policy if the
+        queue is full.
+
+        Args:
+            chunk (bytes-like): The audio chunk.
+            captured (float, optional): The :func:`time.monotonic` time the
+                chunk was recorded. Defaults to now.
+
+        Returns:
+            bool: True if the chunk was queued or coalesced, False if audio
+            was dropped.
+        """
+        with self._cv:
+            queued = self._put(chunk, time.monotonic() if captured is None else captured)
+        if queued is not None and self.listener is not None:
+            self.listener()
+        return bool(queued)
+
+    def _put(self, chunk, captured):
+        """Put an audio chunk into the queue while holding the lock.
+
+        Returns:
+            bool: True if the chunk was queued or coalesced, False if audio
+            was dropped, or `None` if nothing was added to the queue.
+        """
+        if self.full():
+            if self.policy == BLOCK:
+                self._cv.wait_for(lambda: self._closed or not self.full())
+                if self._closed:
+                    return None
+            elif self.policy == DROP_NEWEST:
+                self.dropped_ms += len(chunk) / self.bytes_per_ms
+                return None
+            elif self.policy == COALESCE and self._entries[-1][1] < COALESCE_LIMIT:
+                entry = self._entries[-1]
+                if entry[1] == 1:
+                    entry[0] = bytearray(entry[0])
+                entry[0] += chunk
+                entry[1] += 1
+                self.coalesced_ms += len(chunk) / self.bytes_per_ms
+                return True
+            else:
+                dropped = self._entries.popleft()
+                self.dropped_ms += len(dropped[0]) / self.bytes_per_ms
+                self._entries.append([chunk, 1, captured])
+                self._cv.notify_all()
+                return False
+        self._entries.append([chunk, 1, captured])
+        self._cv.notify_all()
+        return True
+
+    def get(self, block=True, timeout=None):
+        """Remove and return the oldest audio chunk from the queue.
+
+        Args:
+            block (bool, optional): Whether to wait for a chunk. Defaults to
+                True.
+            timeout (float, optional): Maximum time to wait in seconds.
+
+        Returns:
+            bytes-like: The audio chunk, which holds more than one recorded
+            chunk when chunks were coalesced.
+
+        Raises:
+            :exc:`queue.Empty`: If no chunk is available.
+        """
+        return self.get_entry(block, timeout)[0]
+
+    def get_entry(self, block=True, timeout=None):
+        """Remove and return the oldest audio chunk from the queue with the
+        time it was recorded.
+
+        Args:
+            block (bool, optional): Whether to wait for a chunk. Defaults to
+                True.
+            timeout (float, optional): Maximum time to wait in seconds.
+
+        Returns:
+            tuple: The audio chunk and the :func:`time.monotonic` time its
+            first recorded chunk was recorded.
+
+        Raises:
+            :exc:`queue.Empty`: If no chunk is available.
+        """
+        with self._cv:
+            if block and not self._cv.wait_for(lambda: self._closed or self._entries,
+                                               timeout):
+                raise queue.Empty
+            if not self._entries:
+                raise queue.Empty
+            chunk, _, captured = self._entries.popleft()
+            self._cv.notify_all()
+            return chunk, captured
+
+    def get_nowait(self):
+        """Remove and return the oldest audio chunk without waiting."""
+        return self.get(block=False)
+
+    def clear(self):
+        """Remove all queued audio chunks."""
+        with self._cv:
+            self._entries.clear()
+            self._cv.notify_all()
+
+    def close(self):
+        """Close the queue and wake up all waiting threads."""
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+        if self.listener is not None:
+            self.listener()
+
+
+class ChunkFanout:
+    """This class fans the recorded audio chunks of one capture stream out
+    to the queues of several consumers, such as the MQTT publisher, a local
+    wakeword detector, a level meter or a disk recorder.
+
+    Every consumer has its own bounded :class:`.ChunkQueue` with its own
+    policy. The queues share the chunk objects instead of copying them, so
+    consumers must not modify the chunks they get. A consumer with the
+    'block' policy holds up the recorder, and with it all other consumers,
+    while its queue is full.
+    """
+
+    def __init__(self):
+        """Initialize a :class:`.ChunkFanout` object without consumers."""
+        self._queues = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        """Return the number of consumers."""
+        return len(self._queues)
+
+    def __contains__(self, name):
+        """Return True if a consumer with a name is registered."""
+        return name in self._queues
+
+    def names(self):
+        """Return the names of the consumers."""
+        return list(self._queues)
+
+    def add(self, name, chunk_queue):
+        """Register a consumer.
+
+        Args:
+            name (str): The name of the consumer.
+            chunk_queue (:class:`.ChunkQueue`): The queue of the consumer.
+
+        Returns:
+            :class:`.ChunkQueue`: The queue of the consumer.
+
+        Raises:
+            :exc:`ValueError`: If a consumer with the name is registered.
+        """
+        with self._lock:
+            if name in self._queues:
+                raise ValueError('Consumer {} is already registered'.format(name))
+            queues = dict(self._queues)
+            queues[name] = chunk_queue
+            self._queues = queues
+        return chunk_queue
+
+    def remove(self, name):
+        """Unregister a consumer and close its queue.
+
+        Args:
+            name (str): The name of the consumer.
+
+        Returns:
+            :class:`.ChunkQueue`: The queue of the consumer, or `None` if no
+            consumer has the name.
+        """
+        with self._lock:
+            queues = dict(self._queues)
+            chunk_queue = queues.pop(name, None)
+            self._queues = queues
+        if chunk_queue is not None:
+            chunk_queue.close()
+        return chunk_queue
+
+    def get(self, name):
+        """Return the queue of a consumer, or `None` if no consumer has the
+        name."""
+        return self._queues.get(name)
+
+    def capacity(self):
+        """Return the number of chunks the queues of all consumers hold when
+        they're full."""
+        return sum(chunk_queue.maxsize for chunk_queue in self._queues.values())
+
+    def put(self, chunk, captured=None, skip=()):
+        """Put an audio chunk into the queues of all consumers.
+
+        Args:
+            chunk (bytes-like): The audio chunk.
+            captured (float, optional): The :func:`time.monotonic` time the
+                chunk was recorded. Defaults to now.
+            skip (iterable, optional): The names of the consumers that don't
+                get the chunk. Defaults to none.
+
+        Returns:
+            list: The names of the consumers whose queue dropped audio.
+        """
+        if captured is None:
+            captured = time.monotonic()
+        # The consumers are replaced rather than changed, so the recorder
+        # iterates over them without holding the lock.
+        return [name for name, chunk_queue in self._queues.items()
+                if name not in skip and not chunk_queue.put(chunk, captured)]
+
+    def clear(self):
+        """Remove all queued audio chunks of all consumers."""
+        for chunk_queue in self._queues.values():
+            chunk_queue.clear()
+
+    def close(self):
+        """Close the queues of all consumers."""
+        for chunk_queue in self._queues.values():
+            chunk_queue.close()
@@ -7,8 +7,9 @@ import sys
 
 from rhasspy_desktop_satellite.about import PROJECT, VERSION
 from rhasspy_desktop_satellite.config import ServerConfig, DEFAULT_CONFIG
-from rhasspy_desktop_satellite.exceptions import ConfigurationFileNotFoundError, \
-    NoDefaultAudioDeviceError, UnsupportedPlatformError
+from rhasspy_desktop_satellite.exceptions import AudioBackendError, AudioCodecError, \
+    ConfigurationError, ConfigurationFileNotFoundError, NoDefaultAudioDeviceError, \
+    UnsupportedPlatformError, WakewordDetectorError
 from rhasspy_desktop_satellite.logger import get_logger
 from rhasspy_desktop_satellite.server import SatelliteServer
 
@@ -29,11 +30,14 @@ def main(verbose, version, config, debug):
         # pylint: disable=no-member
         logger.info('Received %s signal. Exiting...',
                     signal.Signals(signal_number).name)
-        if not server is None:
-            server.stop()
-        sys.exit(0)
+        if server is None or server.loop is None or server.loop.is_closed():
+            sys.exit(0)
+        # Stop the server on its event loop, so it closes the audio streams
+        # of its sites and the metrics server before the program exits.
+        server.loop.call_soon_threadsafe(server.stop)
 
     # Register signals.
+    signal.signal(signal.SIGINT, exit_process)
     signal.signal(signal.SIGQUIT, exit_process)
     signal.signal(signal.SIGTERM, exit_process)
 
@@ -59,14 +63,25 @@ def main(verbose, version, config, debug):
     except JSONDecodeError as error:
         logger.critical('%s is not a valid JSON file. Parsing failed at line %s and column %s. Exiting...', config, error.lineno, error.colno)
         sys.exit(1)
-    except KeyboardInterrupt:
-        logger.info('Received SIGINT signal. Shutting down rhasspy-desktop-satellite...')
-        server.stop()
-        sys.exit(0)
     except NoDefaultAudioDeviceError as error:
         logger.critical('No default audio %s device available. Exiting...',
                         error.inout)
         sys.exit(1)
+    except AudioBackendError as error:
+        logger.critical('Can\'t use the audio %s backend: %s. Exiting...',
+                        error.inout, error.reason)
+        sys.exit(1)
+    except ConfigurationError as error:
+        logger.critical('Invalid setting %s: %s. Exiting...', error.setting, error.reason)
+        sys.exit(1)
+    except AudioCodecError as error:
+        logger.critical('Can\'t use the audio codec %s: %s. Exiting...',
+                        error.codec, error.reason)
+        sys.exit(1)
+    except WakewordDetectorError as error:
+        logger.critical('Can\'t use the wake word detector %s: %s. Exiting...',
+                        error.detector, error.reason)
+        sys.exit(1)
     except PermissionError as error:
         logger.critical('Can\'t read file %s. Make sure you have read permissions. Exiting...', error.filename)
         sys.exit(1)
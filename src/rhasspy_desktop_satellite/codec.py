@@ -0,0 +1,304 @@
+"""Module with the audio codecs of the MQTT transport.
+
+Recorded audio is published as PCM WAV files by default. The compressed
+codecs trade a little encode time for less network traffic:
+
+- 'ulaw': G.711 μ-law in a WAV file, half the size of 16-bit PCM. The DSP
+  backend converts the samples with a table lookup, and a pure Python
+  conversion is used when no DSP backend is given.
+- 'flac': lossless FLAC, through the optional soundfile package.
+- 'opus': Opus in an Ogg container, through the optional soundfile package.
+  It only supports the sample rates 8, 12, 16, 24 and 48 kHz.
+
+All codecs encode 16-bit audio. The compressed payloads of audio messages
+are recognized by their content and decoded to PCM WAV files for playback.
+"""
+from array import array
+from functools import lru_cache
+import io
+import struct
+import sys
+
+from rhasspy_desktop_satellite.framing import WAV_FORMAT_MULAW, WavFramer, wav_header
+
+WAV = 'wav'
+ULAW = 'ulaw'
+FLAC = 'flac'
+OPUS = 'opus'
+CODECS = (WAV, ULAW, FLAC, OPUS)
+
+CODEC_SAMPLE_WIDTH = 2  # sample width of the audio the compressed codecs encode
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+ULAW_BIAS = 0x84
+ULAW_CLIP = 8159  # maximum magnitude of 14-bit samples
+
+RIFF_CHUNK = struct.Struct('<4sI')
+FMT_CHUNK = struct.Struct('<HHIIHH')
+
+
+def ulaw_encode_sample(sample):
+    """Encode a 16-bit sample as a G.711 μ-law byte, like the audioop module
+    of the Python standard library."""
+    value = sample >> 2
+    mask = 0x7F if value < 0 else 0xFF
+    magnitude = min(abs(value), ULAW_CLIP) + (ULAW_BIAS >> 2)
+    segment = max(magnitude.bit_length() - 6, 0)
+    if segment >= 8:
+        return 0x7F ^ mask
+    return ((segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)) ^ mask
+
+
+def ulaw_decode_sample(byte):
+    """Decode a G.711 μ-law byte to a 16-bit sample."""
+    byte = ~byte & 0xFF
+    exponent = (byte >> 4) & 0x07
+    sample = ((((byte & 0x0F) << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    return -sample if byte & 0x80 else sample
+
+
+@lru_cache(maxsize=None)
+def ulaw_tables():
+    """Return the lookup tables of the μ-law codec.
+
+    Returns:
+        tuple: The μ-law bytes indexed by the unsigned 16-bit value of a
+        sample, and the 16-bit samples indexed by the μ-law byte.
+    """
+    encode = bytes(ulaw_encode_sample(value - 65536 if value > 32767 else value)
+                   for value in range(65536))
+    decode = [ulaw_decode_sample(byte) for byte in range(256)]
+    return encode, decode
+
+
+def lin2ulaw(frames, dsp=None):
+    """Encode 16-bit audio as μ-law.
+
+    Args:
+        frames (bytes-like): 16-bit little-endian audio.
+        dsp (optional): The DSP backend that encodes the audio. Defaults to
+            `None`, which encodes the audio in pure Python.
+
+    Returns:
+        bytes: The μ-law audio, one byte per sample.
+    """
+    if dsp is not None:
+        return dsp.lin2ulaw(frames)
+    encode, _ = ulaw_tables()
+    samples = array('H')
+    samples.frombytes(frames)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return bytes(map(encode.__getitem__, samples))
+
+
+def ulaw2lin(frames, dsp=None):
+    """Decode μ-law audio to 16-bit audio.
+
+    Args:
+        frames (bytes-like): The μ-law audio.
+        dsp (optional): The DSP backend that decodes the audio. Defaults to
+            `None`, which decodes the audio in pure Python.
+
+    Returns:
+        bytes: 16-bit little-endian audio.
+    """
+    if dsp is not None:
+        return dsp.ulaw2lin(frames)
+    _, decode = ulaw_tables()
+    samples = array('h', map(decode.__getitem__, frames))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples.tobytes()
+
+
+class PcmEncoder:
+    """This class converts audio chunks to 16-bit audio for the compressed
+    encoders."""
+
+    def __init__(self, rate, width, channels, dsp):
+        """Initialize an encoder.
+
+        Args:
+            rate (int): The sample rate of the audio chunks.
+            width (int): The sample width of the audio chunks.
+            channels (int): The number of channels of the audio chunks.
+            dsp: The DSP backend for the sample width conversion.
+        """
+        self.rate = rate
+        self.width = width
+        self.channels = channels
+        self.dsp = dsp
+
+    def pcm16(self, chunk):
+        """Return an audio chunk as 16-bit audio."""
+        if self.width == CODEC_SAMPLE_WIDTH:
+            return chunk
+        return self.dsp.lin2lin(chunk, self.width, CODEC_SAMPLE_WIDTH)
+
+    def frame(self, chunk):
+        """Encode an audio chunk for an audioFrame message.
+
+        Args:
+            chunk (bytes-like): The audio data.
+
+        Returns:
+            bytes: The encoded audio.
+        """
+        raise NotImplementedError
+
+
+class UlawEncoder(PcmEncoder):
+    """This class encodes audio chunks as μ-law WAV files."""
+
+    def __init__(self, rate, width, channels, dsp):
+        """Initialize a :class:`.UlawEncoder` object."""
+        super().__init__(rate, width, channels, dsp)
+        self.framer = WavFramer(rate, 1, channels, WAV_FORMAT_MULAW)
+
+    def frame(self, chunk):
+        """Encode an audio chunk as a μ-law WAV file."""
+        return self.framer.frame(lin2ulaw(self.pcm16(chunk), self.dsp))
+
+
+class SoundfileEncoder(PcmEncoder):
+    """This class encodes audio chunks with libsndfile, through the optional
+    soundfile package."""
+
+    def __init__(self, rate, width, channels, dsp, file_format, subtype):
+        """Initialize a :class:`.SoundfileEncoder` object.
+
+        Args:
+            file_format (str): The libsndfile format, such as 'FLAC'.
+            subtype (str): The libsndfile subtype, such as 'PCM_16'.
+
+        Raises:
+            :exc:`ImportError`: If soundfile isn't installed.
+            :exc:`ValueError`: If libsndfile doesn't support the format.
+        """
+        # pylint: disable=import-outside-toplevel,too-many-arguments
+        import soundfile
+        super().__init__(rate, width, channels, dsp)
+        if not soundfile.check_format(file_format, subtype):
+            raise ValueError('libsndfile doesn\'t support {} {}'.format(file_format, subtype))
+        self.soundfile = soundfile
+        self.format = file_format
+        self.subtype = subtype
+
+    def frame(self, chunk):
+        """Encode an audio chunk as an audio file."""
+        with io.BytesIO() as buffer:
+            with self.soundfile.SoundFile(buffer, 'w', self.rate, self.channels,
+                                          self.subtype, format=self.format) as sound:
+                sound.buffer_write(self.pcm16(chunk), dtype='int16')
+            return buffer.getvalue()
+
+
+def create_encoder(codec, rate, width, channels, dsp):
+    """Create the encoder of the audioFrame messages for a codec.
+
+    Args:
+        codec (str): 'wav', 'ulaw', 'flac' or 'opus'.
+        rate (int): The sample rate of the audio chunks.
+        width (int): The sample width of the audio chunks.
+        channels (int): The number of channels of the audio chunks.
+        dsp: The DSP backend for sample width conversions.
+
+    Returns:
+        An object whose `frame()` method encodes an audio chunk.
+
+    Raises:
+        :exc:`ValueError`: If the codec is unknown or doesn't support the
+            audio format.
+        :exc:`ImportError`: If the codec needs soundfile and it isn't
+            installed.
+    """
+    if codec == WAV:
+        return WavFramer(rate, width, channels)
+    if codec == ULAW:
+        return UlawEncoder(rate, width, channels, dsp)
+    if codec == FLAC:
+        return SoundfileEncoder(rate, width, channels, dsp, 'FLAC', 'PCM_16')
+    if codec == OPUS:
+        if rate not in OPUS_RATES:
+            raise ValueError('Opus doesn\'t support a sample rate of {} Hz'.format(rate))
+        return SoundfileEncoder(rate, width, channels, dsp, 'OGG', 'OPUS')
+    raise ValueError('Unknown audio codec {}'.format(codec))
+
+
+def wav_format(payload):
+    """Return the format tag of a WAV file, or `None` if the payload isn't a
+    WAV file."""
+    if payload[:4] != b'RIFF' or payload[8:12] != b'WAVE':
+        return None
+    fmt = find_riff_chunk(payload, b'fmt ')
+    if fmt is None or len(fmt) < FMT_CHUNK.size:
+        return None
+    return FMT_CHUNK.unpack_from(fmt)[0]
+
+
+def find_riff_chunk(payload, chunk_id):
+    """Return the data of a chunk of a RIFF file, or `None` if the file has
+    no such chunk."""
+    offset = 12
+    while offset + RIFF_CHUNK.size <= len(payload):
+        current_id, length = RIFF_CHUNK.unpack_from(payload, offset)
+        offset += RIFF_CHUNK.size
+        if current_id == chunk_id:
+            return memoryview(payload)[offset:offset + length]
+        offset += length + (length & 1)
+    return None
+
+
+def decode_ulaw_wav(payload, dsp=None):
+    """Decode a μ-law WAV file to a 16-bit PCM WAV file, with a DSP backend
+    if one is given."""
+    _, channels, rate, _, _, _ = FMT_CHUNK.unpack_from(find_riff_chunk(payload, b'fmt '))
+    data = find_riff_chunk(payload, b'data')
+    if data is None:
+        raise ValueError('The μ-law WAV file has no data')
+    frames = ulaw2lin(data, dsp)
+    return wav_header(rate, CODEC_SAMPLE_WIDTH, channels, len(frames)) + frames
+
+
+def decode_soundfile(payload):
+    """Decode a FLAC or Ogg file to a 16-bit PCM WAV file with libsndfile.
+
+    Raises:
+        :exc:`ImportError`: If soundfile isn't installed.
+    """
+    # pylint: disable=import-outside-toplevel
+    import soundfile
+    with soundfile.SoundFile(io.BytesIO(payload)) as sound:
+        frames = bytes(sound.buffer_read(dtype='int16'))
+        rate = sound.samplerate
+        channels = sound.channels
+    return wav_header(rate, CODEC_SAMPLE_WIDTH, channels, len(frames)) + frames
+
+
+def decode_audio(payload, dsp=None):
+    """Decode the payload of an audio message to a PCM WAV file.
+
+    PCM WAV files are returned as they are. μ-law WAV files, FLAC files and
+    Ogg files are recognized by their content and decoded.
+
+    Args:
+        payload (bytes): The payload of the audio message.
+        dsp (optional): The DSP backend that decodes μ-law audio. Defaults
+            to `None`, which decodes μ-law audio in pure Python.
+
+    Returns:
+        bytes: The PCM WAV file.
+
+    Raises:
+        :exc:`ImportError`: If the payload needs soundfile and it isn't
+            installed.
+        :exc:`ValueError`: If a μ-law WAV file has no data.
+        :exc:`RuntimeError`: If libsndfile can't decode the payload.
+    """
+    if payload[:4] in (b'fLaC', b'OggS'):
+        return decode_soundfile(payload)
+    if wav_format(payload) == WAV_FORMAT_MULAW:
+        return decode_ulaw_wav(payload, dsp)
+    return payload
+
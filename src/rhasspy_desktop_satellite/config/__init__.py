@@ -5,6 +5,9 @@ from pathlib import Path
 from rhasspy_desktop_satellite.config.recorder import RecorderConfig
 from rhasspy_desktop_satellite.config.player import PlayerConfig
 from rhasspy_desktop_satellite.config.mqtt import MQTTConfig
+from rhasspy_desktop_satellite.config.metrics import MetricsConfig
+from rhasspy_desktop_satellite.config.site import SiteConfig
+from rhasspy_desktop_satellite.devicecache import default_cache_path
 from rhasspy_desktop_satellite.exceptions import ConfigurationFileNotFoundError
 
 
@@ -13,12 +16,20 @@ DEFAULT_CONFIG = '/etc/rhasspy-desktop-satellite.json'
 DEFAULT_SITE = 'default'
 DEFAULT_OUTPUT = None
 DEFAULT_INPUT = None
+DEFAULT_DSP = None
+DEFAULT_DEVICE_CACHE = True
+DEFAULT_DEVICE_WATCH_INTERVAL = 2
 
 # Keys in the JSON configuration file
 SITE = 'site'
 PLAYER = 'player'
 RECORDER = 'recorder'
 MQTT = 'mqtt'
+DSP = 'dsp'
+METRICS = 'metrics'
+SITES = 'sites'
+DEVICE_CACHE = 'device_cache'
+DEVICE_WATCH_INTERVAL = 'device_watch_interval'
 
 
 # TODO: Define __str__() with explicit settings for debugging.
@@ -26,13 +37,25 @@ class ServerConfig:
     """This class represents the configuration of a Hermes audio server.
 
     Attributes:
-        site (str): The site ID of the audio server.
-        player (:class:` .PlayerConfig`): Player options
-        recorder (:class:` .RecorderConfig`): Recorder options
+        site (str): The site ID of the first site of the audio server.
+        player (:class:` .PlayerConfig`): Player options of the first site
+        recorder (:class:` .RecorderConfig`): Recorder options of the first
+            site
+        sites (list): The :class:`.SiteConfig` objects of all sites. The
+            sites share the MQTT connection and the audio backend.
         mqtt (:class:`.MQTTConfig`): The MQTT options of the configuration.
+        dsp (str): The DSP backend for audio conversions, 'numpy' or
+            'audioop'. `None` selects NumPy when it is installed.
+        metrics (:class:`.MetricsConfig`): The metrics endpoint options.
+        device_cache (str): The path of the cache of resolved audio devices,
+            or `None` if the cache is disabled.
+        device_watch_interval (float): The time in seconds between two checks
+            for plugged in or unplugged audio devices. 0 disables the checks.
     """
 
-    def __init__(self, site='default', player=None, recorder=None, mqtt=None):
+    def __init__(self, site='default', player=None, recorder=None, mqtt=None, dsp=DEFAULT_DSP,
+                 metrics=None, sites=None, device_cache=None,
+                 device_watch_interval=DEFAULT_DEVICE_WATCH_INTERVAL):
         """Initialize a :class:`.ServerConfig` object.
 
         Args:
@@ -44,23 +67,43 @@ class ServerConfig:
                 Defaults to a default :class:`.RecorderConfig` object.
             mqtt (:class:`.MQTTConfig`, optional): The MQTT connection
                 settings. Defaults to a default :class:`.MQTTConfig` object.
+            dsp (str, optional): The DSP backend for audio conversions.
+                Defaults to `None`, which selects NumPy when it is installed
+                and audioop otherwise.
+            metrics (:class:`.MetricsConfig`, optional): The metrics
+                endpoint settings. Defaults to a disabled
+                :class:`.MetricsConfig` object.
+            sites (list, optional): The :class:`.SiteConfig` objects of
+                all sites. Defaults to a single site with the :attr:`site`,
+                :attr:`player` and :attr:`recorder` settings. Otherwise these
+                settings are taken from the first site.
+            device_cache (str, optional): The path of the cache of resolved
+                audio devices. Defaults to `None`, which disables the cache.
+            device_watch_interval (float, optional): The time in seconds
+                between two checks for plugged in or unplugged audio devices.
+                0 disables the checks. Defaults to 2.
         """
-        if recorder is None:
-            self.recorder = RecorderConfig()
-        else:
-            self.recorder = recorder
+        if not sites:
+            sites = [SiteConfig(site, player, recorder)]
+        self.sites = sites
 
-        if player is None:
-            self.player = PlayerConfig()
-        else:
-            self.player = player
+        self.site = sites[0].site
+        self.recorder = sites[0].recorder
+        self.player = sites[0].player
 
         if mqtt is None:
             self.mqtt = MQTTConfig()
         else:
             self.mqtt = mqtt
 
-        self.site = site
+        if metrics is None:
+            self.metrics = MetricsConfig()
+        else:
+            self.metrics = metrics
+
+        self.dsp = dsp
+        self.device_cache = device_cache
+        self.device_watch_interval = device_watch_interval
 
     @classmethod
     def from_json_file(cls, filename=None):
@@ -92,6 +135,32 @@ class ServerConfig:
         object is initialized with the Recorder settings from the configuration file,
         or a default `enabled = false` value if the setting is not specified.
 
+        The :attr:`dsp` attribute of the :class:`.ServerConfig` object is
+        initialized with the setting from the configuration file, or `None`
+        if the setting is not specified.
+
+        The :attr:`metrics` attribute of the :class:`.ServerConfig`
+        object is initialized with the metrics settings from the configuration
+        file, or a default `enabled = false` value if the setting is not
+        specified.
+
+        The :attr:`device_cache` attribute of the :class:`.ServerConfig`
+        object is initialized with the `device_cache` path from the
+        configuration file. It defaults to `devices.json` in the
+        `rhasspy-desktop-satellite` directory of the user's cache directory,
+        and `false` disables the cache.
+
+        The :attr:`device_watch_interval` attribute of the
+        :class:`.ServerConfig` object is initialized with the
+        `device_watch_interval` setting from the configuration file, or 2 if
+        the setting is not specified.
+
+        The :attr:`sites` attribute of the :class:`.ServerConfig` object is
+        initialized with the `sites` list from the configuration file. Each
+        entry has the `site`, `player` and `recorder` settings of a site. If
+        the list is not specified, the server has a single site with the
+        top-level `site`, `player` and `recorder` settings.
+
         Raises:
             :exc:`ConfigurationFileNotFoundError`: If :attr:`filename` doesn't
                 exist.
@@ -106,6 +175,9 @@ class ServerConfig:
 
         {
             "site": "default",
+            "dsp": "numpy",
+            "device_cache": "/var/cache/rhasspy-desktop-satellite/devices.json",
+            "device_watch_interval": 2,
             "player": {
                 "enabled": true,
                 "device": "device name",
@@ -127,6 +199,33 @@ class ServerConfig:
                     "client_certificate": "",
                     "client_key": ""
                 }
+            },
+            "metrics": {
+                "enabled": true,
+                "host": "127.0.0.1",
+                "port": 9810
+            }
+        }
+
+        A server with several sites replaces `site`, `player` and
+        `recorder` with a list of sites:
+
+        {
+            "sites": [
+                {
+                    "site": "kitchen",
+                    "player": {"device": "USB Audio.*hw:1"},
+                    "recorder": {"device": "USB Audio.*hw:1"}
+                },
+                {
+                    "site": "office",
+                    "player": {"device": "USB Audio.*hw:2"},
+                    "recorder": {"device": "USB Audio.*hw:2"}
+                }
+            ],
+            "mqtt": {
+                "host": "localhost",
+                "port": 1883
             }
         }
         """
@@ -139,7 +238,18 @@ class ServerConfig:
         except FileNotFoundError as error:
             raise ConfigurationFileNotFoundError(error.filename)
 
+        device_cache = configuration.get(DEVICE_CACHE, DEFAULT_DEVICE_CACHE)
+        if device_cache is True:
+            device_cache = default_cache_path()
+
         return cls(site=configuration.get(SITE, DEFAULT_SITE),
                    player=PlayerConfig.from_json(configuration.get(PLAYER)),
                    recorder=RecorderConfig.from_json(configuration.get(RECORDER)),
-                   mqtt=MQTTConfig.from_json(configuration.get(MQTT)))
+                   mqtt=MQTTConfig.from_json(configuration.get(MQTT)),
+                   dsp=configuration.get(DSP, DEFAULT_DSP),
+                   metrics=MetricsConfig.from_json(configuration.get(METRICS)),
+                   sites=[SiteConfig.from_json(site)
+                          for site in configuration.get(SITES, [])],
+                   device_cache=device_cache or None,
+                   device_watch_interval=configuration.get(DEVICE_WATCH_INTERVAL,
+                                                           DEFAULT_DEVICE_WATCH_INTERVAL))
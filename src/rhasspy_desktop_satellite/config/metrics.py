@@ -0,0 +1,68 @@
+"""Classes for the configuration of rhasspy-desktop-satellite."""
+
+# Default values
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 9810
+
+# Keys in the JSON configuration file
+ENABLED = 'enabled'
+HOST = 'host'
+PORT = 'port'
+
+
+# TODO: Define __str__() for each class with explicit settings for debugging.
+class MetricsConfig:
+    """This class represents the settings of the metrics endpoint for
+    Rhasspy Desktop Satellite.
+
+    Attributes:
+        enabled (bool): Whether or not the metrics endpoint is enabled.
+        host (str): The address the metrics endpoint listens on.
+        port (int): The port number the metrics endpoint listens on.
+    """
+
+    def __init__(self, enabled=False, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Initialize a :class:`.MetricsConfig` object.
+
+        Args:
+            enabled (bool): Whether or not the metrics endpoint is enabled.
+                Defaults to False.
+            host (str): The address the metrics endpoint listens on.
+                Defaults to '127.0.0.1'.
+            port (int): The port number the metrics endpoint listens on.
+                Defaults to 9810.
+
+        All arguments are optional.
+        """
+        self.enabled = enabled
+        self.host = host
+        self.port = port
+
+    @classmethod
+    def from_json(cls, json_object=None):
+        """Initialize a :class:`.MetricsConfig` object with settings from a
+        JSON object.
+
+        Args:
+            json_object (optional): The JSON object with the metrics
+                settings. Defaults to { "enabled": false }.
+
+        Returns:
+            :class:`.MetricsConfig`: An object with the metrics settings.
+
+        The JSON object should have the following format:
+
+        {
+            "enabled": true,
+            "host": "127.0.0.1",
+            "port": 9810
+        }
+        """
+        if json_object is None:
+            ret = cls(enabled=False)
+        else:
+            ret = cls(enabled=json_object.get(ENABLED, True),
+                      host=json_object.get(HOST, DEFAULT_HOST),
+                      port=json_object.get(PORT, DEFAULT_PORT))
+
+        return ret
@@ -3,6 +3,14 @@
 # Default values
 DEFAULT_HOST = 'localhost'
 DEFAULT_PORT = 1883
+DEFAULT_RECONNECT_MIN_DELAY = 1
+DEFAULT_RECONNECT_MAX_DELAY = 60
+DEFAULT_SPOOL_SIZE = 4
+DEFAULT_SPOOL_MAX_AGE = 10
+DEFAULT_QOS = {'hermes/audioServer/+/audioFrame': 0,
+               'hermes/audioServer/+/playFinished': 1}
+DEFAULT_MAX_INFLIGHT = 100
+DEFAULT_MAX_BUFFER = 1
 
 # Keys in the JSON configuration file
 HOST = 'host'
@@ -14,6 +22,15 @@ TLS = 'tls'
 CA_CERTS = 'ca_certificates'
 CLIENT_CERT = 'client_certificate'
 CLIENT_KEY = 'client_key'
+RECONNECT_MIN_DELAY = 'reconnect_min_delay'
+RECONNECT_MAX_DELAY = 'reconnect_max_delay'
+SPOOL = 'spool'
+SPOOL_SIZE = 'size'
+SPOOL_MAX_AGE = 'max_age'
+SPOOL_PATH = 'path'
+QOS = 'qos'
+MAX_INFLIGHT = 'max_inflight'
+MAX_BUFFER = 'max_buffer'
 
 
 # TODO: Define __str__() for each class with explicit settings for debugging.
@@ -146,6 +163,74 @@ class MQTTTLSConfig:
         return ret
 
 
+class MQTTSpoolConfig:
+    """This class represents the settings of the spool for MQTT messages
+    that are published while the connection to the MQTT broker is down.
+
+    Attributes:
+        enabled (bool): Whether or not messages are spooled.
+        size (int): The size of the spool in bytes.
+        max_age (float): The time in seconds after which a spooled message
+            is dropped instead of published. 0 keeps all messages.
+        path (str): The path of the file the spool is memory-mapped to, or
+            `None` to keep the spool in memory.
+    """
+
+    def __init__(self, enabled=False, size=DEFAULT_SPOOL_SIZE * 1024 * 1024,
+                 max_age=DEFAULT_SPOOL_MAX_AGE, path=None):
+        """Initialize a :class:`.MQTTSpoolConfig` object.
+
+        Args:
+            enabled (bool, optional): Whether or not messages are spooled.
+                The default value is `False`.
+            size (int, optional): The size of the spool in bytes. Defaults
+                to 4 MiB.
+            max_age (float, optional): The time in seconds after which a
+                spooled message is dropped instead of published. Defaults to
+                10.
+            path (str, optional): The path of the file the spool is
+                memory-mapped to. Defaults to `None`, which keeps the spool
+                in memory.
+
+        All arguments are optional.
+        """
+        self.enabled = enabled
+        self.size = size
+        self.max_age = max_age
+        self.path = path
+
+    @classmethod
+    def from_json(cls, json_object=None):
+        """Initialize a :class:`.MQTTSpoolConfig` object with settings from a
+        JSON object.
+
+        Args:
+            json_object (optional): The JSON object with the spool settings.
+                Defaults to `None`, which disables the spool.
+
+        Returns:
+            :class:`.MQTTSpoolConfig`: An object with the spool settings.
+
+        The JSON object should have the following format, with the size in
+        MiB and the maximum age in seconds:
+
+        {
+            "size": 4,
+            "max_age": 10,
+            "path": "/var/cache/rhasspy-desktop-satellite/spool"
+        }
+        """
+        if json_object is None:
+            ret = cls(enabled=False)
+        else:
+            ret = cls(enabled=True,
+                      size=int(json_object.get(SPOOL_SIZE, DEFAULT_SPOOL_SIZE) * 1024 * 1024),
+                      max_age=json_object.get(SPOOL_MAX_AGE, DEFAULT_SPOOL_MAX_AGE),
+                      path=json_object.get(SPOOL_PATH))
+
+        return ret
+
+
 class MQTTConfig:
     """This class represents the configuration for a connection to an
     MQTT broker.
@@ -157,10 +242,24 @@ class MQTTConfig:
             settings (username and password) for the MQTT broker.
         tls (:class:`.MQTTTLSConfig`, optional): The TLS settings for the MQTT
             broker.
+        reconnect_min_delay (float): The time in seconds before the first
+            attempt to reconnect to the MQTT broker.
+        reconnect_max_delay (float): The maximum time in seconds between two
+            attempts to reconnect to the MQTT broker.
+        spool (:class:`.MQTTSpoolConfig`): The settings of the spool for
+            messages published while the MQTT broker is unreachable.
+        qos (dict): The QoS of published messages by MQTT topic filter.
+        max_inflight (int): The maximum number of published messages that
+            aren't written to the socket or acknowledged yet.
+        max_buffer (int): The maximum number of bytes of published messages
+            that aren't written to the socket or acknowledged yet.
     """
 
     def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, auth=None,
-                 tls=None):
+                 tls=None, reconnect_min_delay=DEFAULT_RECONNECT_MIN_DELAY,
+                 reconnect_max_delay=DEFAULT_RECONNECT_MAX_DELAY, spool=None,
+                 qos=None, max_inflight=DEFAULT_MAX_INFLIGHT,
+                 max_buffer=DEFAULT_MAX_BUFFER * 1024 * 1024):
         """Initialize a :class:`.MQTTConfig` object.
 
         Args:
@@ -173,6 +272,19 @@ class MQTTConfig:
             tls (:class:`.MQTTTLSConfig`, optional): The TLS settings for the
                 MQTT broker. Defaults to a default :class:`.MQTTTLSConfig`
                 object.
+            reconnect_min_delay (float, optional): The time in seconds
+                before the first attempt to reconnect. Defaults to 1.
+            reconnect_max_delay (float, optional): The maximum time in
+                seconds between two attempts to reconnect. Defaults to 60.
+            spool (:class:`.MQTTSpoolConfig`, optional): The settings of the
+                spool. Defaults to a disabled spool.
+            qos (dict, optional): The QoS by MQTT topic filter, added to the
+                default QoS 0 for audioFrame messages and QoS 1 for
+                playFinished messages.
+            max_inflight (int, optional): The maximum number of published
+                messages in flight. Defaults to 100.
+            max_buffer (int, optional): The maximum number of bytes of
+                published messages in flight. Defaults to 1 MiB.
 
         All arguments are optional.
         """
@@ -189,6 +301,20 @@ class MQTTConfig:
         else:
             self.tls = tls
 
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = max(reconnect_max_delay, reconnect_min_delay)
+
+        if spool is None:
+            self.spool = MQTTSpoolConfig()
+        else:
+            self.spool = spool
+
+        self.qos = dict(DEFAULT_QOS)
+        if qos is not None:
+            self.qos.update(qos)
+        self.max_inflight = max(max_inflight, 1)
+        self.max_buffer = max_buffer
+
     @classmethod
     def from_json(cls, json_object=None):
         """Initialize a :class:`.MQTTConfig` object with settings from a JSON
@@ -214,7 +340,19 @@ class MQTTConfig:
                 "ca_certificates": "",
                 "client_certificate": "",
                 "client_key": ""
-            }
+            },
+            "reconnect_min_delay": 1,
+            "reconnect_max_delay": 60,
+            "spool": {
+                "size": 4,
+                "max_age": 10
+            },
+            "qos": {
+                "hermes/audioServer/+/audioFrame": 0,
+                "hermes/audioServer/+/playFinished": 1
+            },
+            "max_inflight": 100,
+            "max_buffer": 1
         }
         """
         if json_object is None:
@@ -223,4 +361,13 @@ class MQTTConfig:
         return cls(host=json_object.get(HOST, DEFAULT_HOST),
                    port=json_object.get(PORT, DEFAULT_PORT),
                    auth=MQTTAuthConfig.from_json(json_object.get(AUTH)),
-                   tls=MQTTTLSConfig.from_json(json_object.get(TLS)))
+                   tls=MQTTTLSConfig.from_json(json_object.get(TLS)),
+                   reconnect_min_delay=json_object.get(RECONNECT_MIN_DELAY,
+                                                       DEFAULT_RECONNECT_MIN_DELAY),
+                   reconnect_max_delay=json_object.get(RECONNECT_MAX_DELAY,
+                                                       DEFAULT_RECONNECT_MAX_DELAY),
+                   spool=MQTTSpoolConfig.from_json(json_object.get(SPOOL)),
+                   qos=json_object.get(QOS),
+                   max_inflight=json_object.get(MAX_INFLIGHT, DEFAULT_MAX_INFLIGHT),
+                   max_buffer=int(json_object.get(MAX_BUFFER, DEFAULT_MAX_BUFFER)
+                                  * 1024 * 1024))
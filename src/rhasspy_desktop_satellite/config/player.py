@@ -2,12 +2,26 @@
 
 # Default values
 DEFAULT_DEVICE = None
+DEFAULT_IDLE_TIMEOUT = 5
+DEFAULT_BACKEND = 'pyaudio'
+DEFAULT_PATH = None
+DEFAULT_SPEED = 1
+DEFAULT_STREAM_TIMEOUT = 5
+DEFAULT_CACHE_ENTRIES = 32
+DEFAULT_CACHE_SIZE = 8
 
 # Keys in the JSON configuration file
 ENABLED = 'enabled'
 DEVICE = 'device'
 AUTO_CONVERT = 'auto_convert'
 FRAME_RATE = 'frame_rate'
+IDLE_TIMEOUT = 'idle_timeout'
+BACKEND = 'backend'
+PATH = 'path'
+SPEED = 'speed'
+STREAM_TIMEOUT = 'stream_timeout'
+CACHE_ENTRIES = 'cache_entries'
+CACHE_SIZE = 'cache_size'
 
 # TODO: Define __str__() for each class with explicit settings for debugging.
 class PlayerConfig:
@@ -20,9 +34,26 @@ class PlayerConfig:
             audio samples in case of unmatched frame rates.
         frame_rate (int): Frame rate for playback.
             Defaults to 'defaultSampleRate' of device.
+        idle_timeout (float): Time in seconds an unused output stream stays
+            open for the next audio message.
+        backend (str): The audio backend: 'pyaudio' plays on an audio
+            device, 'null' discards the audio and 'file' writes it to WAV
+            files.
+        path (str): The directory of the WAV files of the 'file' backend.
+        speed (float): The speed of the 'null' and 'file' backends relative
+            to real time. 0 plays as fast as possible.
+        stream_timeout (float): Time in seconds the player waits for the
+            next chunk of a streamed audio message.
+        cache_entries (int): The maximum number of audio messages in the
+            playback cache. 0 disables the cache.
+        cache_size (float): The maximum size of the decoded audio in the
+            playback cache in MiB.
     """
 
-    def __init__(self, enabled=False, device=None, auto_convert=False, frame_rate=None):
+    def __init__(self, enabled=False, device=None, auto_convert=False, frame_rate=None,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, backend=DEFAULT_BACKEND, path=DEFAULT_PATH,
+                 speed=DEFAULT_SPEED, stream_timeout=DEFAULT_STREAM_TIMEOUT,
+                 cache_entries=DEFAULT_CACHE_ENTRIES, cache_size=DEFAULT_CACHE_SIZE):
         """Initialize a :class:`.PlayerConfig` object.
 
         Args:
@@ -33,6 +64,21 @@ class PlayerConfig:
                 audio samples in case of unmatched frame rates. Defaults to False.
             frame_rate (int): Frame rate for playback.
                 Defaults to 'defaultSampleRate' of device.
+            idle_timeout (float): Time in seconds an unused output stream
+                stays open for the next audio message. 0 closes the stream
+                after every message. Defaults to 5.
+            backend (str): The audio backend, 'pyaudio', 'null' or 'file'.
+                Defaults to 'pyaudio'.
+            path (str): The directory of the WAV files of the 'file'
+                backend. Defaults to None.
+            speed (float): The speed of the 'null' and 'file' backends
+                relative to real time. Defaults to 1.
+            stream_timeout (float): Time in seconds the player waits for
+                the next chunk of a streamed audio message. Defaults to 5.
+            cache_entries (int): The maximum number of audio messages in the
+                playback cache. 0 disables the cache. Defaults to 32.
+            cache_size (float): The maximum size of the decoded audio in the
+                playback cache in MiB. Defaults to 8.
 
         All arguments are optional.
         """
@@ -40,6 +86,13 @@ class PlayerConfig:
         self.device = device
         self.auto_convert = auto_convert
         self.frame_rate = frame_rate
+        self.idle_timeout = idle_timeout
+        self.backend = backend
+        self.path = path
+        self.speed = speed
+        self.stream_timeout = stream_timeout
+        self.cache_entries = cache_entries
+        self.cache_size = cache_size
 
     @classmethod
     def from_json(cls, json_object=None):
@@ -59,7 +112,14 @@ class PlayerConfig:
             "enabled": true,
             "device": "device name",
             "auto_convert": false,
-            "frame_rate": 44100
+            "frame_rate": 44100,
+            "idle_timeout": 5,
+            "backend": "pyaudio",
+            "path": "/tmp/playback",
+            "speed": 1,
+            "stream_timeout": 5,
+            "cache_entries": 32,
+            "cache_size": 8
         }
         """
         if json_object is None:
@@ -68,6 +128,13 @@ class PlayerConfig:
             ret = cls(enabled=json_object.get(ENABLED, True),
                       device=json_object.get(DEVICE),
                       auto_convert=json_object.get(AUTO_CONVERT, True),
-                      frame_rate=json_object.get(FRAME_RATE))
+                      frame_rate=json_object.get(FRAME_RATE),
+                      idle_timeout=json_object.get(IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT),
+                      backend=json_object.get(BACKEND, DEFAULT_BACKEND),
+                      path=json_object.get(PATH, DEFAULT_PATH),
+                      speed=json_object.get(SPEED, DEFAULT_SPEED),
+                      stream_timeout=json_object.get(STREAM_TIMEOUT, DEFAULT_STREAM_TIMEOUT),
+                      cache_entries=json_object.get(CACHE_ENTRIES, DEFAULT_CACHE_ENTRIES),
+                      cache_size=json_object.get(CACHE_SIZE, DEFAULT_CACHE_SIZE))
 
         return ret
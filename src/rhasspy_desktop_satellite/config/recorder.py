@@ -1,12 +1,29 @@
 """Classes for the configuration of rhasspy-desktop-satellite."""
 
+from rhasspy_desktop_satellite.capture import CAPTURE_MODES
+from rhasspy_desktop_satellite.chunkqueue import QUEUE_POLICIES
 from rhasspy_desktop_satellite.config.vad import VADConfig
+from rhasspy_desktop_satellite.config.wakeword import WakewordConfig
+from rhasspy_desktop_satellite.exceptions import ConfigurationError
 
 # Default values
 DEFAULT_DEVICE = None
 DEFAULT_SAMPLE_RATE = 16000
 DEFAULT_SAMPLE_WIDTH = 2
 DEFAULT_CHANNELS = 1
+DEFAULT_CAPTURE_MODE = 'blocking'
+DEFAULT_BUFFER_TIME = 2
+DEFAULT_KEEP_OPEN = False
+DEFAULT_QUEUE_SIZE = 50
+DEFAULT_FRAME_TIME = 120
+DEFAULT_MAX_FRAME_TIME = None
+DEFAULT_QUEUE_POLICY = 'drop-oldest'
+DEFAULT_BACKEND = 'pyaudio'
+DEFAULT_FILE = None
+DEFAULT_SPEED = 1
+DEFAULT_LOOP = False
+DEFAULT_CODEC = 'wav'
+DEFAULT_FRAME_TOPIC = None
 
 # Keys in the JSON configuration file
 ENABLED = 'enabled'
@@ -15,7 +32,21 @@ WAKEUP = 'wakeup'
 SAMPLE_RATE = 'sampleRate'
 SAMPLE_WIDTH = 'sampleWidth'
 CHANNELS = 'channels'
+CAPTURE_MODE = 'captureMode'
+BUFFER_TIME = 'bufferTime'
+KEEP_OPEN = 'keepOpen'
+QUEUE_SIZE = 'queueSize'
+QUEUE_POLICY = 'queuePolicy'
+FRAME_TIME = 'frameTime'
+MAX_FRAME_TIME = 'maxFrameTime'
+BACKEND = 'backend'
+FILE = 'file'
+SPEED = 'speed'
+LOOP = 'loop'
+CODEC = 'codec'
+FRAME_TOPIC = 'frameTopic'
 VAD = 'vad'
+WAKEWORD = 'wakeword'
 
 # TODO: Define __str__() for each class with explicit settings for debugging.
 class RecorderConfig:
@@ -28,10 +59,45 @@ class RecorderConfig:
         sample_rate (int): Sample rate for recording
         sample_width (int): Sample width for recording
         channels (int): Channels for recording
+        capture_mode (str): How audio is captured: 'blocking' reads or a
+            'callback' feeding a ring buffer.
+        buffer_time (float): Size of the ring buffer in seconds for the
+            'callback' capture mode.
+        keep_open (bool): Whether or not the input stream stays open while
+            not recording, so recording resumes without reopening the device.
+        queue_size (int): The maximum number of recorded chunks waiting to be
+            published.
+        queue_policy (str): What happens with a recorded chunk when the queue
+            is full: 'block', 'drop-oldest', 'drop-newest' or 'coalesce'.
+        frame_time (int): Duration in milliseconds of the audio published in
+            each audioFrame message.
+        max_frame_time (int): Maximum duration in milliseconds of adaptive
+            audioFrame messages. `None` disables adaptive audio frames.
+        backend (str): The audio backend: 'pyaudio' records from an audio
+            device, 'file' records the audio of a WAV file.
+        file (str): The WAV file of the 'file' backend, or '-' for a WAV
+            stream on the standard input.
+        speed (float): The speed of the 'file' backend relative to real
+            time. 0 replays as fast as possible.
+        loop (bool): Whether the 'file' backend replays the WAV file from
+            the start at its end.
+        codec (str): The codec of the published audio: 'wav', 'ulaw',
+            'flac' or 'opus'.
+        frame_topic (str): The topic of the published audio, with '{site}'
+            for the site ID. `None` publishes PCM WAV on the audioFrame topic
+            and compressed audio on a subtopic named after the codec.
         vad (:class:`.VADConfig`): The VAD options of the configuration.
+        wakeword (:class:`.WakewordConfig`): The local wake word options of
+            the configuration.
     """
 
-    def __init__(self, enabled=False, device=None, wakeup=False, sample_rate=None, sample_width=None, channels=None, vad=None):
+    def __init__(self, enabled=False, device=None, wakeup=False, sample_rate=None, sample_width=None, channels=None,
+                 capture_mode=DEFAULT_CAPTURE_MODE, buffer_time=DEFAULT_BUFFER_TIME, keep_open=DEFAULT_KEEP_OPEN,
+                 queue_size=DEFAULT_QUEUE_SIZE, queue_policy=DEFAULT_QUEUE_POLICY,
+                 frame_time=DEFAULT_FRAME_TIME, max_frame_time=DEFAULT_MAX_FRAME_TIME,
+                 backend=DEFAULT_BACKEND, file=DEFAULT_FILE, speed=DEFAULT_SPEED, loop=DEFAULT_LOOP,
+                 codec=DEFAULT_CODEC, frame_topic=DEFAULT_FRAME_TOPIC,
+                 vad=None, wakeword=None):
         """Initialize a :class:`.RecorderConfig` object.
 
         Args:
@@ -46,9 +112,42 @@ class RecorderConfig:
                 Defaults to 2.
             channels (int): Channels for recording
                 Defaults to 1.
+            capture_mode (str): How audio is captured, 'blocking' or
+                'callback'. Defaults to 'blocking'.
+            buffer_time (float): Size of the ring buffer in seconds for the
+                'callback' capture mode. Defaults to 2.
+            keep_open (bool): Whether or not the input stream stays open while
+                not recording. Defaults to False.
+            queue_size (int): The maximum number of recorded chunks waiting
+                to be published. Defaults to 50.
+            queue_policy (str): What happens with a recorded chunk when the
+                queue is full: 'block', 'drop-oldest', 'drop-newest' or
+                'coalesce'. Defaults to 'drop-oldest'.
+            frame_time (int): Duration in milliseconds of the audio published
+                in each audioFrame message. Defaults to 120.
+            max_frame_time (int): Maximum duration in milliseconds of
+                adaptive audioFrame messages. Defaults to `None`, which
+                disables adaptive audio frames.
+            backend (str): The audio backend, 'pyaudio' or 'file'. Defaults
+                to 'pyaudio'.
+            file (str): The WAV file of the 'file' backend, or '-' for the
+                standard input. Defaults to None.
+            speed (float): The speed of the 'file' backend relative to real
+                time. Defaults to 1.
+            loop (bool): Whether the 'file' backend replays the WAV file
+                from the start at its end. Defaults to False.
+            codec (str): The codec of the published audio, 'wav', 'ulaw',
+                'flac' or 'opus'. Defaults to 'wav'.
+            frame_topic (str): The topic of the published audio, with
+                '{site}' for the site ID. Defaults to `None`, which
+                publishes PCM WAV on the audioFrame topic and compressed
+                audio on a subtopic named after the codec.
             vad (:class:`.VADConfig`, optional): The VAD settings. Defaults
                 to a default :class:`.VADConfig` object, which disables voice
                 activity detection.
+            wakeword (:class:`.WakewordConfig`, optional): The local wake
+                word settings. Defaults to a default :class:`.WakewordConfig`
+                object, which disables local wake word detection.
 
         All arguments are optional.
         """
@@ -58,12 +157,30 @@ class RecorderConfig:
         self.sample_rate = sample_rate
         self.sample_width = sample_width
         self.channels = channels
+        self.capture_mode = capture_mode
+        self.buffer_time = buffer_time
+        self.keep_open = keep_open
+        self.queue_size = queue_size
+        self.queue_policy = queue_policy
+        self.frame_time = frame_time
+        self.max_frame_time = max_frame_time
+        self.backend = backend
+        self.file = file
+        self.speed = speed
+        self.loop = loop
+        self.codec = codec
+        self.frame_topic = frame_topic
 
         if vad is None:
             self.vad = VADConfig()
         else:
             self.vad = vad
 
+        if wakeword is None:
+            self.wakeword = WakewordConfig()
+        else:
+            self.wakeword = wakeword
+
     @classmethod
     def from_json(cls, json_object=None):
         """Initialize a :class:`.RecorderConfig` object with settings from a
@@ -76,10 +193,15 @@ class RecorderConfig:
         Returns:
             :class:`.RecorderConfig`: An object with the Recorder settings.
 
+        Raises:
+            :exc:`ConfigurationError`: If the capture mode, the queue policy
+                or the VAD policy is unknown.
+
         The :attr:`vad` attribute of the :class:`.RecorderConfig` object is
         initialized with the settings from the configuration file, or not
         enabled when not specified. The VADConfig is only effectively used
-        when the :attr:`wakeup` attribute is true.
+        when the :attr:`wakeup` attribute is true. The same holds for the
+        :attr:`wakeword` attribute with the local wake word settings.
 
         The JSON object should have the following format:
 
@@ -90,22 +212,61 @@ class RecorderConfig:
             "sampleRate": 16000,
             "sampleWidth": 2,
             "channels": 1,
+            "captureMode": "blocking",
+            "bufferTime": 2,
+            "keepOpen": false,
+            "queueSize": 50,
+            "queuePolicy": "drop-oldest",
+            "frameTime": 120,
+            "maxFrameTime": 1000,
+            "backend": "pyaudio",
+            "file": "recording.wav",
+            "speed": 1,
+            "loop": false,
+            "codec": "wav",
+            "frameTopic": "hermes/audioServer/{site}/audioFrame",
             "vad": {
                 "mode": 0,
                 "silence": 2,
                 "status_messages": true
+            },
+            "wakeword": {
+                "detector": "energy",
+                "timeout": 5
             }
         }
         """
         if json_object is None:
             ret = cls(enabled=False)
         else:
+            capture_mode = json_object.get(CAPTURE_MODE, DEFAULT_CAPTURE_MODE)
+            if capture_mode not in CAPTURE_MODES:
+                raise ConfigurationError(CAPTURE_MODE, 'Unknown capture mode {}, use one of {}'
+                                         .format(capture_mode, ', '.join(CAPTURE_MODES)))
+            queue_policy = json_object.get(QUEUE_POLICY, DEFAULT_QUEUE_POLICY)
+            if queue_policy not in QUEUE_POLICIES:
+                raise ConfigurationError(QUEUE_POLICY, 'Unknown queue policy {}, use one of {}'
+                                         .format(queue_policy, ', '.join(QUEUE_POLICIES)))
             ret = cls(enabled=json_object.get(ENABLED, True),
                       device=json_object.get(DEVICE, DEFAULT_DEVICE),
                       wakeup=json_object.get(WAKEUP, False),
                       sample_rate=json_object.get(SAMPLE_RATE, DEFAULT_SAMPLE_RATE),
                       sample_width=json_object.get(SAMPLE_WIDTH, DEFAULT_SAMPLE_WIDTH),
                       channels=json_object.get(CHANNELS, DEFAULT_CHANNELS),
-                      vad=VADConfig.from_json(json_object.get(VAD)))
+                      capture_mode=capture_mode,
+                      buffer_time=json_object.get(BUFFER_TIME, DEFAULT_BUFFER_TIME),
+                      keep_open=json_object.get(KEEP_OPEN, DEFAULT_KEEP_OPEN),
+                      queue_size=json_object.get(QUEUE_SIZE, DEFAULT_QUEUE_SIZE),
+                      queue_policy=queue_policy,
+                      frame_time=json_object.get(FRAME_TIME, DEFAULT_FRAME_TIME),
+                      max_frame_time=json_object.get(MAX_FRAME_TIME, DEFAULT_MAX_FRAME_TIME),
+                      backend=json_object.get(BACKEND, DEFAULT_BACKEND),
+                      file=json_object.get(FILE, DEFAULT_FILE),
+                      speed=json_object.get(SPEED, DEFAULT_SPEED),
+                      loop=json_object.get(LOOP, DEFAULT_LOOP),
+                      codec=json_object.get(CODEC, DEFAULT_CODEC),
+                      frame_topic=json_object.get(FRAME_TOPIC, DEFAULT_FRAME_TOPIC),
+                      vad=VADConfig.from_json(json_object.get(VAD)),
+                      wakeword=WakewordConfig.from_json(json_object.get(WAKEWORD)))
 
         return ret
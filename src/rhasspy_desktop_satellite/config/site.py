@@ -0,0 +1,71 @@
+"""Classes for the configuration of rhasspy-desktop-satellite."""
+from rhasspy_desktop_satellite.config.recorder import RecorderConfig
+from rhasspy_desktop_satellite.config.player import PlayerConfig
+
+# Default values
+DEFAULT_SITE = 'default'
+
+# Keys in the JSON configuration file
+SITE = 'site'
+PLAYER = 'player'
+RECORDER = 'recorder'
+
+
+# TODO: Define __str__() for each class with explicit settings for debugging.
+class SiteConfig:
+    """This class represents the settings of a site of Rhasspy Desktop
+    Satellite.
+
+    A site has its own recorder and player, each bound to its own audio
+    device.
+
+    Attributes:
+        site (str): The site ID.
+        player (:class:`.PlayerConfig`): Player options of the site.
+        recorder (:class:`.RecorderConfig`): Recorder options of the site.
+    """
+
+    def __init__(self, site=DEFAULT_SITE, player=None, recorder=None):
+        """Initialize a :class:`.SiteConfig` object.
+
+        Args:
+            site (str): The site ID. Defaults to 'default'.
+            player (:class:`.PlayerConfig`): Player option settings.
+                Defaults to a default :class:`.PlayerConfig` object.
+            recorder (:class:`.RecorderConfig`): Recorder option settings.
+                Defaults to a default :class:`.RecorderConfig` object.
+
+        All arguments are optional.
+        """
+        self.site = site
+        self.player = PlayerConfig() if player is None else player
+        self.recorder = RecorderConfig() if recorder is None else recorder
+
+    @classmethod
+    def from_json(cls, json_object):
+        """Initialize a :class:`.SiteConfig` object with settings from a
+        JSON object.
+
+        Args:
+            json_object: The JSON object with the site settings.
+
+        Returns:
+            :class:`.SiteConfig`: An object with the site settings.
+
+        The JSON object should have the following format:
+
+        {
+            "site": "kitchen",
+            "player": {
+                "enabled": true,
+                "device": "device name"
+            },
+            "recorder": {
+                "enabled": true,
+                "device": "device name"
+            }
+        }
+        """
+        return cls(site=json_object.get(SITE, DEFAULT_SITE),
+                   player=PlayerConfig.from_json(json_object.get(PLAYER)),
+                   recorder=RecorderConfig.from_json(json_object.get(RECORDER)))
@@ -1,14 +1,22 @@
 """Class for the VAD configuration of rhasspy-desktop-satellite."""
+from rhasspy_desktop_satellite.exceptions import ConfigurationError
+from rhasspy_desktop_satellite.vad import VAD_POLICIES
 
 # Default values
 DEFAULT_MODE = 1
 DEFAULT_SILENCE = 1
 DEFAULT_STATUS_MESSAGES = False
+DEFAULT_POLICY = 'any'
+DEFAULT_RATIO = 0.5
+DEFAULT_PREROLL = 0.3
 
 # Keys in the JSON configuration file
 MODE = 'mode'
 SILENCE = 'silence'
 STATUS_MESSAGES = 'status_messages'
+POLICY = 'policy'
+RATIO = 'ratio'
+PREROLL = 'preroll'
 
 
 # TODO: Define __str__() for each class with explicit settings for debugging.
@@ -25,9 +33,17 @@ class VADConfig:
         status_messages (bool): Whether or not Rhasspy Desktop Satellite sends
             messages on MQTT when it detects the start or end of a voice
             message.
+        policy (str): How the speech decisions of the 30 ms VAD frames in a
+            recorded chunk decide whether the chunk is speech: 'any',
+            'majority' or 'ratio'.
+        ratio (float): The minimum fraction of speech frames in a chunk for
+            the 'ratio' policy.
+        preroll (float): How much audio in seconds before the start of voice
+            activity is published ahead of it.
     """
 
-    def __init__(self, enabled=False, mode=0, silence=2, status_messages=False):
+    def __init__(self, enabled=False, mode=0, silence=2, status_messages=False,
+                 policy=DEFAULT_POLICY, ratio=DEFAULT_RATIO, preroll=DEFAULT_PREROLL):
         """Initialize a :class:`.VADConfig` object.
 
         Args:
@@ -39,6 +55,15 @@ class VADConfig:
             status_messages (bool): Whether or not Rhasspy Desktop Satellite sends
                 messages on MQTT when it detects the start or end of a voice
                 message. Defaults to False.
+            policy (str): How the speech decisions of the 30 ms VAD frames
+                in a recorded chunk decide whether the chunk is speech: 'any'
+                frame, the 'majority' of frames or a 'ratio' of frames.
+                Defaults to 'any'.
+            ratio (float): The minimum fraction of speech frames in a chunk
+                for the 'ratio' policy. Defaults to 0.5.
+            preroll (float): How much audio in seconds before the start of
+                voice activity is published ahead of it, so the onset of
+                speech isn't clipped. Defaults to 0.3.
 
         All arguments are optional.
         """
@@ -46,6 +71,9 @@ class VADConfig:
         self.mode = mode
         self.silence = silence
         self.status_messages = status_messages
+        self.policy = policy
+        self.ratio = ratio
+        self.preroll = preroll
 
     @classmethod
     def from_json(cls, json_object=None):
@@ -59,21 +87,34 @@ class VADConfig:
         Returns:
             :class:`.VADConfig`: An object with the VAD settings.
 
+        Raises:
+            :exc:`ConfigurationError`: If the policy is unknown.
+
         The JSON object should have the following format:
 
         {
             "mode": 0,
             "silence": 2,
-            "status_messages": true
+            "status_messages": true,
+            "policy": "any",
+            "ratio": 0.5,
+            "preroll": 0.3
         }
         """
         if json_object is None:
             ret = cls(enabled=False)
         else:
+            policy = json_object.get(POLICY, DEFAULT_POLICY)
+            if policy not in VAD_POLICIES:
+                raise ConfigurationError('vad.' + POLICY, 'Unknown VAD policy {}, use one of {}'
+                                         .format(policy, ', '.join(VAD_POLICIES)))
             ret = cls(enabled=True,
                       mode=json_object.get(MODE, DEFAULT_MODE),
                       silence=json_object.get(SILENCE, DEFAULT_SILENCE),
                       status_messages=json_object.get(STATUS_MESSAGES,
-                                                      DEFAULT_STATUS_MESSAGES))
+                                                      DEFAULT_STATUS_MESSAGES),
+                      policy=policy,
+                      ratio=json_object.get(RATIO, DEFAULT_RATIO),
+                      preroll=json_object.get(PREROLL, DEFAULT_PREROLL))
 
         return ret
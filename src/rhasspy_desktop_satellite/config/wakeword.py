@@ -0,0 +1,86 @@
+"""Class for the wake word configuration of rhasspy-desktop-satellite."""
+
+# Default values
+DEFAULT_DETECTOR = 'energy'
+DEFAULT_WAKEWORD_ID = 'default'
+DEFAULT_TIMEOUT = 5
+
+# Keys in the JSON configuration file
+DETECTOR = 'detector'
+WAKEWORD_ID = 'wakewordId'
+TIMEOUT = 'timeout'
+OPTIONS = 'options'
+
+
+# TODO: Define __str__() for each class with explicit settings for debugging.
+class WakewordConfig:
+    """This class represents the local wake word settings for Rhasspy
+    Desktop Satellite.
+
+    Attributes:
+        enabled (bool): Whether or not local wake word detection is enabled.
+        detector (str): The wake word detector: 'energy' or the name of a
+            detector class of the form 'package.module.ClassName'.
+        wakeword_id (str): The wake word ID in the topic of the detected
+            messages.
+        timeout (float): How long in seconds audio is streamed after a
+            detection while no ASR session has started.
+        options (dict): The options of the detector.
+    """
+
+    def __init__(self, enabled=False, detector=DEFAULT_DETECTOR,
+                 wakeword_id=DEFAULT_WAKEWORD_ID, timeout=DEFAULT_TIMEOUT, options=None):
+        """Initialize a :class:`.WakewordConfig` object.
+
+        Args:
+            enabled (bool): Whether or not local wake word detection is
+                enabled. Defaults to False.
+            detector (str): The wake word detector. Defaults to 'energy'.
+            wakeword_id (str): The wake word ID in the topic of the detected
+                messages. Defaults to 'default'.
+            timeout (float): How long in seconds audio is streamed after a
+                detection while no ASR session has started. Defaults to 5.
+            options (dict): The options of the detector. Defaults to {}.
+
+        All arguments are optional.
+        """
+        self.enabled = enabled
+        self.detector = detector
+        self.wakeword_id = wakeword_id
+        self.timeout = timeout
+        self.options = {} if options is None else options
+
+    @classmethod
+    def from_json(cls, json_object=None):
+        """Initialize a :class:`.WakewordConfig` object with settings from a
+        JSON object.
+
+        Args:
+            json_object (optional): The JSON object with the wake word
+                settings. Defaults to {}.
+
+        Returns:
+            :class:`.WakewordConfig`: An object with the wake word settings.
+
+        The JSON object should have the following format:
+
+        {
+            "detector": "energy",
+            "wakewordId": "default",
+            "timeout": 5,
+            "options": {
+                "threshold": 0.1,
+                "duration": 0.3
+            }
+        }
+        """
+        if json_object is None:
+            ret = cls(enabled=False)
+        else:
+            ret = cls(enabled=True,
+                      detector=json_object.get(DETECTOR, DEFAULT_DETECTOR),
+                      wakeword_id=json_object.get(WAKEWORD_ID, DEFAULT_WAKEWORD_ID),
+                      timeout=json_object.get(TIMEOUT, DEFAULT_TIMEOUT),
+                      options=json_object.get(OPTIONS))
+
+        return ret
@@ -0,0 +1,132 @@
+"""Module with the cache of resolved audio devices.
+
+Probing all audio devices for a device name can take seconds on hosts with
+PulseAudio or JACK. The cache remembers which device a configured name
+pattern resolved to, so the next start checks only that device.
+"""
+import json
+import os
+import re
+
+CACHE_VERSION = 1
+
+
+def default_cache_path():
+    """Return the default path of the device cache file: in the cache
+    directory systemd creates for the service, or else in the XDG cache
+    directory of the user."""
+    cache_directory = os.environ.get('CACHE_DIRECTORY')
+    if cache_directory:
+        return os.path.join(cache_directory.split(':')[0], 'devices.json')
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_home, 'rhasspy-desktop-satellite', 'devices.json')
+
+
+class DeviceCache:
+    """This class caches the audio devices that name patterns resolved to.
+
+    An entry holds the index, the name and the host API of a device. It is
+    valid as long as the device at the index still has the same name and
+    host API, still matches the pattern and still has channels in the
+    direction it's used for.
+
+    Attributes:
+        path (str): The path of the cache file.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that needed a full probe.
+    """
+
+    def __init__(self, path):
+        """Initialize a :class:`.DeviceCache` object.
+
+        Args:
+            path (str): The path of the cache file.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._changed = False
+
+    @staticmethod
+    def key(pattern, channels):
+        """Return the key of the entry of a name pattern and direction."""
+        return '{}:{}'.format(channels, pattern)
+
+    def load(self):
+        """Read the cache file. A missing or invalid file leaves the cache
+        empty.
+
+        Returns:
+            bool: Whether the cache file was read.
+        """
+        try:
+            with open(self.path, 'r') as cache_file:
+                content = json.load(cache_file)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(content, dict) or content.get('version') != CACHE_VERSION:
+            return False
+        self._entries = content.get('devices', {})
+        return True
+
+    def save(self):
+        """Write the cache file if the cache changed.
+
+        Raises:
+            :exc:`OSError`: If the cache file can't be written.
+        """
+        if not self._changed:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as cache_file:
+            json.dump({'version': CACHE_VERSION, 'devices': self._entries}, cache_file,
+                      indent=2, sort_keys=True)
+        os.replace(temporary, self.path)
+        self._changed = False
+
+    def lookup(self, audio, pattern, channels):
+        """Look up the device a name pattern resolved to, and check it with a
+        single query of the audio backend.
+
+        Args:
+            audio: The audio backend.
+            pattern (str): The regular expression for the device name.
+            channels (str): The key of the number of channels the device
+                needs, 'maxInputChannels' or 'maxOutputChannels'.
+
+        Returns:
+            tuple: The index and the information of the device, or `None` if
+            the cache has no valid entry.
+        """
+        entry = self._entries.get(self.key(pattern, channels))
+        device = None
+        if entry is not None:
+            try:
+                device = audio.get_device_info_by_index(entry['index'])
+            except (OSError, IndexError, KeyError, TypeError):
+                device = None
+        if device is None or device['name'] != entry['name'] \
+                or device.get('hostApi') != entry['hostApi'] \
+                or not device[channels] or not re.match(pattern, device['name']):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['index'], device
+
+    def store(self, pattern, channels, index, device):
+        """Remember the device a name pattern resolved to.
+
+        Args:
+            pattern (str): The regular expression for the device name.
+            channels (str): The key of the number of channels the device
+                needs.
+            index (int): The index of the device.
+            device (dict): The information of the device.
+        """
+        entry = {'index': index, 'name': device['name'], 'hostApi': device.get('hostApi')}
+        key = self.key(pattern, channels)
+        if self._entries.get(key) != entry:
+            self._entries[key] = entry
+            self._changed = True
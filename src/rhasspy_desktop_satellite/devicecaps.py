@@ -0,0 +1,202 @@
+"""Module with the capabilities of audio devices.
+
+PortAudio reports only the default sample rate of a device, but most devices
+accept several formats natively. The capabilities are probed with
+:meth:`pyaudio.PyAudio.is_format_supported`, so the recorder and the player
+can pick a format that the device takes without conversion. Audio is only
+converted by the satellite when the device supports no matching format.
+"""
+
+STANDARD_RATES = (8000, 11025, 16000, 22050, 24000, 32000, 44100, 48000, 88200, 96000)
+SAMPLE_WIDTHS = (1, 2, 3, 4)
+
+
+class DeviceCapabilities:
+    """This class probes which audio formats an audio device accepts
+    natively. The device and every format are probed once, when they're
+    first needed.
+
+    Attributes:
+        index (int): The index of the device, or -1 for the default device.
+        output (bool): Whether the device is probed for output or input.
+    """
+
+    def __init__(self, audio, index, output):
+        """Initialize a :class:`.DeviceCapabilities` object.
+
+        Args:
+            audio: The audio backend, a :class:`pyaudio.PyAudio` object or a
+                stand-in.
+            index (int): The index of the device, or -1 for the default
+                device.
+            output (bool): Whether the device is probed for output or input.
+        """
+        self.audio = audio
+        self.index = index
+        self.output = output
+        self._device = None
+        self._supported = {}
+
+    def device(self):
+        """Return the information of the device, resolving the default
+        device.
+
+        Raises:
+            :exc:`OSError`: If there's no default device.
+        """
+        if self._device is None:
+            if self.index >= 0:
+                self._device = self.audio.get_device_info_by_index(self.index)
+            elif self.output:
+                self._device = self.audio.get_default_output_device_info()
+            else:
+                self._device = self.audio.get_default_input_device_info()
+        return self._device
+
+    @property
+    def max_channels(self):
+        """The maximum number of channels of the device."""
+        try:
+            device = self.device()
+        except OSError:
+            return 1
+        return max(int(device['maxOutputChannels' if self.output else 'maxInputChannels']), 1)
+
+    def supports(self, rate, width, channels):
+        """Return True if the device accepts an audio format natively.
+
+        Args:
+            rate (int): The sample rate.
+            width (int): The sample width in bytes.
+            channels (int): The number of channels.
+        """
+        key = (rate, width, channels)
+        supported = self._supported.get(key)
+        if supported is None:
+            supported = self._probe(rate, width, channels)
+            self._supported[key] = supported
+        return supported
+
+    def _probe(self, rate, width, channels):
+        """Ask PortAudio whether the device accepts an audio format."""
+        if channels > self.max_channels:
+            return False
+        direction = 'output' if self.output else 'input'
+        try:
+            options = {direction + '_device': self.device()['index'],
+                       direction + '_channels': channels,
+                       direction + '_format': self.audio.get_format_from_width(width)}
+            return bool(self.audio.is_format_supported(rate, **options))
+        except (ValueError, OSError, KeyError):
+            return False
+
+    def rates(self, width, channels):
+        """Return the standard sample rates the device accepts natively for a
+        sample width and number of channels."""
+        return [rate for rate in STANDARD_RATES if self.supports(rate, width, channels)]
+
+    def table(self):
+        """Probe all standard formats.
+
+        Returns:
+            dict: The natively supported sample rates by sample width and
+            number of channels.
+        """
+        table = {}
+        for width in SAMPLE_WIDTHS:
+            for channels in range(1, self.max_channels + 1):
+                rates = self.rates(width, channels)
+                if rates:
+                    table[(width, channels)] = rates
+        return table
+
+    def closest_rate(self, rate, width, channels):
+        """Return the native sample rate that converts most cheaply to or
+        from a sample rate.
+
+        An integer multiple of the sample rate is preferred, then the lowest
+        higher rate, then the highest lower rate.
+
+        Returns:
+            int: The sample rate, or `None` if the device supports no
+            standard rate with the sample width and number of channels.
+        """
+        rates = self.rates(width, channels)
+        if rate in rates:
+            return rate
+        multiples = [native for native in rates if native % rate == 0]
+        if multiples:
+            return multiples[0]
+        higher = [native for native in rates if native > rate]
+        if higher:
+            return higher[0]
+        return rates[-1] if rates else None
+
+    def choose(self, rate, width, channels):
+        """Choose the native audio format closest to an audio format.
+
+        The sample rate is changed first, then the sample width and then the
+        number of channels.
+
+        Args:
+            rate (int): The sample rate.
+            width (int): The sample width in bytes.
+            channels (int): The number of channels.
+
+        Returns:
+            tuple: The sample rate, sample width and number of channels of
+            the native format. This is the requested format if the device
+            supports it, or if it supports no standard format at all.
+        """
+        if self.supports(rate, width, channels):
+            return rate, width, channels
+        widths = [width] + sorted((other for other in SAMPLE_WIDTHS if other != width),
+                                  key=lambda other: (other < width, abs(other - width)))
+        channel_counts = [channels] + [other for other in range(1, self.max_channels + 1)
+                                       if other != channels]
+        for native_channels in channel_counts:
+            for native_width in widths:
+                native_rate = self.closest_rate(rate, native_width, native_channels)
+                if native_rate is not None:
+                    return native_rate, native_width, native_channels
+        return rate, width, channels
+
+
+class FormatConverter:
+    """This class converts consecutive chunks of audio from one audio format
+    to another one with a DSP backend."""
+
+    def __init__(self, dsp, source, target):
+        """Initialize a :class:`.FormatConverter` object.
+
+        Args:
+            dsp: The DSP backend.
+            source (tuple): The sample rate, sample width and number of
+                channels of the audio.
+            target (tuple): The sample rate, sample width and number of
+                channels of the converted audio.
+        """
+        self.dsp = dsp
+        self.rate, self.width, self.channels = source
+        self.target_rate, self.target_width, self.target_channels = target
+        self.resampler = None
+        if self.rate != self.target_rate:
+            self.resampler = dsp.resampler(self.target_width, self.target_channels,
+                                           self.rate, self.target_rate)
+
+    def convert(self, frames):
+        """Convert a chunk of audio.
+
+        Args:
+            frames (bytes-like): The audio frames in the source format.
+
+        Returns:
+            bytes: The audio frames in the target format.
+        """
+        if self.channels != self.target_channels:
+            frames = self.dsp.tomono(frames, self.width, self.channels)
+            frames = self.dsp.tochannels(frames, self.width, self.target_channels)
+        frames = self.dsp.lin2lin(frames, self.width, self.target_width)
+        if self.resampler is not None:
+            frames = self.resampler.convert(frames)
+        return frames
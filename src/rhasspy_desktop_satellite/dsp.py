@@ -0,0 +1,513 @@
+"""Module with the digital signal processing of recorded and played audio.
+
+Two interchangeable DSP backends are available. The NumPy backend processes
+whole blocks of audio with vectorized operations. The audioop backend uses
+the :mod:`audioop` module of the standard library, which is removed in
+Python 3.13. Both backends produce identical output for mono and stereo
+audio.
+"""
+from math import gcd, sqrt
+import sys
+
+from rhasspy_desktop_satellite.codec import ULAW_BIAS, ULAW_CLIP, ulaw_decode_sample
+
+AUDIOOP = 'audioop'
+NUMPY = 'numpy'
+DSP_BACKENDS = (NUMPY, AUDIOOP)
+
+
+class AudioopDSP:
+    """This class implements the DSP operations with :mod:`audioop`.
+
+    Attributes:
+        name (str): The name of the backend.
+    """
+
+    name = AUDIOOP
+
+    def __init__(self):
+        """Initialize an :class:`.AudioopDSP` object.
+
+        Raises:
+            :exc:`ImportError`: If :mod:`audioop` isn't available.
+        """
+        # pylint: disable=import-outside-toplevel,deprecated-module
+        import audioop
+        self.audioop = audioop
+
+    def tomono(self, frames, width, channels):
+        """Downmix audio frames to mono by averaging the channels.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+            channels (int): The number of channels.
+
+        Returns:
+            bytes: The mono audio frames.
+
+        :mod:`audioop` can't average more than two channels, so audio with
+        more channels is downmixed to its first channel.
+        """
+        if channels == 1:
+            return bytes(frames)
+        if channels == 2:
+            return self.audioop.tomono(frames, width, 0.5, 0.5)
+        frame_width = width * channels
+        return b''.join(frames[index:index + width]
+                        for index in range(0, len(frames), frame_width))
+
+    def tochannels(self, frames, width, channels):
+        """Copy mono audio frames to every channel.
+
+        Args:
+            frames (bytes-like): The mono audio frames.
+            width (int): The sample width in bytes.
+            channels (int): The number of channels.
+
+        Returns:
+            bytes: The audio frames with the number of channels.
+        """
+        if channels == 1:
+            return bytes(frames)
+        if channels == 2:
+            return self.audioop.tostereo(frames, width, 1, 1)
+        frames = bytes(frames)
+        return b''.join(frames[index:index + width] * channels
+                        for index in range(0, len(frames), width))
+
+    def lin2lin(self, frames, width, new_width):
+        """Convert audio frames to another sample width.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+            new_width (int): The new sample width in bytes.
+
+        Returns:
+            bytes: The converted audio frames.
+        """
+        if width == new_width:
+            return bytes(frames)
+        return self.audioop.lin2lin(frames, width, new_width)
+
+    def gain(self, frames, width, factor):
+        """Multiply audio samples by a factor, clipping on overflow.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+            factor (float): The gain factor.
+
+        Returns:
+            bytes: The amplified audio frames.
+        """
+        return self.audioop.mul(frames, width, factor)
+
+    def bias(self, frames, width, bias):
+        """Add a bias to audio samples, wrapping around on overflow, for
+        instance to convert unsigned 8-bit audio to signed audio.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+            bias (int): The bias.
+
+        Returns:
+            bytes: The biased audio frames.
+        """
+        return self.audioop.bias(frames, width, bias)
+
+    def rms(self, frames, width):
+        """Return the root mean square of audio samples.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+
+        Returns:
+            int: The RMS level of the samples.
+        """
+        return self.audioop.rms(frames, width)
+
+    def lin2ulaw(self, frames):
+        """Encode 16-bit little-endian audio as μ-law.
+
+        Args:
+            frames (bytes-like): The audio frames.
+
+        Returns:
+            bytes: The μ-law audio, one byte per sample.
+        """
+        if sys.byteorder == 'big':
+            frames = self.audioop.byteswap(frames, 2)
+        return self.audioop.lin2ulaw(frames, 2)
+
+    def ulaw2lin(self, frames):
+        """Decode μ-law audio to 16-bit little-endian audio.
+
+        Args:
+            frames (bytes-like): The μ-law audio.
+
+        Returns:
+            bytes: The audio frames.
+        """
+        frames = self.audioop.ulaw2lin(frames, 2)
+        if sys.byteorder == 'big':
+            frames = self.audioop.byteswap(frames, 2)
+        return frames
+
+    def resampler(self, width, channels, in_rate, out_rate):
+        """Create a resampler that keeps its state across chunks.
+
+        Args:
+            width (int): The sample width in bytes.
+            channels (int): The number of channels.
+            in_rate (int): The sample rate of the input.
+            out_rate (int): The sample rate of the output.
+
+        Returns:
+            :class:`.AudioopResampler`: The resampler.
+        """
+        return AudioopResampler(self.audioop, width, channels, in_rate, out_rate)
+
+
+class AudioopResampler:
+    """This class resamples consecutive chunks of audio with
+    :func:`audioop.ratecv`."""
+
+    def __init__(self, audioop, width, channels, in_rate, out_rate):
+        """Initialize an :class:`.AudioopResampler` object."""
+        self.audioop = audioop
+        self.width = width
+        self.channels = channels
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.state = None
+
+    def convert(self, frames):
+        """Resample a chunk of audio frames.
+
+        Args:
+            frames (bytes-like): The audio frames.
+
+        Returns:
+            bytes: The resampled audio frames.
+        """
+        converted, self.state = self.audioop.ratecv(frames, self.width,
+                                                    self.channels,
+                                                    self.in_rate,
+                                                    self.out_rate,
+                                                    self.state)
+        return converted
+
+    def reset(self):
+        """Forget the state of previous chunks."""
+        self.state = None
+
+
+class NumpyDSP:
+    """This class implements the DSP operations with vectorized NumPy
+    operations.
+
+    Samples are interpreted exactly like :mod:`audioop` does, so the
+    results are identical to those of :class:`.AudioopDSP`.
+
+    Attributes:
+        name (str): The name of the backend.
+    """
+
+    name = NUMPY
+
+    def __init__(self):
+        """Initialize a :class:`.NumpyDSP` object.
+
+        Raises:
+            :exc:`ImportError`: If NumPy isn't available.
+        """
+        # pylint: disable=import-outside-toplevel
+        import numpy
+        self.np = numpy
+        self._ulaw_tables = None
+
+    def samples(self, frames, width):
+        """Decode audio frames to an array of signed integer samples.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+
+        Returns:
+            :class:`numpy.ndarray`: The samples as 32-bit integers.
+        """
+        np = self.np
+        if width == 3:
+            raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+            samples = (raw[:, 0].astype(np.int32)
+                       | (raw[:, 1].astype(np.int32) << 8)
+                       | (raw[:, 2].astype(np.int8).astype(np.int32) << 16))
+            return samples
+        dtype = {1: np.int8, 2: '<i2', 4: '<i4'}[width]
+        return np.frombuffer(frames, dtype=dtype).astype(np.int32)
+
+    def frames(self, samples, width):
+        """Encode an array of signed integer samples to audio frames.
+
+        Args:
+            samples (:class:`numpy.ndarray`): The samples, which must fit in
+                the sample width.
+            width (int): The sample width in bytes.
+
+        Returns:
+            bytes: The audio frames.
+        """
+        np = self.np
+        if width == 3:
+            samples = samples.astype('<i4').view(np.uint8).reshape(-1, 4)
+            return samples[:, :3].tobytes()
+        dtype = {1: np.int8, 2: '<i2', 4: '<i4'}[width]
+        return samples.astype(dtype).tobytes()
+
+    def tomono(self, frames, width, channels):
+        """Downmix audio frames to mono by averaging the channels.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+            channels (int): The number of channels.
+
+        Returns:
+            bytes: The mono audio frames.
+        """
+        if channels == 1:
+            return bytes(frames)
+        np = self.np
+        samples = self.samples(frames, width).reshape(-1, channels)
+        mono = np.floor_divide(samples.sum(axis=1, dtype=np.int64), channels)
+        return self.frames(mono, width)
+
+    def tochannels(self, frames, width, channels):
+        """Copy mono audio frames to every channel.
+
+        Args:
+            frames (bytes-like): The mono audio frames.
+            width (int): The sample width in bytes.
+            channels (int): The number of channels.
+
+        Returns:
+            bytes: The audio frames with the number of channels.
+        """
+        if channels == 1:
+            return bytes(frames)
+        np = self.np
+        samples = np.frombuffer(frames, dtype=np.uint8).reshape(-1, width)
+        return np.repeat(samples, channels, axis=0).tobytes()
+
+    def lin2lin(self, frames, width, new_width):
+        """Convert audio frames to another sample width.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+            new_width (int): The new sample width in bytes.
+
+        Returns:
+            bytes: The converted audio frames.
+        """
+        if width == new_width:
+            return bytes(frames)
+        samples = self.samples(frames, width).astype(self.np.int64)
+        samples = (samples << (32 - 8 * width)) >> (32 - 8 * new_width)
+        return self.frames(samples, new_width)
+
+    def gain(self, frames, width, factor):
+        """Multiply audio samples by a factor, clipping on overflow.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+            factor (float): The gain factor.
+
+        Returns:
+            bytes: The amplified audio frames.
+        """
+        np = self.np
+        maxval = (1 << (8 * width - 1)) - 1
+        samples = self.samples(frames, width) * float(factor)
+        samples = np.floor(np.clip(samples, -maxval - 1, maxval))
+        return self.frames(samples, width)
+
+    def bias(self, frames, width, bias):
+        """Add a bias to audio samples, wrapping around on overflow, for
+        instance to convert unsigned 8-bit audio to signed audio.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+            bias (int): The bias.
+
+        Returns:
+            bytes: The biased audio frames.
+        """
+        half = 1 << (8 * width - 1)
+        samples = self.samples(frames, width).astype(self.np.int64) + bias
+        return self.frames((samples + half) % (2 * half) - half, width)
+
+    def rms(self, frames, width):
+        """Return the root mean square of audio samples.
+
+        Args:
+            frames (bytes-like): The audio frames.
+            width (int): The sample width in bytes.
+
+        Returns:
+            int: The RMS level of the samples.
+        """
+        samples = self.samples(frames, width).astype(self.np.float64)
+        if not samples.size:
+            return 0
+        return int(sqrt(self.np.dot(samples, samples) / samples.size))
+
+    def ulaw_tables(self):
+        """Return the lookup tables of the μ-law codec.
+
+        The encoding table is computed with the same steps as
+        :func:`.ulaw_encode_sample`, for all 16-bit samples at once.
+
+        Returns:
+            tuple: The μ-law bytes indexed by the unsigned 16-bit value of a
+            sample, and the 16-bit samples indexed by the μ-law byte.
+        """
+        if self._ulaw_tables is None:
+            np = self.np
+            value = np.arange(65536, dtype=np.int32)
+            value = np.where(value > 32767, value - 65536, value) >> 2
+            mask = np.where(value < 0, 0x7F, 0xFF)
+            magnitude = np.minimum(np.abs(value), ULAW_CLIP) + (ULAW_BIAS >> 2)
+            # The exponent of frexp is the bit length of the magnitude.
+            segment = np.maximum(np.frexp(magnitude)[1] - 6, 0)
+            encode = np.where(segment >= 8, 0x7F,
+                              (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)) ^ mask
+            decode = np.array([ulaw_decode_sample(byte) for byte in range(256)], dtype='<i2')
+            self._ulaw_tables = (encode.astype(np.uint8), decode)
+        return self._ulaw_tables
+
+    def lin2ulaw(self, frames):
+        """Encode 16-bit little-endian audio as μ-law.
+
+        Args:
+            frames (bytes-like): The audio frames.
+
+        Returns:
+            bytes: The μ-law audio, one byte per sample.
+        """
+        encode, _ = self.ulaw_tables()
+        return encode[self.np.frombuffer(frames, dtype='<u2')].tobytes()
+
+    def ulaw2lin(self, frames):
+        """Decode μ-law audio to 16-bit little-endian audio.
+
+        Args:
+            frames (bytes-like): The μ-law audio.
+
+        Returns:
+            bytes: The audio frames.
+        """
+        _, decode = self.ulaw_tables()
+        return decode[self.np.frombuffer(frames, dtype=self.np.uint8)].tobytes()
+
+    def resampler(self, width, channels, in_rate, out_rate):
+        """Create a resampler that keeps its state across chunks.
+
+        Args:
+            width (int): The sample width in bytes.
+            channels (int): The number of channels.
+            in_rate (int): The sample rate of the input.
+            out_rate (int): The sample rate of the output.
+
+        Returns:
+            :class:`.NumpyResampler`: The resampler.
+        """
+        return NumpyResampler(self, width, channels, in_rate, out_rate)
+
+
+class NumpyResampler:
+    """This class resamples consecutive chunks of audio with the linear
+    interpolation of :func:`audioop.ratecv`, computed for a whole chunk at
+    once.
+    """
+
+    def __init__(self, dsp, width, channels, in_rate, out_rate):
+        """Initialize a :class:`.NumpyResampler` object."""
+        self.dsp = dsp
+        self.width = width
+        self.channels = channels
+        divisor = gcd(in_rate, out_rate)
+        self.in_rate = in_rate // divisor
+        self.out_rate = out_rate // divisor
+        self.shift = 32 - 8 * width
+        self.reset()
+
+    def reset(self):
+        """Forget the state of previous chunks."""
+        self.position = -self.out_rate
+        self.last = self.dsp.np.zeros((1, self.channels), dtype=self.dsp.np.int64)
+
+    def convert(self, frames):
+        """Resample a chunk of audio frames.
+
+        Args:
+            frames (bytes-like): The audio frames.
+
+        Returns:
+            bytes: The resampled audio frames.
+        """
+        np = self.dsp.np
+        in_rate, out_rate, position = self.in_rate, self.out_rate, self.position
+        samples = self.dsp.samples(frames, self.width).astype(np.int64)
+        samples = (samples << self.shift).reshape(-1, self.channels)
+        count = len(samples)
+
+        outputs = max(0, (count * out_rate + position) // in_rate + 1)
+        steps = np.arange(outputs, dtype=np.int64) * in_rate
+        # Index of the input frame after which each output frame is emitted.
+        index = -((position - steps) // out_rate) - 1
+        weight = (position + (index + 1) * out_rate - steps)[:, None]
+
+        padded = np.concatenate((self.last, samples))
+        previous = padded[index]
+        current = padded[index + 1]
+        numerator = previous * weight + current * (out_rate - weight)
+        converted = np.sign(numerator) * (np.abs(numerator) // out_rate)
+
+        self.position = position + count * out_rate - outputs * in_rate
+        if count:
+            self.last = samples[-1:]
+        return self.dsp.frames((converted >> self.shift).reshape(-1), self.width)
+
+
+def create_dsp(backend=None):
+    """Create a DSP backend.
+
+    Args:
+        backend (str, optional): The name of the backend, 'numpy' or
+            'audioop'. When `None`, NumPy is used if it is installed and
+            audioop otherwise.
+
+    Returns:
+        The DSP backend.
+
+    Raises:
+        :exc:`ValueError`: If the backend is unknown.
+        :exc:`ImportError`: If the backend isn't available.
+    """
+    if backend == NUMPY:
+        return NumpyDSP()
+    if backend == AUDIOOP:
+        return AudioopDSP()
+    if backend is None:
+        try:
+            return NumpyDSP()
+        except ImportError:
+            return AudioopDSP()
+    raise ValueError('Unknown DSP backend {}'.format(backend))
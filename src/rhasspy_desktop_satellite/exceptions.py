@@ -32,3 +32,43 @@ class UnsupportedPlatformError(RDSatelliteServerError):
     def __init__(self, platform):
         """Initialize the exception with a string representing the platform."""
         self.platform = platform
+
+
+class AudioBackendError(RDSatelliteServerError):
+    """Raised when an audio backend can't be created."""
+
+    def __init__(self, inout, reason):
+        """Initialize the exception with a string representing input or output
+        and a string with the reason."""
+        self.inout = inout
+        self.reason = reason
+
+
+class WakewordDetectorError(RDSatelliteServerError):
+    """Raised when a wake word detector can't be created."""
+
+    def __init__(self, detector, reason):
+        """Initialize the exception with a string representing the detector
+        and a string with the reason."""
+        self.detector = detector
+        self.reason = reason
+
+
+class ConfigurationError(RDSatelliteServerError):
+    """Raised when a setting in the configuration file is invalid."""
+
+    def __init__(self, setting, reason):
+        """Initialize the exception with a string representing the setting
+        and a string with the reason."""
+        self.setting = setting
+        self.reason = reason
+
+
+class AudioCodecError(RDSatelliteServerError):
+    """Raised when an audio codec can't be used."""
+
+    def __init__(self, codec, reason):
+        """Initialize the exception with a string representing the codec and
+        a string with the reason."""
+        self.codec = codec
+        self.reason = reason
@@ -0,0 +1,87 @@
+"""Module with the WAV framing of recorded audio chunks."""
+import struct
+
+WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+WAV_EXTENDED_HEADER = struct.Struct('<4sI4s4sIHHIIHHH4sII4sI')
+WAV_FORMAT_PCM = 1
+WAV_FORMAT_MULAW = 7
+MAX_CACHED_HEADERS = 16
+
+
+def wav_header(rate, width, channels, data_length, format_tag=WAV_FORMAT_PCM):
+    """Build the RIFF header of a WAV file.
+
+    Args:
+        rate (int): The sample rate.
+        width (int): The sample width in bytes.
+        channels (int): The number of channels.
+        data_length (int): The length of the audio data in bytes.
+        format_tag (int, optional): The format of the audio data. Defaults
+            to PCM.
+
+    Returns:
+        bytes: The WAV header, identical to the one written by the
+        :mod:`wave` module for PCM audio. Other formats get the 18-byte
+        ``fmt `` chunk with an empty extension and the ``fact`` chunk with
+        the number of samples per channel that the WAV format requires
+        for non-PCM audio.
+    """
+    block_align = width * channels
+    if format_tag != WAV_FORMAT_PCM:
+        return WAV_EXTENDED_HEADER.pack(
+            b'RIFF', 50 + data_length, b'WAVE',
+            b'fmt ', 18, format_tag, channels, rate,
+            rate * block_align, block_align, width * 8, 0,
+            b'fact', 4, data_length // block_align,
+            b'data', data_length)
+    return WAV_HEADER.pack(b'RIFF', 36 + data_length, b'WAVE',
+                           b'fmt ', 16, format_tag, channels, rate,
+                           rate * block_align, block_align, width * 8,
+                           b'data', data_length)
+
+
+class WavFramer:
+    """This class frames audio chunks as WAV files for audioFrame messages.
+
+    The audio format is fixed for the life of the recorder stream, so the
+    WAV header is built once for each chunk length and every payload is
+    built with a single concatenation.
+    """
+
+    def __init__(self, rate, width, channels, format_tag=WAV_FORMAT_PCM):
+        """Initialize a :class:`.WavFramer` object.
+
+        Args:
+            rate (int): The sample rate of the audio chunks.
+            width (int): The sample width of the audio chunks.
+            channels (int): The number of channels of the audio chunks.
+            format_tag (int, optional): The format of the audio chunks.
+                Defaults to PCM.
+        """
+        self.rate = rate
+        self.width = width
+        self.channels = channels
+        self.format_tag = format_tag
+        self._headers = {}
+
+    def header(self, data_length):
+        """Return the WAV header for audio data of a given length."""
+        header = self._headers.get(data_length)
+        if header is None:
+            if len(self._headers) >= MAX_CACHED_HEADERS:
+                self._headers.clear()
+            header = wav_header(self.rate, self.width, self.channels, data_length,
+                                self.format_tag)
+            self._headers[data_length] = header
+        return header
+
+    def frame(self, chunk):
+        """Frame an audio chunk as a WAV file.
+
+        Args:
+            chunk (bytes-like): The audio data.
+
+        Returns:
+            bytes: The WAV file.
+        """
+        return b''.join((self.header(len(chunk)), chunk))
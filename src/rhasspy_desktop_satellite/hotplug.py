@@ -0,0 +1,162 @@
+"""Module with the watcher of audio device changes.
+
+PortAudio only enumerates the audio devices when it's initialized, so it
+doesn't notice a USB headset that is plugged in or a laptop that is docked.
+The watcher polls a cheap signature of the devices of the host and calls
+back when it changes, so the server can initialize PortAudio again and move
+the streams of its sites to their devices. A failed audio stream makes the
+watcher check the signature right away, but only a changed signature leads
+to a rescan.
+"""
+import asyncio
+import subprocess
+import sys
+import time
+
+ASOUND_CARDS = '/proc/asound/cards'
+# PortAudio only enumerates the devices once per process, so the fallback
+# signature is taken by a child process.
+PORTAUDIO_DEVICES = ('import pyaudio\n'
+                     'audio = pyaudio.PyAudio()\n'
+                     'print(audio.get_device_count())\n'
+                     'for index in range(audio.get_device_count()):\n'
+                     '    print(audio.get_device_info_by_index(index)["name"])\n'
+                     'audio.terminate()\n')
+PORTAUDIO_TIMEOUT = 10  # maximum time to enumerate the PortAudio devices (s)
+SETTLE_TIME = 1  # time the devices settle before they are rescanned (s)
+MAX_TRIGGER_DELAY = 60  # maximum time triggers are ignored after a false alarm (s)
+
+
+def device_signature():
+    """Return a signature of the audio devices of the host.
+
+    On Linux this is the list of ALSA sound cards, which changes when a
+    device is plugged in or unplugged. On hosts without ALSA it's the
+    signature of the PortAudio devices.
+
+    Returns:
+        str: The signature, or `None` if it isn't available on the host.
+    """
+    try:
+        with open(ASOUND_CARDS, 'r') as cards:
+            return cards.read()
+    except OSError:
+        return portaudio_signature()
+
+
+def portaudio_signature():
+    """Return the number and the names of the PortAudio devices of the host.
+
+    The devices are enumerated by a fresh PortAudio instance in a child
+    process, which takes a while, so this doesn't run on the event loop.
+
+    Returns:
+        str: The signature, or `None` if the devices can't be enumerated.
+    """
+    try:
+        result = subprocess.run([sys.executable, '-c', PORTAUDIO_DEVICES],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True, timeout=PORTAUDIO_TIMEOUT,
+                                check=True)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout
+
+
+class DeviceWatcher:
+    """This class watches the audio devices of the host on the event loop.
+
+    Attributes:
+        interval (float): The time in seconds between two checks of the
+            device signature.
+        rescans (int): The number of times the callback was called.
+        false_triggers (int): The number of triggers after which the
+            signature hadn't changed.
+    """
+
+    def __init__(self, interval, callback, signature=device_signature,
+                 settle_time=SETTLE_TIME, max_trigger_delay=MAX_TRIGGER_DELAY,
+                 logger=None):
+        """Initialize a :class:`.DeviceWatcher` object.
+
+        Args:
+            interval (float): The time in seconds between two checks of the
+                device signature.
+            callback: The coroutine function that is called when the
+                devices changed.
+            signature (optional): The function that returns the signature
+                of the devices. Defaults to :func:`device_signature`.
+            settle_time (float, optional): The time in seconds the devices
+                settle after a change or a trigger before the signature is
+                checked again. Defaults to 1.
+            max_trigger_delay (float, optional): The maximum time in seconds
+                triggers are ignored after triggers that didn't come with a
+                change of the signature. The time starts at the settle time
+                and doubles with each such trigger. Defaults to 60.
+            logger (:class:`logging.Logger`, optional): The Logger object for
+                logging messages.
+        """
+        self.interval = interval
+        self.callback = callback
+        self.signature = signature
+        self.settle_time = settle_time
+        self.max_trigger_delay = max_trigger_delay
+        self.logger = logger
+        self.rescans = 0
+        self.false_triggers = 0
+        self._triggered = None
+        self._trigger_delay = settle_time
+        self._ignore_until = 0
+
+    def trigger(self):
+        """Check the device signature without waiting for the interval, e.g.
+        after an audio stream failed. This runs on the event loop.
+
+        Triggers are ignored for a while after triggers that didn't come with
+        a change of the signature, so a stream that keeps failing for another
+        reason doesn't keep the watcher busy.
+        """
+        if self._triggered is not None and time.monotonic() >= self._ignore_until:
+            self._triggered.set()
+
+    async def check(self):
+        """Return the device signature, which is read in a worker thread."""
+        return await asyncio.get_event_loop().run_in_executor(None, self.signature)
+
+    async def run(self):
+        """Watch the devices until the task is cancelled.
+
+        The watcher stops right away if the host has no device signature.
+        """
+        last_signature = await self.check()
+        if last_signature is None:
+            if self.logger is not None:
+                self.logger.warning('Audio device changes can\'t be detected on this '
+                                    'host. Restart the satellite after plugging in '
+                                    'or unplugging an audio device.')
+            return
+        self._triggered = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._triggered.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            triggered = self._triggered.is_set()
+            if triggered:
+                # An unplugged device may take a moment to disappear.
+                await asyncio.sleep(self.settle_time)
+                self._triggered.clear()
+            signature = await self.check()
+            if signature is None or signature == last_signature:
+                if triggered:
+                    self.false_triggers += 1
+                    self._ignore_until = time.monotonic() + self._trigger_delay
+                    self._trigger_delay = min(2 * self._trigger_delay, self.max_trigger_delay)
+                continue
+            await asyncio.sleep(self.settle_time)
+            self._triggered.clear()
+            self._trigger_delay = self.settle_time
+            self._ignore_until = 0
+            last_signature = await self.check() or last_signature
+            self.rescans += 1
+            await self.callback()
@@ -0,0 +1,121 @@
+"""Module with the jitter buffer of streamed audio messages."""
+from threading import Condition
+
+MAX_PENDING = 64  # maximum number of chunks waiting for a missing chunk
+
+
+class JitterBuffer:
+    """This class puts the chunks of a streamed audio message back in order.
+
+    The chunks arrive with their index on the event loop and the player
+    takes them in order of their index. A chunk that is still missing is
+    skipped when the chunks after it fill the buffer, or when the player has
+    waited for it for the stream timeout. Chunks that arrive after their turn
+    are dropped.
+
+    Attributes:
+        request_id (str): The request id of the audio message.
+        timeout (float): The maximum time in seconds the player waits for the
+            next chunk.
+        skipped (int): The number of chunks that were skipped.
+        stalled (bool): Whether the stream ended because no chunk arrived
+            within the timeout.
+    """
+
+    def __init__(self, request_id, timeout, max_pending=MAX_PENDING):
+        """Initialize a :class:`.JitterBuffer` object.
+
+        Args:
+            request_id (str): The request id of the audio message.
+            timeout (float): The maximum time in seconds the player waits
+                for the next chunk.
+            max_pending (int, optional): The maximum number of chunks
+                waiting for a missing chunk. Defaults to 64.
+        """
+        self.request_id = request_id
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.skipped = 0
+        self.stalled = False
+        self._pending = {}
+        self._next = 0
+        self._last = None
+        self._closed = False
+        self._cv = Condition()
+
+    def put(self, index, chunk, last=False):
+        """Put a chunk into the buffer.
+
+        Args:
+            index (int): The index of the chunk in the audio message.
+            chunk (bytes): The audio of the chunk.
+            last (bool, optional): Whether this is the last chunk of the
+                audio message. Defaults to False.
+
+        Returns:
+            bool: False if the chunk came too late or the stream has ended.
+        """
+        with self._cv:
+            if self._closed or index < self._next or index in self._pending:
+                return False
+            if last:
+                self._last = index
+            self._pending[index] = chunk
+            if len(self._pending) > self.max_pending:
+                self._skip()
+            self._cv.notify_all()
+            return True
+
+    def _skip(self):
+        """Skip the missing chunks up to the first pending chunk while
+        holding the lock."""
+        first = min(self._pending)
+        self.skipped += first - self._next
+        self._next = first
+
+    def _finished(self):
+        """Return True if all chunks up to the last one were taken."""
+        return self._closed or (self._last is not None and self._next > self._last)
+
+    def get(self):
+        """Take the next chunk in order of the index.
+
+        Blocks until the next chunk arrives, the stream ends or the timeout
+        expires, in which case the missing chunk is skipped if later chunks
+        are waiting.
+
+        Returns:
+            bytes: The audio of the chunk, or `None` at the end of the
+            stream.
+        """
+        with self._cv:
+            while True:
+                chunk = self._pending.pop(self._next, None)
+                if chunk is not None:
+                    self._next += 1
+                    return chunk
+                if self._finished():
+                    return None
+                if not self._cv.wait_for(lambda: self._next in self._pending
+                                         or self._finished(),
+                                         self.timeout):
+                    if not self._pending:
+                        self.stalled = True
+                        self._closed = True
+                        return None
+                    self._skip()
+
+    def __iter__(self):
+        """Iterate over the chunks in order until the end of the stream."""
+        while True:
+            chunk = self.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def close(self):
+        """End the stream and wake up the player."""
+        with self._cv:
+            self._closed = True
+            self._pending.clear()
+            self._cv.notify_all()
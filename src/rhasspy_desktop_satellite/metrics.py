@@ -0,0 +1,455 @@
+"""Module with the metrics of Rhasspy Desktop Satellite.
+
+The metrics are exposed in the Prometheus text format on a local HTTP
+endpoint that runs on the event loop of the server. Every metric of a
+site is labelled by site.
+"""
+import asyncio
+from bisect import bisect_left
+from threading import Lock
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRICS_PATH = '/metrics'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def format_value(value):
+    """Format a sample value in the Prometheus text format."""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def format_labels(names, values):
+    """Format the labels of a sample in the Prometheus text format."""
+    labels = ','.join('{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                                       .replace('"', r'\"')
+                                       .replace('\n', r'\n'))
+                      for name, value in zip(names, values))
+    return '{' + labels + '}' if labels else ''
+
+
+class Registry:
+    """This class holds the metrics exposed on the metrics endpoint."""
+
+    def __init__(self):
+        """Initialize a :class:`.Registry` object."""
+        self.metrics = []
+
+    def register(self, metric):
+        """Add a metric to the registry and return it."""
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Render all metrics in the Prometheus text format.
+
+        Returns:
+            str: The metrics.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.documentation))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type))
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class Metric:
+    """This class is the base class of the metric types.
+
+    A metric has a child for each combination of label values, which holds
+    the value of the metric for those labels.
+
+    Attributes:
+        name (str): The name of the metric.
+        documentation (str): The help text of the metric.
+        labelnames (tuple): The names of the labels of the metric.
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=('site',), registry=None):
+        """Initialize a metric.
+
+        Args:
+            name (str): The name of the metric.
+            documentation (str): The help text of the metric.
+            labelnames (tuple, optional): The names of the labels of the
+                metric. Defaults to ('site',).
+            registry (:class:`.Registry`, optional): The registry the metric
+                is added to. Defaults to the default registry.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def labels(self, *values):
+        """Return the child of the metric for label values."""
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self.child()
+            return child
+
+    def child(self):
+        """Create a child of the metric."""
+        raise NotImplementedError
+
+    def samples(self):
+        """Return the samples of all children in the Prometheus text
+        format."""
+        with self._lock:
+            children = list(self._children.items())
+        lines = []
+        for values, child in children:
+            labels = format_labels(self.labelnames, values)
+            lines.extend(self.child_samples(labels, values, child))
+        return lines
+
+    def child_samples(self, labels, values, child):
+        """Return the samples of a child in the Prometheus text format."""
+        return ['{}{} {}'.format(self.name, labels, format_value(child.get()))]
+
+
+class Value:
+    """This class holds the value of a counter or gauge for one combination
+    of label values. The value is either set or computed by a function when
+    the metrics are collected."""
+
+    def __init__(self):
+        """Initialize a :class:`.Value` object."""
+        self.value = 0.0
+        self.function = None
+        self._lock = Lock()
+
+    def inc(self, amount=1):
+        """Increment the value."""
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        """Set the value."""
+        self.value = value
+
+    def set_function(self, function):
+        """Compute the value with a function without arguments when the
+        metrics are collected."""
+        self.function = function
+
+    def get(self):
+        """Return the value."""
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+
+class Counter(Metric):
+    """This class represents a counter, a value that only goes up."""
+
+    type = 'counter'
+
+    def child(self):
+        """Create a child of the counter."""
+        return Value()
+
+
+class Gauge(Metric):
+    """This class represents a gauge, a value that goes up and down."""
+
+    type = 'gauge'
+
+    def child(self):
+        """Create a child of the gauge."""
+        return Value()
+
+
+class HistogramValue:
+    """This class holds the buckets of a histogram for one combination of
+    label values."""
+
+    def __init__(self, buckets):
+        """Initialize a :class:`.HistogramValue` object.
+
+        Args:
+            buckets (tuple): The sorted upper bounds of the buckets, without
+                the +Inf bucket.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value):
+        """Count an observed value in its bucket."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def get(self):
+        """Return the counts of the buckets and the sum of the observed
+        values."""
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(Metric):
+    """This class represents a histogram of observed values, such as
+    latencies.
+
+    Attributes:
+        buckets (tuple): The upper bounds of the buckets.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=('site',), registry=None,
+                 buckets=LATENCY_BUCKETS):
+        """Initialize a :class:`.Histogram` object.
+
+        Args:
+            buckets (tuple, optional): The upper bounds of the buckets.
+                Defaults to buckets for latencies from 5 ms to 5 s.
+
+        The other arguments are those of :class:`.Metric`.
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def child(self):
+        """Create a child of the histogram."""
+        return HistogramValue(self.buckets)
+
+    def child_samples(self, labels, values, child):
+        """Return the buckets, sum and count of a child in the Prometheus
+        text format."""
+        counts, total = child.get()
+        lines = []
+        count = 0
+        for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+            count += bucket
+            bucket_labels = format_labels(self.labelnames + ('le',),
+                                          values + (format_value(bound),))
+            lines.append('{}_bucket{} {}'.format(self.name, bucket_labels, count))
+        lines.append('{}_sum{} {}'.format(self.name, labels, format_value(total)))
+        lines.append('{}_count{} {}'.format(self.name, labels, count))
+        return lines
+
+
+REGISTRY = Registry()
+
+CAPTURE_PUBLISH_LATENCY = Histogram(
+    'satellite_capture_publish_latency_seconds',
+    'Time from reading an audio chunk to publishing it in an audioFrame message.')
+CHUNK_QUEUE_DEPTH = Gauge(
+    'satellite_chunk_queue_depth',
+    'Number of recorded audio chunks waiting to be published.')
+INPUT_OVERFLOWS = Counter(
+    'satellite_input_overflows_total',
+    'Number of audio input overflows.')
+VAD_CPU_SECONDS = Counter(
+    'satellite_vad_cpu_seconds_total',
+    'CPU time spent on voice activity detection.')
+VAD_AUDIO_SECONDS = Counter(
+    'satellite_vad_audio_seconds_total',
+    'Duration of the audio checked for voice activity.')
+VAD_CPU_PER_AUDIO_SECOND = Gauge(
+    'satellite_vad_cpu_seconds_per_audio_second',
+    'CPU time spent on voice activity detection per second of audio.')
+PLAY_FIRST_SAMPLE_LATENCY = Histogram(
+    'satellite_play_first_sample_latency_seconds',
+    'Time from receiving a playBytes message to writing its first samples.')
+PLAY_QUEUE_DEPTH = Gauge(
+    'satellite_play_queue_depth',
+    'Number of audio messages waiting to be played.')
+PLAY_QUEUE_WAIT = Histogram(
+    'satellite_play_queue_wait_seconds',
+    'Time an audio message waited in the playback queue before playing.')
+OUTPUT_STREAM_OPEN_TIME = Histogram(
+    'satellite_output_stream_open_seconds',
+    'Time to open an audio output stream.')
+PLAYBACK_CACHE_HITS = Counter(
+    'satellite_playback_cache_hits_total',
+    'Number of audio messages played from the playback cache.')
+PLAYBACK_CACHE_MISSES = Counter(
+    'satellite_playback_cache_misses_total',
+    'Number of audio messages decoded because they weren\'t in the playback cache.')
+PLAYBACK_CACHE_BYTES = Gauge(
+    'satellite_playback_cache_bytes',
+    'Number of bytes of decoded audio in the playback cache.')
+MQTT_PUBLISHED_MESSAGES = Counter(
+    'satellite_mqtt_published_messages_total',
+    'Number of messages published on MQTT.')
+MQTT_PUBLISHED_BYTES = Counter(
+    'satellite_mqtt_published_bytes_total',
+    'Number of payload bytes published on MQTT.')
+MQTT_DROPPED_FRAMES = Counter(
+    'satellite_mqtt_dropped_frames_total',
+    'Number of audio frames dropped because the connection to the MQTT broker was backed up.')
+STARTUP_TIME = Gauge(
+    'satellite_startup_seconds',
+    'Time from creating the server to its first connection to the MQTT broker.',
+    labelnames=())
+MQTT_PUBLISH_LATENCY = Histogram(
+    'satellite_mqtt_publish_latency_seconds',
+    'Time from publishing an MQTT message to writing it to the socket (QoS 0)'
+    ' or to its acknowledgement by the broker (QoS 1 and 2).',
+    labelnames=('qos',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+MQTT_INFLIGHT_MESSAGES = Gauge(
+    'satellite_mqtt_inflight_messages',
+    'Number of published MQTT messages not yet written to the socket or acknowledged.',
+    labelnames=())
+MQTT_BUFFER_BYTES = Gauge(
+    'satellite_mqtt_buffer_bytes',
+    'Number of bytes of published MQTT messages not yet written to the socket or acknowledged.',
+    labelnames=())
+MQTT_DROPPED_MESSAGES = Counter(
+    'satellite_mqtt_dropped_messages_total',
+    'Number of QoS 0 MQTT messages dropped because too many messages were in flight.',
+    labelnames=())
+MQTT_RECONNECTS = Counter(
+    'satellite_mqtt_reconnects_total',
+    'Number of reconnections to the MQTT broker.',
+    labelnames=())
+MQTT_SPOOL_BYTES = Gauge(
+    'satellite_mqtt_spool_bytes',
+    'Number of payload bytes spooled while the MQTT broker is unreachable.',
+    labelnames=())
+MQTT_SPOOL_DROPPED = Counter(
+    'satellite_mqtt_spool_dropped_total',
+    'Number of spooled messages dropped because the spool was full or they were stale.',
+    labelnames=())
+
+
+class SiteMetrics:
+    """This class holds the metrics of one site.
+
+    Attributes:
+        capture_publish_latency: Histogram of the time from reading an audio
+            chunk to publishing it.
+        chunk_queue_depth: Gauge of the number of queued audio chunks.
+        input_overflows: Counter of audio input overflows.
+        vad_cpu_seconds: Counter of the CPU time of voice activity detection.
+        vad_audio_seconds: Counter of the audio checked for voice activity.
+        play_first_sample_latency: Histogram of the time from receiving an
+            audio message to writing its first samples.
+        play_queue_depth: Gauge of the number of queued audio messages.
+        play_queue_wait: Histogram of the time an audio message waited in
+            the playback queue.
+        output_stream_open_time: Histogram of the time to open an output
+            stream.
+        playback_cache_hits: Counter of audio messages played from the
+            playback cache.
+        playback_cache_misses: Counter of audio messages missing from the
+            playback cache.
+        playback_cache_bytes: Gauge of the decoded audio in the playback
+            cache.
+        mqtt_published_messages: Counter of published MQTT messages.
+        mqtt_published_bytes: Counter of published MQTT payload bytes.
+        mqtt_dropped_frames: Counter of audio frames dropped because the
+            connection to the MQTT broker was backed up.
+    """
+
+    def __init__(self, site):
+        """Initialize a :class:`.SiteMetrics` object.
+
+        Args:
+            site (str): The site ID the metrics are labelled with.
+        """
+        self.capture_publish_latency = CAPTURE_PUBLISH_LATENCY.labels(site)
+        self.chunk_queue_depth = CHUNK_QUEUE_DEPTH.labels(site)
+        self.input_overflows = INPUT_OVERFLOWS.labels(site)
+        self.vad_cpu_seconds = VAD_CPU_SECONDS.labels(site)
+        self.vad_audio_seconds = VAD_AUDIO_SECONDS.labels(site)
+        self.play_first_sample_latency = PLAY_FIRST_SAMPLE_LATENCY.labels(site)
+        self.play_queue_depth = PLAY_QUEUE_DEPTH.labels(site)
+        self.play_queue_wait = PLAY_QUEUE_WAIT.labels(site)
+        self.output_stream_open_time = OUTPUT_STREAM_OPEN_TIME.labels(site)
+        self.playback_cache_hits = PLAYBACK_CACHE_HITS.labels(site)
+        self.playback_cache_misses = PLAYBACK_CACHE_MISSES.labels(site)
+        self.playback_cache_bytes = PLAYBACK_CACHE_BYTES.labels(site)
+        self.mqtt_published_messages = MQTT_PUBLISHED_MESSAGES.labels(site)
+        self.mqtt_published_bytes = MQTT_PUBLISHED_BYTES.labels(site)
+        self.mqtt_dropped_frames = MQTT_DROPPED_FRAMES.labels(site)
+        VAD_CPU_PER_AUDIO_SECOND.labels(site).set_function(self.vad_cpu_per_audio_second)
+
+    def vad_cpu_per_audio_second(self):
+        """Return the CPU time of voice activity detection per second of
+        audio."""
+        audio_seconds = self.vad_audio_seconds.get()
+        return self.vad_cpu_seconds.get() / audio_seconds if audio_seconds else 0.0
+
+    def published(self, payload):
+        """Count a published MQTT message."""
+        self.mqtt_published_messages.inc()
+        self.mqtt_published_bytes.inc(len(payload))
+
+
+class MetricsServer:
+    """This class serves the metrics of a registry on a local HTTP endpoint.
+
+    The endpoint runs on the asyncio event loop and only answers GET
+    requests for /metrics.
+    """
+
+    def __init__(self, host, port, registry=None, logger=None):
+        """Initialize a :class:`.MetricsServer` object.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port number to listen on.
+            registry (:class:`.Registry`, optional): The registry with the
+                metrics. Defaults to the default registry.
+            logger (:class:`logging.Logger`, optional): The Logger object for
+                logging messages.
+        """
+        self.host = host
+        self.port = port
+        self.registry = REGISTRY if registry is None else registry
+        self.logger = logger
+        self.server = None
+
+    async def start(self):
+        """Start listening for HTTP requests."""
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        if self.logger is not None:
+            self.logger.info('Serving metrics on http://%s:%s%s',
+                             self.host, self.port, METRICS_PATH)
+
+    async def close(self):
+        """Stop listening for HTTP requests."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def handle(self, reader, writer):
+        """Answer an HTTP request."""
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+            method, path = (request.split(b'\r\n', 1)[0].split(b' ') + [b'', b''])[:2]
+            path = path.split(b'?', 1)[0].decode('latin-1')
+            if method not in (b'GET', b'HEAD'):
+                status, body = '405 Method Not Allowed', b''
+            elif path != METRICS_PATH:
+                status, body = '404 Not Found', b''
+            else:
+                status, body = '200 OK', self.registry.render().encode('utf-8')
+            headers = ('HTTP/1.1 {}\r\n'
+                       'Content-Type: {}\r\n'
+                       'Content-Length: {}\r\n'
+                       'Connection: close\r\n\r\n').format(status, CONTENT_TYPE, len(body))
+            writer.write(headers.encode('latin-1'))
+            if method != b'HEAD':
+                writer.write(body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
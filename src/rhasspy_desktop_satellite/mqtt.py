@@ -1,8 +1,19 @@
 """Module with an MQTT client. The satellite server class
 inherits from this class.
 """
-from paho.mqtt.client import Client
-import pyaudio
+import asyncio
+import random
+import threading
+import time
+
+from paho.mqtt.client import Client, MQTT_ERR_SUCCESS
+
+from rhasspy_desktop_satellite.metrics import MQTT_RECONNECTS, MQTT_SPOOL_BYTES, \
+    MQTT_SPOOL_DROPPED
+from rhasspy_desktop_satellite.publisher import Publisher
+from rhasspy_desktop_satellite.spool import MessageSpool
+
+MISC_INTERVAL = 1  # interval for MQTT keepalive processing (s)
 
 
 class MQTTClient:
@@ -10,9 +21,28 @@ class MQTTClient:
 
     This is an abstract base class. You don't instantiate an object of this
     class, but an object of one of its subclasses.
+
+    The MQTT network I/O runs on an asyncio event loop: the socket of the
+    MQTT client is registered with the event loop, which calls the MQTT
+    client when the socket is readable or writable. Subclasses run their
+    own coroutines on the same event loop.
+
+    When the connection to the MQTT broker is lost, or the broker isn't
+    reachable at the start, the client reconnects with a jittered
+    exponential backoff, so satellites don't all reconnect at the same time
+    after a restart of the broker. Messages published in the meantime are
+    spooled if the spool is enabled.
+
+    Attributes:
+        connected (bool): Whether or not the client is connected to the MQTT
+            broker.
+        publisher (:class:`.Publisher`): The publish layer, which applies
+            the QoS of the topics and limits the messages in flight.
+        spool (:class:`.MessageSpool`): The spool for messages published
+            while the client is disconnected, or `None`.
     """
 
-    def __init__(self, config, verbose, logger):
+    def __init__(self, config, verbose, logger, audio=None):
         """Initialize an MQTT client.
 
         Args:
@@ -22,20 +52,46 @@ class MQTTClient:
                 mode.
             logger (:class:`logging.Logger`): The Logger object for logging
                 messages.
+            audio (optional): The PyAudio object for the audio devices.
+                Defaults to a new :class:`pyaudio.PyAudio` object when
+                :meth:`uses_pyaudio` is true. Benchmarks pass a synthetic
+                stand-in.
         """
+        self.created = time.monotonic()
         self.config = config
         self.verbose = verbose
         self.logger = logger
         self.mqtt = Client()
-        self.logger.debug('Using %s', pyaudio.get_portaudio_version_text())
-        self.logger.debug('Creating PyAudio object...')
-        self.audio = pyaudio.PyAudio()
+        if audio is None and self.uses_pyaudio():
+            # PortAudio is only loaded when a recorder or player uses it.
+            import pyaudio  # pylint: disable=import-outside-toplevel
+            self.logger.debug('Using %s', pyaudio.get_portaudio_version_text())
+            self.logger.debug('Creating PyAudio object...')
+            audio = pyaudio.PyAudio()
+        self.audio = audio
+
+        self.loop = None
+        self.loop_thread = None
+        self.connected = False
+        self.publisher = Publisher(self.mqtt, self.config.mqtt.qos,
+                                   self.config.mqtt.max_inflight,
+                                   self.config.mqtt.max_buffer)
+        self.spool = self.create_spool()
+        self._stopped = None
+        self._terminated = False
+        self._reconnect_task = None
+        self._reconnect_delay = self.config.mqtt.reconnect_min_delay
+        self._spool_dropped = 0
 
         self.initialize()
 
         self.mqtt.on_connect = self.on_connect
         self.mqtt.on_disconnect = self.on_disconnect
-        self.connect()
+        self.mqtt.on_publish = self.publisher.on_publish
+        self.mqtt.on_socket_open = self.on_socket_open
+        self.mqtt.on_socket_close = self.on_socket_close
+        self.mqtt.on_socket_register_write = self.on_socket_register_write
+        self.mqtt.on_socket_unregister_write = self.on_socket_unregister_write
 
     def connect(self):
         """Connect to the MQTT broker defined in the configuration."""
@@ -55,25 +111,220 @@ class MQTTClient:
         self.logger.debug('Connecting to MQTT broker %s:%s...',
                           self.config.mqtt.host,
                           self.config.mqtt.port)
-        self.mqtt.connect(self.config.mqtt.host, self.config.mqtt.port)
+        try:
+            self.mqtt.connect(self.config.mqtt.host, self.config.mqtt.port)
+        except OSError as error:
+            self.logger.warning('Can\'t connect to MQTT broker %s:%s: %s',
+                                self.config.mqtt.host,
+                                self.config.mqtt.port,
+                                str(error))
+            self.schedule_reconnect()
+
+    def create_spool(self):
+        """Create the spool for messages published while the client is
+        disconnected.
+
+        Returns:
+            :class:`.MessageSpool`: The spool, or `None` if it's disabled.
+        """
+        config = self.config.mqtt.spool
+        if not config.enabled:
+            return None
+        try:
+            spool = MessageSpool(config.size, config.max_age, config.path)
+        except OSError as error:
+            self.logger.warning('Can\'t map MQTT spool file %s, spooling in memory: %s',
+                                config.path, str(error))
+            spool = MessageSpool(config.size, config.max_age)
+        MQTT_SPOOL_BYTES.labels().set_function(lambda: spool.size)
+        MQTT_SPOOL_DROPPED.labels().set_function(lambda: spool.dropped)
+        return spool
+
+    def schedule_reconnect(self):
+        """Start reconnecting to the MQTT broker, unless the client is
+        already reconnecting. This runs on the event loop."""
+        if self._stopped is None or self._stopped.is_set():
+            return
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = self.loop.create_task(self.reconnect())
+
+    async def reconnect(self):
+        """Reconnect to the MQTT broker until it succeeds or the client is
+        stopped.
+
+        The delay between two attempts doubles up to the maximum delay and
+        is reset when the broker accepts the connection. Each delay is
+        picked at random between half and all of it.
+        """
+        while not self._stopped.is_set():
+            delay = random.uniform(self._reconnect_delay / 2, self._reconnect_delay)
+            self._reconnect_delay = min(self._reconnect_delay * 2,
+                                        self.config.mqtt.reconnect_max_delay)
+            self.logger.info('Reconnecting to MQTT broker in %.1f s...', delay)
+            await asyncio.sleep(delay)
+            if self._stopped.is_set():
+                return
+            try:
+                # Connecting blocks until the broker answers or times out.
+                await self.loop.run_in_executor(None, self.mqtt.reconnect)
+            except OSError as error:
+                self.logger.warning('Can\'t reconnect to MQTT broker %s:%s: %s',
+                                    self.config.mqtt.host,
+                                    self.config.mqtt.port,
+                                    str(error))
+            else:
+                MQTT_RECONNECTS.labels().inc()
+                return
+
+    def publish(self, topic, payload):
+        """Publish a message on the MQTT broker, or spool it while the client
+        is disconnected. This runs on the event loop.
+
+        Args:
+            topic (str): The MQTT topic of the message.
+            payload (bytes or str): The payload of the message.
+
+        Returns:
+            bool: True if the message was passed to the MQTT client, False
+            if it was spooled or dropped.
+        """
+        if self.connected:
+            return self.publisher.publish(topic, payload)
+        if self.spool is not None:
+            self.spool.put(topic, payload)
+        return False
+
+    def flush_spool(self):
+        """Publish the spooled messages that aren't stale, oldest first. The
+        spool is bounded, so they're published regardless of the messages in
+        flight."""
+        if self.spool is None:
+            return
+        published = 0
+        for topic, payload in self.spool.drain():
+            self.publisher.publish(topic, payload, limit=False)
+            published += 1
+        dropped = self.spool.dropped - self._spool_dropped
+        self._spool_dropped = self.spool.dropped
+        if published or dropped:
+            self.logger.info('Published %d spooled messages and dropped %d'
+                             ' stale or overflowing messages.', published, dropped)
 
     def initialize(self):
         """Initialize the MQTT client."""
 
+    def uses_pyaudio(self):
+        """Return True if the client needs a PyAudio object."""
+        return True
+
     def start(self):
         """Start the event loop to the MQTT broker so the audio server starts
         listening to MQTT topics and the callback methods are called.
+
+        This method returns when the client is stopped.
         """
         self.logger.debug('Starting MQTT event loop...')
-        self.mqtt.loop_forever()
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.get_ident()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.run())
+        finally:
+            self.loop.close()
+            self.terminate()
+
+    async def run(self):
+        """Connect to the MQTT broker and process MQTT events until the
+        client is stopped.
+
+        Subclasses that override this coroutine start their own tasks and
+        await this implementation.
+        """
+        self._stopped = asyncio.Event()
+        self.connect()
+        misc = self.loop.create_task(self.loop_misc())
+        try:
+            await self._stopped.wait()
+        finally:
+            tasks = [misc]
+            if self._reconnect_task is not None:
+                tasks.append(self._reconnect_task)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def loop_misc(self):
+        """Process the periodic MQTT events, such as keepalive pings. A
+        broker that stops answering the pings is detected here."""
+        while True:
+            self.mqtt.loop_misc()
+            await asyncio.sleep(MISC_INTERVAL)
+
+    def call_in_loop(self, callback, *args):
+        """Call a function on the event loop thread.
+
+        The function is called right away when this is the event loop
+        thread, otherwise it's scheduled on the event loop.
+        """
+        if self.loop is None or self.loop.is_closed():
+            return
+        if threading.get_ident() == self.loop_thread:
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
 
     def stop(self):
         """Disconnect from the MQTT broker and terminate the audio connection.
+
+        When the event loop is running, the client disconnects on the event
+        loop and the audio connection is terminated when the event loop
+        stops.
         """
+        if self.loop is None or self.loop.is_closed():
+            self.disconnect()
+            self.terminate()
+        else:
+            self.call_in_loop(self.disconnect)
+
+    def disconnect(self):
+        """Disconnect from the MQTT broker and stop the event loop."""
         self.logger.debug('Disconnecting from MQTT broker...')
         self.mqtt.disconnect()
-        self.logger.debug('Terminating PyAudio object...')
-        self.audio.terminate()
+        # Send the disconnect packet before the event loop stops.
+        self.mqtt.loop_write()
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def terminate(self):
+        """Terminate the audio connection."""
+        if not self._terminated:
+            self._terminated = True
+            if self.spool is not None:
+                self.spool.close()
+            if self.audio is not None:
+                self.logger.debug('Terminating PyAudio object...')
+                self.audio.terminate()
+
+    def on_socket_open(self, client, userdata, sock):
+        """Callback that is called when the socket to the MQTT broker is
+        opened."""
+        self.call_in_loop(self.loop.add_reader, sock, client.loop_read)
+
+    def on_socket_close(self, client, userdata, sock):
+        """Callback that is called when the socket to the MQTT broker is
+        closed."""
+        self.call_in_loop(self.loop.remove_reader, sock)
+        self.call_in_loop(self.loop.remove_writer, sock)
+
+    def on_socket_register_write(self, client, userdata, sock):
+        """Callback that is called when there's data to write to the MQTT
+        broker."""
+        self.call_in_loop(self.loop.add_writer, sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        """Callback that is called when all data is written to the MQTT
+        broker."""
+        self.call_in_loop(self.loop.remove_writer, sock)
 
     def on_connect(self, client, userdata, flags, result_code):
         """Callback that is called when the client connects to the MQTT broker.
@@ -83,9 +334,17 @@ class MQTTClient:
                          self.config.mqtt.host,
                          self.config.mqtt.port,
                          result_code)
+        if result_code == 0:
+            self.connected = True
+            self._reconnect_delay = self.config.mqtt.reconnect_min_delay
 
-    def on_disconnect(self, client, userdata, flags, result_code):
-        """Callback that is called when the client connects from the MQTT
-        broker."""
-        # This callback doesn't seem to be called.
-        self.logger.info('Disconnected with result code %s.', result_code)
+    def on_disconnect(self, client, userdata, result_code):
+        """Callback that is called when the client disconnects from the MQTT
+        broker. The client reconnects unless it disconnected itself."""
+        self.connected = False
+        self.publisher.reset()
+        if result_code == MQTT_ERR_SUCCESS or self._stopped is None or self._stopped.is_set():
+            self.logger.info('Disconnected with result code %s.', result_code)
+            return
+        self.logger.warning('Lost connection to MQTT broker with result code %s.', result_code)
+        self.call_in_loop(self.schedule_reconnect)
@@ -0,0 +1,107 @@
+"""Module with the cache of decoded playback audio."""
+from collections import OrderedDict
+import hashlib
+
+
+class CachedAudio:
+    """This class holds the decoded audio of an audio message, ready to be
+    written to an output stream.
+
+    Attributes:
+        sample_format (int): The PortAudio sample format of the audio.
+        channels (int): The number of channels of the audio.
+        rate (int): The sample rate of the output stream.
+        frames (bytes): The audio frames, resampled for the output device.
+    """
+
+    __slots__ = ('sample_format', 'channels', 'rate', 'frames')
+
+    def __init__(self, sample_format, channels, rate, frames):
+        """Initialize a :class:`.CachedAudio` object."""
+        self.sample_format = sample_format
+        self.channels = channels
+        self.rate = rate
+        self.frames = frames
+
+
+class PlaybackCache:
+    """This class is a least recently used cache of decoded playback audio,
+    keyed by a hash of the payload of the audio message.
+
+    Short sounds such as the wake and error beeps arrive as the same
+    payloads over and over. A cache hit skips decoding and resampling them.
+
+    Attributes:
+        max_entries (int): The maximum number of cached audio messages.
+        max_bytes (int): The maximum number of bytes of cached audio.
+        size (int): The number of bytes of cached audio.
+        hits (int): The number of cache hits.
+        misses (int): The number of cache misses.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        """Initialize a :class:`.PlaybackCache` object.
+
+        Args:
+            max_entries (int): The maximum number of cached audio messages.
+            max_bytes (int): The maximum number of bytes of cached audio.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        """Return the number of cached audio messages."""
+        return len(self._entries)
+
+    @staticmethod
+    def key(payload):
+        """Return the cache key of the payload of an audio message."""
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def get(self, key):
+        """Return the cached audio for a key and count the hit or miss.
+
+        Returns:
+            :class:`.CachedAudio`: The cached audio, or `None`.
+        """
+        audio = self._entries.get(key)
+        if audio is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return audio
+
+    def put(self, key, audio):
+        """Cache the decoded audio of an audio message, evicting the least
+        recently used audio to stay within the limits.
+
+        Args:
+            key (bytes): The cache key of the payload.
+            audio (:class:`.CachedAudio`): The decoded audio.
+
+        Returns:
+            bool: False if the audio is larger than the cache.
+        """
+        length = len(audio.frames)
+        if length > self.max_bytes or self.max_entries < 1:
+            return False
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous.frames)
+        while self._entries and (len(self._entries) >= self.max_entries
+                                 or self.size + length > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.frames)
+        self._entries[key] = audio
+        self.size += length
+        return True
+
+    def clear(self):
+        """Remove all cached audio."""
+        self._entries.clear()
+        self.size = 0
@@ -0,0 +1,129 @@
+"""Module with the publish layer between the sites and the MQTT client.
+
+paho-mqtt queues every published message in memory until the socket to the
+broker takes it, so a slow network or broker lets the queue grow without
+bound while the satellite keeps recording. The publisher tracks the
+messages that paho hasn't written or the broker hasn't acknowledged yet,
+drops audio when they exceed their limits and tells the capture stage when
+the connection is backing up.
+"""
+import time
+
+from paho.mqtt.client import MQTT_ERR_SUCCESS, topic_matches_sub
+
+from rhasspy_desktop_satellite.metrics import MQTT_BUFFER_BYTES, MQTT_DROPPED_MESSAGES, \
+    MQTT_INFLIGHT_MESSAGES, MQTT_PUBLISH_LATENCY
+
+CONGESTION_RATIO = 0.5  # part of the limits from which the connection is congested
+
+
+class Publisher:
+    """This class publishes MQTT messages with a QoS per topic and keeps
+    track of the messages that are in flight.
+
+    A message with QoS 0 is in flight until paho has written it to the
+    socket, a message with QoS 1 or 2 until the broker has acknowledged it.
+    When the messages in flight reach the maximum number of messages or
+    bytes, messages with QoS 0 are dropped. Messages with a higher QoS are
+    always published.
+
+    Attributes:
+        qos (dict): The QoS by MQTT topic filter.
+        max_inflight (int): The maximum number of messages in flight.
+        max_buffer (int): The maximum number of bytes in flight.
+        buffered (int): The number of bytes in flight.
+        dropped (int): The number of dropped messages.
+    """
+
+    def __init__(self, client, qos, max_inflight, max_buffer):
+        """Initialize a :class:`.Publisher` object.
+
+        Args:
+            client (:class:`paho.mqtt.client.Client`): The MQTT client.
+            qos (dict): The QoS by MQTT topic filter. Topics that match no
+                filter are published with QoS 0.
+            max_inflight (int): The maximum number of messages in flight.
+            max_buffer (int): The maximum number of bytes in flight.
+        """
+        self.client = client
+        self.qos = qos
+        self.max_inflight = max_inflight
+        self.max_buffer = max_buffer
+        self.buffered = 0
+        self.dropped = 0
+        self._topic_qos = {}
+        self._inflight = {}  # mid -> (qos, length, published)
+        self.client.max_inflight_messages_set(max_inflight)
+        MQTT_INFLIGHT_MESSAGES.labels().set_function(lambda: len(self._inflight))
+        MQTT_BUFFER_BYTES.labels().set_function(lambda: self.buffered)
+
+    def __len__(self):
+        """Return the number of messages in flight."""
+        return len(self._inflight)
+
+    def topic_qos(self, topic):
+        """Return the QoS of an MQTT topic."""
+        qos = self._topic_qos.get(topic)
+        if qos is None:
+            qos = max((qos for topic_filter, qos in self.qos.items()
+                       if topic_matches_sub(topic_filter, topic)), default=0)
+            self._topic_qos[topic] = qos
+        return qos
+
+    @property
+    def full(self):
+        """Whether the messages in flight reached one of their limits."""
+        return len(self._inflight) >= self.max_inflight or self.buffered >= self.max_buffer
+
+    @property
+    def congested(self):
+        """Whether the messages in flight reached a part of one of their
+        limits, so the capture stage should publish fewer messages."""
+        return len(self._inflight) >= self.max_inflight * CONGESTION_RATIO \
+            or self.buffered >= self.max_buffer * CONGESTION_RATIO
+
+    def publish(self, topic, payload, limit=True):
+        """Publish a message with the QoS of its topic. This runs on the
+        event loop.
+
+        Args:
+            topic (str): The MQTT topic of the message.
+            payload (bytes or str): The payload of the message.
+            limit (bool, optional): Whether a message with QoS 0 is dropped
+                when the messages in flight reached their limits. Defaults
+                to True.
+
+        Returns:
+            bool: True if the message was passed to the MQTT client.
+        """
+        qos = self.topic_qos(topic)
+        if limit and qos == 0 and self.full:
+            self.dropped += 1
+            MQTT_DROPPED_MESSAGES.labels().inc()
+            return False
+        info = self.client.publish(topic, payload, qos)
+        if info.rc != MQTT_ERR_SUCCESS:
+            return False
+        length = len(topic) + len(payload)
+        self._inflight[info.mid] = (qos, length, time.monotonic())
+        self.buffered += length
+        return True
+
+    def on_publish(self, client, userdata, mid):
+        """Callback that is called when a message with QoS 0 is written to
+        the socket or a message with a higher QoS is acknowledged."""
+        message = self._inflight.pop(mid, None)
+        if message is None:
+            return
+        qos, length, published = message
+        self.buffered -= length
+        MQTT_PUBLISH_LATENCY.labels(str(qos)).observe(time.monotonic() - published)
+
+    def reset(self):
+        """Forget the messages with QoS 0 in flight after the connection is
+        lost, because paho drops them. Messages with a higher QoS are sent
+        again after reconnecting."""
+        for mid, (qos, length, _) in list(self._inflight.items()):
+            if qos == 0:
+                del self._inflight[mid]
+                self.buffered -= length
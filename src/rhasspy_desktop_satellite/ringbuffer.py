@@ -0,0 +1,118 @@
+"""Module with a preallocated ring buffer for captured audio."""
+from threading import Condition
+
+
+class RingBuffer:
+    """This class represents a fixed-size ring buffer of audio bytes.
+
+    The buffer is allocated once. It is written by the PortAudio callback
+    thread and read by the recorder thread. When the writer outruns the
+    reader, the oldest unread audio is overwritten and counted as an overflow.
+
+    Attributes:
+        size (int): The capacity of the ring buffer in bytes.
+        overflows (int): The number of writes that overwrote unread audio.
+    """
+
+    def __init__(self, size):
+        """Initialize a :class:`.RingBuffer` object.
+
+        Args:
+            size (int): The capacity of the ring buffer in bytes. To keep
+                reads aligned on audio frames this should be a multiple of
+                the size of the writes.
+        """
+        self.size = size
+        self.overflows = 0
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._read_pos = 0
+        self._write_pos = 0
+        self._available = 0
+        self._closed = False
+        self._cv = Condition()
+
+    def __len__(self):
+        """Return the number of unread bytes in the ring buffer."""
+        return self._available
+
+    def write(self, data):
+        """Write audio bytes into the ring buffer.
+
+        Args:
+            data (bytes-like): The audio bytes to write.
+        """
+        data = memoryview(data)
+        length = len(data)
+        if length > self.size:
+            data = data[length - self.size:]
+            length = self.size
+        with self._cv:
+            first = min(length, self.size - self._write_pos)
+            self._view[self._write_pos:self._write_pos + first] = data[:first]
+            if first < length:
+                self._view[:length - first] = data[first:]
+            self._write_pos = (self._write_pos + length) % self.size
+            self._available += length
+            if self._available > self.size:
+                self.overflows += 1
+                self._available = self.size
+                self._read_pos = self._write_pos
+            self._cv.notify_all()
+
+    def readinto(self, buffer, timeout=None):
+        """Read audio bytes from the ring buffer into a preallocated buffer.
+
+        Blocks until enough bytes are available to fill :attr:`buffer`, the
+        timeout expires or the ring buffer is closed.
+
+        Args:
+            buffer (bytearray or memoryview): The buffer to fill.
+            timeout (float, optional): Maximum time to wait in seconds.
+
+        Returns:
+            int: The number of bytes read, which is 0 on a timeout or when
+            the ring buffer is closed.
+        """
+        length = len(buffer)
+        with self._cv:
+            if not self._cv.wait_for(lambda: self._closed or self._available >= length,
+                                     timeout):
+                return 0
+            if self._available < length:
+                return 0
+            first = min(length, self.size - self._read_pos)
+            buffer[:first] = self._view[self._read_pos:self._read_pos + first]
+            if first < length:
+                buffer[first:length] = self._view[:length - first]
+            self._read_pos = (self._read_pos + length) % self.size
+            self._available -= length
+            return length
+
+    def read(self, length, timeout=None):
+        """Read audio bytes from the ring buffer.
+
+        Args:
+            length (int): The number of bytes to read.
+            timeout (float, optional): Maximum time to wait in seconds.
+
+        Returns:
+            bytearray: The audio bytes, empty on a timeout or when the ring
+            buffer is closed.
+        """
+        buffer = bytearray(length)
+        if not self.readinto(buffer, timeout):
+            return bytearray()
+        return buffer
+
+    def clear(self):
+        """Discard all unread audio bytes."""
+        with self._cv:
+            self._read_pos = self._write_pos
+            self._available = 0
+
+    def close(self):
+        """Close the ring buffer and wake up any waiting reader."""
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
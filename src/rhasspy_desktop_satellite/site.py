@@ -0,0 +1,1380 @@
+"""Module with the Site class, the audio pipelines of one site of the
+satellite server."""
+import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import math
+import queue
+from threading import Event
+import wave
+import time
+
+from humanfriendly import format_size
+
+from rhasspy_desktop_satellite.backends import PYAUDIO, create_input_audio, create_output_audio
+from rhasspy_desktop_satellite.capture import CHUNK_BUFFERS, create_capture
+from rhasspy_desktop_satellite.codec import WAV, create_encoder, decode_audio
+from rhasspy_desktop_satellite.chunkqueue import DROP_OLDEST, ChunkFanout, ChunkQueue
+from rhasspy_desktop_satellite.devicecaps import FormatConverter
+from rhasspy_desktop_satellite.jitterbuffer import JitterBuffer
+from rhasspy_desktop_satellite.exceptions import AudioBackendError, AudioCodecError, \
+    ConfigurationError, NoDefaultAudioDeviceError, WakewordDetectorError
+from rhasspy_desktop_satellite.metrics import SiteMetrics
+from rhasspy_desktop_satellite.playcache import CachedAudio, PlaybackCache
+from rhasspy_desktop_satellite.streampool import OutputStreamPool
+from rhasspy_desktop_satellite.vad import VAD_SAMPLE_WIDTH, VoiceActivityDetector
+from rhasspy_desktop_satellite.wakeword import WAKEWORD_SAMPLE_WIDTH, \
+    create_wakeword_detector
+
+AUDIO_FRAME = 'hermes/audioServer/{}/audioFrame'
+MAX_CHUNK_TIME = 120 # maximum duration of recorded audio chunks (ms)
+FRAME_RECOVERY_COUNT = 10 # fast audio frames before the frame time shrinks
+PLAY_CHUNK_SIZE = 2048
+MAX_PLAY_STREAMS = 16 # streamed audio messages remembered to ignore late chunks
+PUBLISHER = 'publisher' # name of the MQTT publisher among the chunk consumers
+DEVICE_RETRY_TIME = 1 # first wait after an audio stream failed before it's opened again (s)
+DEVICE_MAX_RETRY_TIME = 30 # maximum wait before a failing audio stream is opened again (s)
+DEVICE_RELEASE_TIMEOUT = 5 # maximum wait for the record thread to close its stream (s)
+
+ASR_START_LISTENING = 'hermes/asr/startListening'
+ASR_STOP_LISTENING = 'hermes/asr/stopListening'
+ASR_TOGGLE_OFF = 'hermes/asr/toggleOff'
+
+HOTWORD_TOGGLE_ON = 'hermes/hotword/toggleOn'
+HOTWORD_TOGGLE_OFF = 'hermes/hotword/toggleOff'
+HOTWORD_DETECTED = 'hermes/hotword/{}/detected'
+
+PLAY_BYTES = 'hermes/audioServer/{}/playBytes/+'
+PLAY_BYTES_STREAMING = 'hermes/audioServer/{}/playBytesStreaming/#'
+PLAY_FINISHED = 'hermes/audioServer/{}/playFinished'
+LAST_CHUNK = ('1', 'true')  # values of the isLast segment of the last streamed chunk
+
+
+class Site:
+    """This class represents a site of the satellite server: an audio
+    recorder AND player for the Hermes protocol, each bound to its own audio
+    device.
+
+    The sites of a server share its MQTT connection, its PyAudio object and
+    its DSP backend. Each site records, detects voice activity, publishes
+    and plays audio in its own threads and tasks.
+    """
+
+    def __init__(self, server, config):
+        """Initialize a site.
+
+        Args:
+            server (:class:`.SatelliteServer`): The server of the site.
+            config (:class:`.SiteConfig`): The configuration of the site.
+        """
+        self.server = server
+        self.config = config
+        self.logger = server.logger
+        self.dsp = server.dsp
+        self.recorder_enabled = self.config.recorder.enabled
+        self.audio_in = None
+        self.audio_in_index = -1
+        self.player_enabled = self.config.player.enabled
+        self.audio_out = None
+        self.audio_out_index = -1
+        self.audio_out_rate = self.config.player.frame_rate
+        self.device_out_rate = None
+        self.audio_input = None
+        self.audio_output = None
+        if self.recorder_enabled:
+            try:
+                self.audio_input = create_input_audio(self.config.recorder.backend,
+                                                      server.audio,
+                                                      self.config.recorder.file,
+                                                      self.config.recorder.speed,
+                                                      self.config.recorder.loop)
+            except (ValueError, OSError, EOFError, wave.Error) as error:
+                raise AudioBackendError('input', str(error))
+        if self.player_enabled:
+            try:
+                self.audio_output = create_output_audio(self.config.player.backend,
+                                                        server.audio,
+                                                        self.config.player.path,
+                                                        self.config.player.frame_rate,
+                                                        self.config.player.speed)
+            except (ValueError, OSError) as error:
+                raise AudioBackendError('output', str(error))
+        self.capture_format = None
+        self.output_caps = None
+        self.resolve_devices()
+
+        self.record_event = Event()
+        # The record thread closes its input stream when the devices are
+        # rerouted and waits until they are resolved again.
+        self.reroute = Event()
+        self.capture_released = Event()
+        self.reroute_done = Event()
+        # Wakes up the record thread while it waits to open a failed input
+        # stream again.
+        self.retry_event = Event()
+        self.device_lock = None
+        self.listen_audio = False
+        recorder_bytes_per_ms = 1
+        if self.recorder_enabled:
+            recorder_bytes_per_ms = (self.config.recorder.sample_rate
+                                     * self.config.recorder.sample_width
+                                     * self.config.recorder.channels / 1000)
+            # Record chunks of at most MAX_CHUNK_TIME that add up to the
+            # audio frame time.
+            frame_time = self.config.recorder.frame_time
+            chunk_time = frame_time / math.ceil(frame_time / MAX_CHUNK_TIME)
+            self.recorder_chunksize = int(self.config.recorder.sample_rate * chunk_time / 1000)
+            self.recorder_chunk_bytes = (self.recorder_chunksize
+                                         * self.config.recorder.sample_width
+                                         * self.config.recorder.channels)
+            self.min_frame_chunks = round(frame_time / chunk_time)
+            max_frame_time = max(frame_time, self.config.recorder.max_frame_time or frame_time)
+            self.max_frame_chunks = math.ceil(max_frame_time / chunk_time)
+            self.frame_time = frame_time
+            self.logger.debug('Recording chunks of %d frames for audio frames of %d ms.',
+                              self.recorder_chunksize, frame_time)
+        self.recorder_bytes_per_ms = recorder_bytes_per_ms
+        self.capture = None
+        self.preroll_chunks = 0
+        self.consumers = ChunkFanout()
+        try:
+            self.chunk_queue = self.add_consumer(PUBLISHER,
+                                                 self.config.recorder.queue_size,
+                                                 self.config.recorder.queue_policy,
+                                                 self.on_chunk_queued)
+        except ValueError as error:
+            raise ConfigurationError('queuePolicy', str(error))
+        self.chunk_event = None
+        self.input_overflows = 0
+
+        self.metrics = SiteMetrics(self.config.site)
+        self.metrics.chunk_queue_depth.set_function(self.chunk_queue.qsize)
+        self.metrics.play_queue_depth.set_function(self.play_queue_depth)
+        self.metrics.input_overflows.set_function(self.count_input_overflows)
+        self.queue_dropping = set()
+        self.audio_frame_topic = AUDIO_FRAME.format(self.config.site)
+        self.encoder = None
+        if self.recorder_enabled:
+            codec = self.config.recorder.codec
+            if self.config.recorder.frame_topic:
+                self.audio_frame_topic = self.config.recorder.frame_topic.format(site=self.config.site)
+            elif codec != WAV:
+                self.audio_frame_topic += '/' + codec
+            try:
+                self.encoder = create_encoder(codec,
+                                              self.config.recorder.sample_rate,
+                                              self.config.recorder.sample_width,
+                                              self.config.recorder.channels,
+                                              self.dsp)
+            except (ValueError, ImportError) as error:
+                raise AudioCodecError(codec, str(error))
+            if codec != WAV:
+                self.logger.info('Publishing %s audio on %s.', codec, self.audio_frame_topic)
+
+        self.wakeword_listen = self.recorder_enabled and self.config.recorder.wakeup
+        if self.wakeword_listen:
+            self.logger.info('Wakeword listening enabled for site %s.', self.config.site)
+
+        self.vad = None
+        if self.wakeword_listen and self.config.recorder.vad.enabled:
+            self.logger.info('Voice Activity Detection enabled with mode %s.',
+                             self.config.recorder.vad.mode)
+            vad_framerate = self.config.recorder.sample_rate
+            if not vad_framerate in [8000,16000,32000,48000]:
+                vad_framerate = 16000
+            self.vad = VoiceActivityDetector(self.config.recorder.vad.mode,
+                                             vad_framerate,
+                                             self.config.recorder.vad.policy,
+                                             self.config.recorder.vad.ratio)
+
+        self.wakeword = None
+        self.wakeword_detected = None
+        if self.wakeword_listen and self.config.recorder.wakeword.enabled:
+            self.logger.info('Local wake word detection enabled with the %s detector.',
+                             self.config.recorder.wakeword.detector)
+            try:
+                self.wakeword = create_wakeword_detector(self.config.recorder.wakeword.detector,
+                                                         self.config.recorder.sample_rate,
+                                                         self.config.recorder.wakeword.options,
+                                                         self.dsp)
+            except (ValueError, TypeError, ImportError) as error:
+                raise WakewordDetectorError(self.config.recorder.wakeword.detector, str(error))
+
+        self.playing_audio = False
+        self.play_queue = None
+        self.record_executor = None
+        self.player_executor = None
+        self.play_wait_time = 0.0
+        # The jitter buffers of the streamed audio messages by request id.
+        # Finished streams are kept for a while to ignore late chunks.
+        self.play_streams = OrderedDict()
+        self.output_pool = OutputStreamPool(self.audio_output,
+                                            self.audio_out_index,
+                                            self.config.player.idle_timeout)
+        self.playback_cache = None
+        if self.config.player.cache_entries > 0:
+            self.playback_cache = PlaybackCache(self.config.player.cache_entries,
+                                                int(self.config.player.cache_size * 1024 * 1024))
+
+        self.server_stop = False
+
+        self.hermes_callbacks = {}
+        if self.recorder_enabled:
+            self.hermes_callbacks[ASR_TOGGLE_OFF] = self.on_stop_listening
+            self.hermes_callbacks[ASR_START_LISTENING] = self.on_start_listening
+            self.hermes_callbacks[ASR_STOP_LISTENING] = self.on_stop_listening
+        if self.recorder_enabled and self.config.recorder.wakeup:
+            self.hermes_callbacks[HOTWORD_TOGGLE_ON] = self.on_hotword_on
+            self.hermes_callbacks[HOTWORD_TOGGLE_OFF] = self.on_hotword_off
+
+        self.record_audio = False
+        self.set_record_audio(self.wakeword_listen)
+
+    def resolve_devices(self):
+        """Resolve the audio devices of the site from the device name
+        patterns, falling back to the default devices, and choose the
+        capture format.
+
+        Raises:
+            :exc:`NoDefaultAudioDeviceError`: If a device doesn't match and
+                there's no default device.
+        """
+        self.audio_in_index = -1
+        self.audio_out_index = -1
+        if self.recorder_enabled:
+            self.audio_in_index, device = self.server.find_device(self.audio_input,
+                                                                  self.config.recorder.device,
+                                                                  'maxInputChannels')
+            if device is not None:
+                self.audio_in = device['name']
+        if self.player_enabled:
+            self.audio_out_index, device = self.server.find_device(self.audio_output,
+                                                                   self.config.player.device,
+                                                                   'maxOutputChannels')
+            if device is not None:
+                self.audio_out = device['name']
+                self.device_out_rate = int(device['defaultSampleRate'])
+        if self.recorder_enabled and (self.audio_in_index < 0):
+            if not self.config.recorder.device is None:
+                self.logger.warning('Could not connect to audio input %s.', self.config.recorder.device)
+            try:
+                self.audio_in = self.audio_input.get_default_input_device_info()['name']
+            except OSError:
+                raise NoDefaultAudioDeviceError('input')
+        self.logger.info('Connected to audio input %s on site %s.', self.audio_in, self.config.site)
+        if self.player_enabled and (self.audio_out_index < 0):
+            if not self.config.player.device is None:
+                self.logger.warning('Could not connect to audio output %s.', self.config.player.device)
+            try:
+                self.audio_out = self.audio_output.get_default_output_device_info()['name']
+                self.device_out_rate = int(self.audio_output.get_default_output_device_info()['defaultSampleRate'])
+            except OSError:
+                raise NoDefaultAudioDeviceError('output')
+        self.logger.info('Connected to audio output %s on site %s.', self.audio_out, self.config.site)
+
+        # Capture in a format the input device supports natively, so the
+        # recorder converts audio only when the device has no such format.
+        self.capture_format = None
+        if self.recorder_enabled:
+            recorder_format = (self.config.recorder.sample_rate,
+                               self.config.recorder.sample_width,
+                               self.config.recorder.channels)
+            input_caps = self.server.device_capabilities(self.audio_input,
+                                                         self.audio_in_index, False)
+            self.capture_format = input_caps.choose(*recorder_format)
+            if self.capture_format != recorder_format:
+                self.logger.info('Audio input %s doesn\'t support %d Hz, %d bytes, %d channels;'
+                                 ' capturing %d Hz, %d bytes, %d channels and converting.',
+                                 self.audio_in, *recorder_format, *self.capture_format)
+        self.output_caps = None
+        if self.player_enabled:
+            self.output_caps = self.server.device_capabilities(self.audio_output,
+                                                               self.audio_out_index, True)
+
+    def set_record_audio(self, record_audio):
+        """Start or stop recording audio.
+
+        State transitions run on the event loop. The record thread waits for
+        the record event while it isn't recording.
+
+        Args:
+            record_audio (bool): Whether to record audio.
+        """
+        self.record_audio = record_audio
+        if record_audio:
+            self.record_event.set()
+        else:
+            self.record_event.clear()
+
+
+    async def release_devices(self):
+        """Close the audio streams of the site so its audio devices can be
+        resolved again.
+
+        Waits for the record thread to close its input stream and for the
+        audio message that is playing. Queued audio messages stay queued
+        until :meth:`resume_devices` is called.
+
+        Returns:
+            bool: False if the record thread didn't close its input stream
+            in time.
+        """
+        loop = self.server.loop
+        self.reroute_done.clear()
+        self.reroute.set()
+        self.record_event.set()
+        self.retry_event.set()
+        released = True
+        if self.recorder_enabled:
+            released = await loop.run_in_executor(None, self.capture_released.wait,
+                                                  DEVICE_RELEASE_TIMEOUT)
+            if not released:
+                self.logger.warning('The audio input stream of site %s wasn\'t closed'
+                                    ' within %d s.', self.config.site, DEVICE_RELEASE_TIMEOUT)
+        await self.device_lock.acquire()
+        await loop.run_in_executor(self.player_executor, self.output_pool.close)
+        return released
+
+    def reroute_devices(self, audio):
+        """Resolve the audio devices of the site again after
+        :meth:`release_devices`.
+
+        Args:
+            audio: The new PyAudio object of the server.
+
+        Raises:
+            :exc:`NoDefaultAudioDeviceError`: If a device doesn't match and
+                there's no default device.
+        """
+        if self.recorder_enabled and self.config.recorder.backend == PYAUDIO:
+            self.audio_input = audio
+        if self.player_enabled and self.config.player.backend == PYAUDIO:
+            self.audio_output = audio
+        output = (self.audio_out, self.audio_out_index, self.device_out_rate)
+        self.resolve_devices()
+        self.output_pool.audio = self.audio_output
+        self.output_pool.device_index = self.audio_out_index
+        if self.playback_cache is not None and \
+                output != (self.audio_out, self.audio_out_index, self.device_out_rate):
+            # The cached audio was converted for the previous device.
+            self.playback_cache.clear()
+            self.metrics.playback_cache_bytes.set(0)
+
+    def resume_devices(self):
+        """Resume recording and playing audio after the audio devices were
+        rerouted."""
+        self.reroute.clear()
+        self.capture_released.clear()
+        self.reroute_done.set()
+        if self.device_lock.locked():
+            self.device_lock.release()
+        self.set_record_audio(self.record_audio)
+
+    def device_error(self):
+        """Report a failed audio stream, whose device may have been
+        unplugged, so the server checks whether the audio devices changed.
+        The site opens the stream again itself. This may be called in the
+        audio threads."""
+        self.server.call_in_loop(self.server.check_devices)
+
+    def terminate(self):
+        """Terminate the audio backends of the site that aren't shared with
+        the server."""
+        for backend in (self.audio_input, self.audio_output):
+            if backend is not None and backend is not self.server.audio:
+                backend.terminate()
+
+    def subscribe(self):
+        """Subscribe to the MQTT topics of the site.
+
+        The Hermes topics that are shared by all sites are subscribed by the
+        server, which passes their messages to :meth:`on_hermes_message`.
+        """
+        mqtt = self.server.mqtt
+        if self.recorder_enabled and not self.player_enabled:
+            play_finished = PLAY_FINISHED.format(self.config.site)
+            mqtt.subscribe(play_finished)
+            mqtt.message_callback_add(play_finished, self.on_play_finished)
+            self.logger.info('Subscribed to %s topic.', play_finished)
+
+        if self.recorder_enabled or self.player_enabled:
+            play_bytes = PLAY_BYTES.format(self.config.site)
+            mqtt.subscribe(play_bytes)
+            mqtt.message_callback_add(play_bytes, self.on_play_bytes)
+            self.logger.info('Subscribed to %s topic.', play_bytes)
+            play_bytes_streaming = PLAY_BYTES_STREAMING.format(self.config.site)
+            mqtt.subscribe(play_bytes_streaming)
+            mqtt.message_callback_add(play_bytes_streaming, self.on_play_bytes_streaming)
+            self.logger.info('Subscribed to %s topic.', play_bytes_streaming)
+
+    def on_hermes_message(self, client, userdata, message):
+        """Callback that is called when the server receives a message for
+        this site on one of the shared Hermes topics."""
+        callback = self.hermes_callbacks.get(message.topic)
+        if callback is not None:
+            callback(client, userdata, message)
+
+    def on_play_finished(self, client, userdata, message):
+        """Callback that is called when the audio player receives a PLAY_FINISHED
+        message on MQTT.
+        """
+        self.logger.info('Received a %s message'
+                         ' on site %s.',
+                         message.topic,
+                         self.config.site)
+
+        self.playing_audio = False
+        self.set_record_audio(self.listen_audio)
+
+    def on_hotword_on(self, client, userdata, message):
+        """Callback that is called when the audio player receives a HOTWORD_TOGGLE_ON
+        message on MQTT.
+        """
+        self.logger.info('Received a %s message'
+                         ' on site %s.',
+                         message.topic,
+                         self.config.site)
+        self.wakeword_listen = True
+        self.wakeword_detected = None
+        self.set_record_audio(not self.playing_audio)
+
+    def on_hotword_off(self, client, userdata, message):
+        """Callback that is called when the audio player receives a HOTWORD_TOGGLE_OFF
+        message on MQTT.
+        """
+        self.logger.info('Received a %s message'
+                         ' on site %s.',
+                         message.topic,
+                         self.config.site)
+        self.wakeword_listen = False
+        self.set_record_audio(self.listen_audio and not self.playing_audio)
+
+    def on_start_listening(self, client, userdata, message):
+        """Callback that is called when the audio player receives a ASR_START_LISTENING
+        message on MQTT.
+        """
+        self.logger.info('Received a %s message'
+                         ' on site %s.',
+                         message.topic,
+                         self.config.site)
+        self.listen_audio = True
+        self.set_record_audio(not self.playing_audio)
+
+    def on_stop_listening(self, client, userdata, message):
+        """Callback that is called when the audio player receives a ASR_STOP_LISTENING
+        or ASR_TOGGLE_OFF message on MQTT.
+        """
+        self.logger.info('Received a %s message'
+                         ' on site %s.',
+                         message.topic,
+                         self.config.site)
+        self.listen_audio = False
+        self.wakeword_detected = None
+        self.set_record_audio(self.wakeword_listen and not self.playing_audio)
+
+    def start(self):
+        """Start the audio tasks of the site on the event loop of the server.
+
+        Publishing and the state of the player run as coroutines on the event
+        loop. Only the blocking audio I/O runs in executor threads: one for
+        the recorder and one for the player.
+
+        Returns:
+            list: The tasks of the site.
+        """
+        loop = self.server.loop
+        self.chunk_event = asyncio.Event()
+        self.play_queue = asyncio.Queue()
+        self.device_lock = asyncio.Lock()
+        self.record_executor = ThreadPoolExecutor(1, thread_name_prefix='record-' + self.config.site)
+        self.player_executor = ThreadPoolExecutor(1, thread_name_prefix='player-' + self.config.site)
+        tasks = []
+        if self.recorder_enabled:
+            tasks.append(loop.run_in_executor(self.record_executor, self.record))
+            tasks.append(loop.create_task(self.publish_chunks()))
+        if self.player_enabled:
+            tasks.append(loop.create_task(self.play()))
+        return tasks
+
+    def finish(self):
+        """Signal the audio tasks of the site to finish. This runs on the
+        event loop when the server stops."""
+        self.server_stop = True
+        self.record_event.set()
+        self.reroute_done.set()
+        self.retry_event.set()
+        self.play_queue.put_nowait(None)
+        for buffer in self.play_streams.values():
+            buffer.close()
+
+    def shutdown(self):
+        """Shut down the executor threads of the site."""
+        self.record_executor.shutdown(wait=False)
+        self.player_executor.shutdown(wait=False)
+
+    def stop(self):
+        """Stop recording and playing audio."""
+        self.server_stop = True
+        self.set_record_audio(False)
+        # Wake up the record thread so it sees the server stopped.
+        self.record_event.set()
+        self.reroute_done.set()
+        self.retry_event.set()
+        self.consumers.close()
+        if self.play_queue is not None:
+            self.server.call_in_loop(self.play_queue.put_nowait, None)
+
+    def publish_frames(self, frames):
+        """Publish frames on MQTT.
+
+        Args:
+            frames (bytes): The audio frames encoded with the codec of the
+                recorder, a WAV file by default.
+        """
+        audio_frame_topic = self.audio_frame_topic
+        audio_frame_message = frames
+        if self.server.publish(audio_frame_topic, audio_frame_message):
+            self.metrics.published(audio_frame_message)
+        self.logger.debug('Published message on MQTT topic:')
+        self.logger.debug('Topic: %s', audio_frame_topic)
+        self.logger.debug('Message: %d bytes', len(audio_frame_message))
+
+    def is_silence(self, vad_frames) -> bool:
+        """Detect silence in recorded audio"""
+        if not self.vad is None:
+            speech = self.vad.is_speech(vad_frames)
+            self.logger.debug('Speech in %d%% of the classified VAD frames.',
+                              self.vad.ratio * 100)
+            return not speech
+        else:
+            return False
+
+    def record(self):
+        """Record audio."""
+        recorder_framerate = self.config.recorder.sample_rate
+        recorder_samplewidth = self.config.recorder.sample_width
+        recorder_channels = self.config.recorder.channels
+        recorder_chunksize = self.recorder_chunksize
+        keep_open = self.config.recorder.keep_open
+        preroll_chunks = math.ceil(self.config.recorder.vad.preroll
+                                   * recorder_framerate / recorder_chunksize)
+        self.preroll_chunks = preroll_chunks
+        capture = None
+        retry_time = DEVICE_RETRY_TIME
+        while not self.server_stop:
+            if self.reroute.is_set():
+                if capture is not None:
+                    self.close_capture(capture)
+                    capture = None
+                self.capture_released.set()
+                self.reroute_done.wait()
+                continue
+            if self.record_audio:
+                failed = False
+                try:
+                    if capture is None:
+                        self.logger.debug('Opening audio input stream...')
+                        capture_rate, capture_width, capture_channels = self.capture_format
+                        capture_chunksize = round(recorder_chunksize * capture_rate
+                                                  / recorder_framerate)
+                        capture = create_capture(self.config.recorder.capture_mode,
+                                                 self.audio_input,
+                                                 capture_rate,
+                                                 capture_width,
+                                                 capture_channels,
+                                                 capture_chunksize,
+                                                 self.audio_in_index,
+                                                 self.config.recorder.buffer_time,
+                                                 self.chunk_buffers())
+                        capture.open()
+                        self.capture = capture
+                        # A consumer may have been added since the number of
+                        # chunk buffers was computed.
+                        capture.grow_chunk_buffers(self.chunk_buffers())
+                    else:
+                        self.logger.debug('Resuming audio input stream...')
+                        capture.resume()
+
+                    self.logger.info('Starting broadcasting audio from device %s'
+                                     ' on site %s (%d, %d, %d)',
+                                     self.audio_in, self.config.site,
+                                     recorder_framerate, recorder_samplewidth, recorder_channels)
+
+                    in_silence = True
+                    vad_silence = self.config.recorder.vad.silence
+                    silence_frames = int(recorder_framerate / recorder_chunksize * vad_silence)
+                    silence_count = silence_frames
+                    vad_enabled = self.config.recorder.wakeup and self.config.recorder.vad.enabled
+                    vad_convert_mono = recorder_channels > 1
+                    vad_convert_width = recorder_samplewidth != VAD_SAMPLE_WIDTH
+                    vad_convert_rate = not recorder_framerate in [8000,16000,32000,48000]
+                    vad_framerate = 16000 if vad_convert_rate else recorder_framerate
+                    vad_resampler = self.dsp.resampler(VAD_SAMPLE_WIDTH, 1,
+                                                       recorder_framerate,
+                                                       vad_framerate)
+                    converter = None
+                    if self.capture_format != (recorder_framerate, recorder_samplewidth,
+                                               recorder_channels):
+                        converter = FormatConverter(self.dsp, self.capture_format,
+                                                    (recorder_framerate, recorder_samplewidth,
+                                                     recorder_channels))
+                    if self.vad is not None:
+                        self.vad.reset()
+                    if self.wakeword is not None:
+                        self.wakeword.reset()
+                    # Audio before the start of voice activity, published
+                    # ahead of the first voiced chunk.
+                    preroll = deque(maxlen=preroll_chunks)
+
+                    try:
+                        while self.record_audio and not self.reroute.is_set():
+                            frames = capture.read()
+                            captured = time.monotonic()
+                            if converter is not None and frames:
+                                frames = converter.convert(frames)
+                            # if still recording publish the frames
+                            if self.record_audio:
+                                if frames:
+                                    if vad_enabled and self.wakeword_listen:
+                                        vad_start = time.thread_time()
+                                        vad_frames = frames
+                                        # VAD needs mono
+                                        if vad_convert_mono:
+                                            self.logger.debug('Converting frames to mono...')
+                                            vad_frames = self.dsp.tomono(vad_frames,
+                                                                         recorder_samplewidth,
+                                                                         recorder_channels)
+                                        # VAD needs 16 bit samples
+                                        if vad_convert_width:
+                                            self.logger.debug('Converting sample width...')
+                                            vad_frames = self.dsp.lin2lin(vad_frames,
+                                                                          recorder_samplewidth,
+                                                                          VAD_SAMPLE_WIDTH)
+                                        # rate should be 8, 16, 32 or 48 KHz
+                                        if vad_convert_rate:
+                                            self.logger.debug('Converting frame_rate...')
+                                            vad_frames = vad_resampler.convert(vad_frames)
+                                        # check for speech
+                                        self.logger.debug('Checking for speech in %dHz frames (%d bytes)',
+                                                          vad_framerate, len(vad_frames))
+                                        silence = self.is_silence(vad_frames)
+                                        self.metrics.vad_cpu_seconds.inc(time.thread_time()
+                                                                         - vad_start)
+                                        self.metrics.vad_audio_seconds.inc(
+                                            len(frames) / recorder_samplewidth
+                                            / recorder_channels / recorder_framerate)
+                                        if not silence:
+                                            if in_silence:
+                                                in_silence = False
+                                                silence_count = silence_frames
+                                                self.logger.info('Voice activity started on site %s.',
+                                                                 self.config.site)
+                                                while preroll:
+                                                    self.stream_chunk(*preroll.popleft())
+                                            self.stream_chunk(frames, captured)
+                                        elif (not in_silence):
+                                            if silence_count > 0:
+                                                self.stream_chunk(frames, captured)
+                                                silence_count -= 1
+                                            else:
+                                                in_silence = True
+                                                self.logger.info('Voice activity stopped on site %s.',
+                                                                 self.config.site)
+                                                preroll.append((frames, captured))
+                                        else:
+                                            preroll.append((frames, captured))
+                                    else:
+                                        self.stream_chunk(frames, captured)
+                                else:
+                                    # Avoid 100% CPU usage
+                                    time.sleep(0.01)
+                    except Exception as ee:
+                        self.logger.exception("record")
+                        self.logger.error('Reading Audio chunks Error for %s : %s',
+                                          self.config.site,
+                                          str(ee))
+                        failed = True
+
+                    for name in self.consumers.names():
+                        chunk_queue = self.consumers.get(name)
+                        if chunk_queue is not None and (chunk_queue.dropped_ms
+                                                        or chunk_queue.coalesced_ms):
+                            self.logger.info('Dropped %d ms and coalesced %d ms of audio'
+                                             ' for %s on site %s so far.',
+                                             chunk_queue.dropped_ms,
+                                             chunk_queue.coalesced_ms,
+                                             name,
+                                             self.config.site)
+
+                    if failed:
+                        self.close_capture(capture)
+                        capture = None
+                    elif keep_open and not self.server_stop:
+                        self.logger.debug('Pausing audio input stream...')
+                        capture.pause()
+                    else:
+                        self.close_capture(capture)
+                        capture = None
+
+                    self.logger.info('Finished broadcasting audio from device %s'
+                                     ' on site %s.', self.audio_in, self.config.site)
+
+                except Exception as e:
+                    self.logger.exception("record")
+                    self.logger.error('Recording Error for %s : %s',
+                                      self.config.site,
+                                      str(e))
+                    if capture is not None:
+                        try:
+                            self.close_capture(capture)
+                        except Exception:
+                            self.logger.debug('Can\'t close the failed audio input stream.')
+                        capture = None
+                    failed = True
+                if failed:
+                    # The device may have been unplugged. Only this stream is
+                    # opened again, with a growing delay while it keeps
+                    # failing.
+                    self.device_error()
+                    self.retry_event.clear()
+                    if not (self.server_stop or self.reroute.is_set()):
+                        self.retry_event.wait(retry_time)
+                    retry_time = min(2 * retry_time, DEVICE_MAX_RETRY_TIME)
+                else:
+                    retry_time = DEVICE_RETRY_TIME
+
+            if not self.record_audio:
+                self.record_event.wait()
+
+        if capture is not None:
+            self.close_capture(capture)
+
+    def chunk_buffers(self):
+        """Return the number of rotating chunk buffers of the callback
+        capture: enough that a chunk isn't overwritten while the consumer
+        queues or the pre-roll still hold it."""
+        return self.consumers.capacity() + self.preroll_chunks + CHUNK_BUFFERS
+
+    def stream_chunk(self, chunk, captured):
+        """Queue a recorded audio chunk for the consumers, and for publishing
+        unless the site waits for a local wake word detection.
+
+        While the site listens for the wake word with a local detector, the
+        chunks go to the detector and to the other consumers, but not to the
+        MQTT publisher. After a detection, the chunks are published until
+        the ASR session ends, or for the wake word timeout when no session
+        starts.
+
+        Args:
+            chunk (bytes): The audio chunk.
+            captured (float): The :func:`time.monotonic` time the chunk was
+                read.
+        """
+        if self.wakeword is None or self.listen_audio or not self.wakeword_listen:
+            self.queue_chunk(chunk, captured)
+            return
+        detected = self.wakeword_detected
+        if detected is not None:
+            if captured - detected < self.config.recorder.wakeword.timeout:
+                self.queue_chunk(chunk, captured)
+                return
+            self.logger.info('No ASR session started after the wake word on site %s.',
+                             self.config.site)
+            self.wakeword_detected = None
+            self.wakeword.reset()
+
+        self.queue_chunk(chunk, captured, publish=False)
+        frames = chunk
+        if self.config.recorder.channels > 1:
+            frames = self.dsp.tomono(frames,
+                                     self.config.recorder.sample_width,
+                                     self.config.recorder.channels)
+        if self.config.recorder.sample_width != WAKEWORD_SAMPLE_WIDTH:
+            frames = self.dsp.lin2lin(frames,
+                                      self.config.recorder.sample_width,
+                                      WAKEWORD_SAMPLE_WIDTH)
+        if self.wakeword.process(frames):
+            self.logger.info('Wake word detected on site %s.', self.config.site)
+            self.wakeword_detected = captured
+            self.server.call_in_loop(self.publish_hotword_detected)
+
+    def queue_chunk(self, chunk, captured=None, publish=True):
+        """Queue a recorded audio chunk for the consumers.
+
+        Args:
+            chunk (bytes): The audio chunk.
+            captured (float, optional): The :func:`time.monotonic` time the
+                chunk was read. Defaults to now.
+            publish (bool, optional): Whether the chunk is queued for the
+                MQTT publisher too. Defaults to True.
+        """
+        skip = () if publish else (PUBLISHER,)
+        dropping = set(self.consumers.put(chunk, captured, skip))
+        if not self.server_stop:
+            for name in dropping - self.queue_dropping:
+                self.logger.warning('Audio chunk queue of %s full on site %s,'
+                                    ' dropping audio (%s policy).',
+                                    name,
+                                    self.config.site,
+                                    self.consumers.get(name).policy)
+        self.queue_dropping = dropping
+
+    def add_consumer(self, name, maxsize=50, policy=DROP_OLDEST, listener=None):
+        """Register a consumer of the recorded audio chunks of the site.
+
+        The consumer gets the same chunks as the MQTT publisher from the
+        same input stream, in its own bounded queue. The chunks are shared
+        with the other consumers and must not be modified. The callback
+        capture reuses its chunk buffers once the queues could have dropped
+        the chunks, so a consumer copies the chunks it keeps. When the
+        capture is open, it gets chunk buffers for the new queue.
+
+        Args:
+            name (str): The name of the consumer.
+            maxsize (int, optional): The maximum number of queued chunks.
+                Defaults to 50.
+            policy (str, optional): The policy when the queue is full.
+                Defaults to 'drop-oldest'.
+            listener (callable, optional): A function without arguments
+                that is called after audio was put into the queue, which
+                may be in the record thread.
+
+        Returns:
+            :class:`.ChunkQueue`: The queue of the consumer.
+
+        Raises:
+            :exc:`ValueError`: If the policy is unknown.
+        """
+        chunk_queue = self.consumers.add(name, ChunkQueue(max(1, maxsize), policy,
+                                                          self.recorder_bytes_per_ms,
+                                                          listener))
+        capture = self.capture
+        if capture is not None:
+            # The open capture needs room for the chunks of the new queue.
+            capture.grow_chunk_buffers(self.chunk_buffers())
+        return chunk_queue
+
+    def remove_consumer(self, name):
+        """Unregister a consumer of the recorded audio chunks and close its
+        queue."""
+        self.consumers.remove(name)
+
+    def on_chunk_queued(self):
+        """Called by the chunk queue when a chunk was queued, which may be in
+        the record thread. Wakes up the publisher on the event loop."""
+        if self.chunk_event is not None:
+            self.server.call_in_loop(self.chunk_event.set)
+
+    def play_queue_depth(self):
+        """Return the number of audio messages waiting to be played."""
+        play_queue = self.play_queue
+        return play_queue.qsize() if play_queue is not None else 0
+
+    def count_input_overflows(self):
+        """Return the number of audio input overflows since the server
+        started."""
+        capture = self.capture
+        return self.input_overflows + (capture.overflows if capture is not None else 0)
+
+    def close_capture(self, capture):
+        """Close an audio capture engine and report its input overflows."""
+        self.logger.debug('Closing audio input stream...')
+        capture.close()
+        self.capture = None
+        self.input_overflows += capture.overflows
+        if capture.overflows:
+            self.logger.warning('Audio input overflowed %d times on site %s.',
+                                capture.overflows, self.config.site)
+
+    async def publish_chunks(self):
+        """Publish audio chunks to MQTT.
+
+        The publisher waits for the chunk queue to signal new audio, so it
+        doesn't wake up while nothing is recorded. Consecutive chunks are
+        batched in audioFrame messages of the configured frame time. In adaptive mode the frame time grows when the
+        chunk queue backs up, publishing is slow or the connection to the
+        broker is congested, and shrinks again when publishing has recovered.
+        Audio is dropped while the connection is backed up.
+        """
+        chunk_time = self.recorder_chunksize / self.config.recorder.sample_rate
+        frame_chunks = self.min_frame_chunks
+        recovered = 0
+        frame = bytearray()
+        frame_captured = None
+        try:
+            while not self.server_stop:
+                try:
+                    chunk, captured = self.chunk_queue.get_entry(block=False)
+                except queue.Empty:
+                    self.chunk_event.clear()
+                    if not self.chunk_queue.empty():
+                        continue
+                    try:
+                        await asyncio.wait_for(self.chunk_event.wait(),
+                                               2 * chunk_time if frame else None)
+                    except asyncio.TimeoutError:
+                        # Publish a partial frame when no more audio arrives.
+                        self.publish_audio(frame, frame_captured)
+                        frame = bytearray()
+                    continue
+
+                if not chunk:
+                    continue
+                frame_bytes = frame_chunks * self.recorder_chunk_bytes
+                if not frame and len(chunk) >= frame_bytes:
+                    payload = chunk
+                    frame_captured = captured
+                else:
+                    if not frame:
+                        frame_captured = captured
+                    frame += chunk
+                    if len(frame) < frame_bytes:
+                        continue
+                    payload = frame
+                    frame = bytearray()
+
+                # MQTT output
+                latency = self.publish_audio(payload, frame_captured)
+                if latency is None:
+                    continue
+
+                if self.max_frame_chunks > self.min_frame_chunks:
+                    slow = self.chunk_queue.qsize() > frame_chunks or latency > chunk_time / 2 \
+                        or self.server.publisher.congested
+                    frame_chunks, recovered = self.adapt_frame_chunks(frame_chunks, recovered, slow)
+
+        except Exception as e:
+            self.logger.exception("publish_chunks")
+            self.logger.error('Publishing chunks Error for %s : %s',
+                              self.config.site,
+                              str(e))
+
+    def publish_audio(self, audio, captured):
+        """Encode and publish recorded audio in an audioFrame message, unless
+        the connection to the broker is backed up.
+
+        Args:
+            audio (bytes): The recorded audio.
+            captured (float): The monotonic time at which the first chunk of
+                the audio was captured.
+
+        Returns:
+            float: The time in seconds it took to encode and publish the
+            audio, or `None` if the audio was dropped.
+        """
+        publisher = self.server.publisher
+        if publisher.full and not publisher.topic_qos(self.audio_frame_topic):
+            # The audio is dropped before it's encoded instead of queued in
+            # the MQTT client.
+            self.metrics.mqtt_dropped_frames.inc()
+            return None
+        start = time.monotonic()
+        self.publish_frames(self.encoder.frame(audio))
+        published = time.monotonic()
+        self.metrics.capture_publish_latency.observe(published - captured)
+        return published - start
+
+    def adapt_frame_chunks(self, frame_chunks, recovered, slow):
+        """Adapt the number of recorded chunks in an audio frame.
+
+        Args:
+            frame_chunks (int): The current number of chunks in a frame.
+            recovered (int): The number of frames published without slowness.
+            slow (bool): Whether publishing the last frame was slow.
+
+        Returns:
+            tuple: The new number of chunks in a frame and the new number of
+            frames published without slowness.
+        """
+        recovered = 0 if slow else recovered + 1
+        if slow and frame_chunks < self.max_frame_chunks:
+            frame_chunks = min(2 * frame_chunks, self.max_frame_chunks)
+        elif recovered >= FRAME_RECOVERY_COUNT and frame_chunks > self.min_frame_chunks:
+            frame_chunks = max(frame_chunks // 2, self.min_frame_chunks)
+            recovered = 0
+        else:
+            return frame_chunks, recovered
+        self.frame_time = int(frame_chunks * self.recorder_chunksize * 1000
+                              / self.config.recorder.sample_rate)
+        self.logger.debug('Audio frame time on site %s is now %d ms.',
+                          self.config.site, self.frame_time)
+        return frame_chunks, recovered
+
+    def on_play_bytes(self, client, userdata, message):
+        """Callback that is called when the audio player receives a PLAY_BYTES
+        message on MQTT.
+
+        The audio message is queued for the player, so the MQTT event loop
+        doesn't block while the audio is playing.
+        """
+        self.playing_audio = True
+        self.set_record_audio(False)
+
+        if self.player_enabled:
+            request_id = message.topic.split('/')[4]
+            length = format_size(len(message.payload), binary=True)
+            self.logger.info('Received an audio message of length %s'
+                             ' with request id %s on site %s.',
+                             length,
+                             request_id,
+                             self.config.site)
+            self.play_queue.put_nowait((request_id, message.payload, time.monotonic()))
+            self.logger.debug('Playback queue depth: %d', self.play_queue.qsize())
+
+    def on_play_bytes_streaming(self, client, userdata, message):
+        """Callback that is called when the audio player receives a chunk of a
+        PLAY_BYTES_STREAMING message on MQTT.
+
+        The first chunk of an audio message queues its jitter buffer for the
+        player, so playback starts before the last chunk arrives. Later
+        chunks go into the jitter buffer, which puts them back in order.
+        """
+        self.playing_audio = True
+        self.set_record_audio(False)
+
+        if self.player_enabled:
+            try:
+                request_id, index, last = message.topic.split('/')[4:7]
+                index = int(index)
+            except ValueError:
+                self.logger.warning('Invalid streamed audio topic %s.', message.topic)
+                return
+            buffer = self.play_streams.get(request_id)
+            if buffer is None:
+                buffer = JitterBuffer(request_id, self.config.player.stream_timeout)
+                self.play_streams[request_id] = buffer
+                while len(self.play_streams) > MAX_PLAY_STREAMS:
+                    self.play_streams.popitem(last=False)[1].close()
+                self.logger.info('Receiving a streamed audio message'
+                                 ' with request id %s on site %s.',
+                                 request_id,
+                                 self.config.site)
+                self.play_queue.put_nowait((request_id, buffer, time.monotonic()))
+                self.logger.debug('Playback queue depth: %d', self.play_queue.qsize())
+            if not buffer.put(index, message.payload, last.lower() in LAST_CHUNK):
+                self.logger.debug('Dropped late chunk %d of audio message with id %s.',
+                                  index, request_id)
+
+    async def play(self):
+        """Play the queued audio messages.
+
+        The audio is written to the output stream in the player executor
+        thread, so the event loop keeps processing MQTT messages.
+        """
+        while not self.server_stop:
+            try:
+                request = await asyncio.wait_for(self.play_queue.get(),
+                                                 self.output_pool.idle_timeout
+                                                 if len(self.output_pool) else None)
+            except asyncio.TimeoutError:
+                self.logger.debug('Closing idle audio output streams...')
+                async with self.device_lock:
+                    await self.server.loop.run_in_executor(self.player_executor,
+                                                           self.output_pool.close_idle)
+                continue
+            if request is None:
+                break
+            request_id, payload, queued = request
+            self.play_wait_time = time.monotonic() - queued
+            self.metrics.play_queue_wait.observe(self.play_wait_time)
+            self.logger.debug('Audio message with id %s waited %.1f ms for playback'
+                              ' (%d more queued).',
+                              request_id,
+                              self.play_wait_time * 1000,
+                              self.play_queue.qsize())
+            if isinstance(payload, JitterBuffer):
+                play_function, payloads = self.play_stream, payload
+            else:
+                play_function, payloads = self.play_bytes, payload
+            try:
+                # The audio devices aren't rerouted while a message plays.
+                async with self.device_lock:
+                    played = await self.server.loop.run_in_executor(self.player_executor,
+                                                                    play_function,
+                                                                    request_id, payloads,
+                                                                    queued)
+                if played:
+                    self.publish_play_finished(request_id)
+            except Exception as e:
+                self.logger.exception("play")
+                self.logger.error('Playing Error for %s : %s',
+                                  self.config.site,
+                                  str(e))
+                # The device may have been unplugged. The next audio message
+                # opens a new output stream.
+                self.device_error()
+                try:
+                    await self.server.loop.run_in_executor(self.player_executor,
+                                                           self.output_pool.close)
+                except Exception:
+                    self.logger.debug('Can\'t close the failed audio output streams.')
+
+            if self.play_queue.empty():
+                self.playing_audio = False
+                self.set_record_audio(self.listen_audio)
+
+        await self.server.loop.run_in_executor(self.player_executor, self.output_pool.close)
+
+    def play_bytes(self, request_id, payload, received=None):
+        """Play an audio message on the audio output.
+
+        The decoded and resampled audio of the message is kept in the
+        playback cache, so a message with the same payload is written to the
+        output stream as it is.
+
+        Args:
+            request_id (str): The request id of the audio message.
+            payload (bytes): The WAV data of the audio message.
+            received (float, optional): The :func:`time.monotonic` time the
+                audio message was received, for the latency metrics.
+
+        Returns:
+            bool: Whether the audio message was played.
+        """
+        if self.playback_cache is None:
+            return self.play_wavs(request_id, [payload], received)
+
+        key = self.playback_cache.key(payload)
+        audio = self.playback_cache.get(key)
+        if audio is not None:
+            self.metrics.playback_cache_hits.inc()
+            return self.play_cached(request_id, audio, received)
+
+        self.metrics.playback_cache_misses.inc()
+        decoded = []
+        played = self.play_wavs(request_id, [payload], received, decoded)
+        if played and len(decoded) == 1:
+            if self.playback_cache.put(key, decoded[0]):
+                self.logger.debug('Cached %d bytes of decoded audio of audio message with id %s.',
+                                  len(decoded[0].frames), request_id)
+            self.metrics.playback_cache_bytes.set(self.playback_cache.size)
+        return played
+
+    def play_cached(self, request_id, audio, received=None):
+        """Play the cached audio of an audio message on the audio output.
+
+        Args:
+            request_id (str): The request id of the audio message.
+            audio (:class:`.CachedAudio`): The decoded audio.
+            received (float, optional): The :func:`time.monotonic` time the
+                audio message was received, for the latency metrics.
+
+        Returns:
+            bool: Whether the audio message was played.
+        """
+        self.logger.debug('Playing cached audio of audio message with id %s...', request_id)
+        opened = self.output_pool.opened
+        start = time.monotonic()
+        stream = self.output_pool.acquire(audio.sample_format, audio.channels, audio.rate)
+        if self.output_pool.opened != opened:
+            self.metrics.output_stream_open_time.observe(time.monotonic() - start)
+        frames = memoryview(audio.frames)
+        chunk_size = PLAY_CHUNK_SIZE * self.audio_output.get_sample_size(audio.sample_format) \
+            * audio.channels
+        try:
+            for offset in range(0, len(frames), chunk_size):
+                stream.write(frames[offset:offset + chunk_size])
+                if received is not None:
+                    self.metrics.play_first_sample_latency.observe(time.monotonic() - received)
+                    received = None
+        except BaseException:
+            stream.close()
+            raise
+
+        self.output_pool.release(stream, audio.sample_format, audio.channels, audio.rate)
+        self.logger.info('Finished playing audio message with id %s'
+                         ' on device %s on site %s.',
+                         request_id,
+                         self.audio_out,
+                         self.config.site)
+        return True
+
+    def play_stream(self, request_id, buffer, received=None):
+        """Play a streamed audio message on the audio output while its chunks
+        arrive.
+
+        Args:
+            request_id (str): The request id of the audio message.
+            buffer (:class:`.JitterBuffer`): The jitter buffer with the WAV
+                data of the chunks of the audio message.
+            received (float, optional): The :func:`time.monotonic` time the
+                first chunk was received, for the latency metrics.
+
+        Returns:
+            bool: Whether the audio message was played.
+        """
+        played = self.play_wavs(request_id, buffer, received)
+        if buffer.skipped:
+            self.logger.warning('Skipped %d missing chunks of audio message with id %s.',
+                                buffer.skipped, request_id)
+        if buffer.stalled:
+            self.logger.warning('No chunk of audio message with id %s arrived within %s s.',
+                                request_id, buffer.timeout)
+        return played
+
+    def output_rate(self, frame_rate, sample_width, n_channels):
+        """Return the sample rate of the output stream for audio.
+
+        Audio is played at its own sample rate if the output device supports
+        it natively and no frame rate is configured, so it needn't be
+        resampled.
+
+        Args:
+            frame_rate (int): The sample rate of the audio.
+            sample_width (int): The sample width of the audio.
+            n_channels (int): The number of channels of the audio.
+
+        Returns:
+            int: The sample rate of the output stream.
+        """
+        if not self.config.player.auto_convert:
+            return self.device_out_rate
+        if self.audio_out_rate is not None:
+            return self.audio_out_rate
+        if frame_rate == self.device_out_rate or \
+                self.output_caps.supports(frame_rate, sample_width, n_channels):
+            return frame_rate
+        return self.device_out_rate
+
+    def play_wavs(self, request_id, payloads, received=None, decoded=None):
+        """Play WAV files one after the other on the audio output.
+
+        The WAV files share an output stream and a resampler as long as
+        their audio format doesn't change, so the chunks of a streamed audio
+        message play without gaps.
+
+        Args:
+            request_id (str): The request id of the audio message.
+            payloads (iterable): The WAV data, which may be compressed.
+            received (float, optional): The :func:`time.monotonic` time the
+                audio message was received, for the latency metrics.
+            decoded (list, optional): A list the :class:`.CachedAudio` of each
+                played WAV file is appended to, for the playback cache.
+
+        Returns:
+            bool: Whether audio of the message was played.
+        """
+        stream = None
+        stream_key = None
+        wav_format = None
+        resampler = None
+        audio_out_rate = None
+        played = False
+        try:
+            for payload in payloads:
+                try:
+                    payload = decode_audio(payload, self.dsp)
+                except (ImportError, ValueError, RuntimeError) as error:
+                    self.logger.warning('Can\'t decode audio message with id %s: %s',
+                                        request_id, str(error))
+                    continue
+                with io.BytesIO(payload) as wav_buffer:
+                    try:
+                        with wave.open(wav_buffer, 'rb') as wav:
+                            sample_width = wav.getsampwidth()
+                            sample_format = self.audio_output.get_format_from_width(sample_width)
+                            n_channels = wav.getnchannels()
+                            frame_rate = wav.getframerate()
+
+                            if wav_format != (sample_width, n_channels, frame_rate):
+                                self.logger.debug('Sample width: %s', sample_width)
+                                self.logger.debug('Channels: %s', n_channels)
+                                self.logger.debug('Frame rate: %s', frame_rate)
+                                if stream is not None:
+                                    self.output_pool.release(stream, *stream_key)
+                                    stream = None
+                                audio_out_rate = self.output_rate(frame_rate, sample_width,
+                                                                  n_channels)
+                                opened = self.output_pool.opened
+                                start = time.monotonic()
+                                stream = self.output_pool.acquire(sample_format, n_channels,
+                                                                  audio_out_rate)
+                                if self.output_pool.opened != opened:
+                                    self.metrics.output_stream_open_time.observe(time.monotonic()
+                                                                                 - start)
+                                wav_format = (sample_width, n_channels, frame_rate)
+                                stream_key = (sample_format, n_channels, audio_out_rate)
+                                resampler = None
+                                if self.config.player.auto_convert and frame_rate != audio_out_rate:
+                                    self.logger.debug('Converting frame rate from %d to %d',
+                                                      frame_rate, audio_out_rate)
+                                    resampler = self.dsp.resampler(sample_width, n_channels,
+                                                                   frame_rate, audio_out_rate)
+
+                            self.logger.debug('Playing WAV buffer on audio output...')
+                            written = [] if decoded is not None else None
+                            data = wav.readframes(PLAY_CHUNK_SIZE)
+                            while data:
+                                if resampler is not None:
+                                    outdata = resampler.convert(data)
+                                else:
+                                    outdata = data
+                                stream.write(outdata)
+                                if written is not None:
+                                    written.append(outdata)
+                                if received is not None:
+                                    self.metrics.play_first_sample_latency.observe(time.monotonic()
+                                                                                   - received)
+                                    received = None
+                                data = wav.readframes(PLAY_CHUNK_SIZE)
+                            played = True
+                            if written is not None:
+                                decoded.append(CachedAudio(*stream_key, b''.join(written)))
+                    except wave.Error as error:
+                        self.logger.warning('%s', str(error))
+                    except EOFError:
+                        self.logger.warning('End of WAV buffer')
+        except BaseException:
+            if stream is not None:
+                stream.close()
+            raise
+
+        if stream is not None:
+            self.output_pool.release(stream, *stream_key)
+        if played:
+            self.logger.info('Finished playing audio message with id %s'
+                             ' on device %s on site %s.',
+                             request_id,
+                             self.audio_out,
+                             self.config.site)
+        return played
+
+    def publish_play_finished(self, request_id):
+        """Publish a message that the audio service has finished playing the
+        sound.
+
+        See https://docs.snips.ai/reference/hermes#being-notified-when-sound-has-finished-playing
+        This implementation doesn't publish a session ID.
+
+        Args:
+            request_id (str): The request id of the audio message.
+        """
+        play_finished_topic = PLAY_FINISHED.format(self.config.site)
+        play_finished_message = json.dumps({'id': request_id,
+                                            'siteId': self.config.site})
+        if self.server.publish(play_finished_topic, play_finished_message):
+            self.metrics.published(play_finished_message)
+        self.logger.debug('Published message on MQTT topic:')
+        self.logger.debug('Topic: %s', play_finished_topic)
+        self.logger.debug('Message: %s', play_finished_message)
+
+    def publish_hotword_detected(self):
+        """Publish a message that the local wake word detector has detected
+        the wake word.
+
+        See https://docs.snips.ai/reference/hermes#hotword-detected
+        """
+        wakeword_id = self.config.recorder.wakeword.wakeword_id
+        hotword_detected_topic = HOTWORD_DETECTED.format(wakeword_id)
+        hotword_detected_message = json.dumps({'siteId': self.config.site,
+                                               'modelId': wakeword_id,
+                                               'modelVersion': '',
+                                               'modelType': 'personal',
+                                               'currentSensitivity': self.wakeword.sensitivity})
+        if self.server.publish(hotword_detected_topic, hotword_detected_message):
+            self.metrics.published(hotword_detected_message)
+        self.logger.debug('Published message on MQTT topic:')
+        self.logger.debug('Topic: %s', hotword_detected_topic)
+        self.logger.debug('Message: %s', hotword_detected_message)
@@ -0,0 +1,140 @@
+"""Module with the spool of MQTT messages that are published while the
+connection to the MQTT broker is down.
+
+The payloads are kept in a ring buffer of a fixed size, in memory or in a
+memory-mapped file, so an outage can't make the satellite grow without
+bound. When the spool is full, the oldest messages are dropped first, and
+messages that are older than the staleness cutoff are dropped when the
+spool is flushed, because Rhasspy has moved on by then.
+"""
+from collections import deque
+import mmap
+import os
+import time
+
+
+class MessageSpool:
+    """This class spools MQTT messages in a bounded ring buffer.
+
+    The payloads are stored back to back in the buffer. A payload that
+    doesn't fit before the end of the buffer starts at the beginning again.
+    The topics and the times the messages were spooled are kept in a queue
+    next to the buffer.
+
+    Attributes:
+        capacity (int): The size of the buffer in bytes.
+        max_age (float): The time in seconds after which a spooled message is
+            stale. 0 keeps messages until they're flushed.
+        path (str): The path of the memory-mapped file, or `None` if the
+            buffer is in memory.
+        size (int): The number of bytes of spooled payloads.
+        dropped (int): The number of messages that were dropped because the
+            spool was full or the messages were stale.
+    """
+
+    def __init__(self, capacity, max_age=0, path=None):
+        """Initialize a :class:`.MessageSpool` object.
+
+        Args:
+            capacity (int): The size of the buffer in bytes.
+            max_age (float, optional): The time in seconds after which a
+                spooled message is stale. Defaults to 0, which keeps
+                messages until they're flushed.
+            path (str, optional): The path of a file to memory-map as the
+                buffer, so the spooled audio doesn't take resident memory.
+                Defaults to `None`, which keeps the buffer in memory.
+
+        Raises:
+            :exc:`OSError`: If the file can't be created or mapped.
+        """
+        self.capacity = capacity
+        self.max_age = max_age
+        self.path = path
+        self.size = 0
+        self.dropped = 0
+        self._entries = deque()  # (offset, length, topic, spooled)
+        self._head = 0
+        if path is None:
+            self._buffer = bytearray(capacity)
+        else:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w+b') as spool_file:
+                spool_file.truncate(capacity)
+                self._buffer = mmap.mmap(spool_file.fileno(), capacity)
+
+    def __len__(self):
+        """Return the number of spooled messages."""
+        return len(self._entries)
+
+    def put(self, topic, payload):
+        """Spool a message, dropping the oldest messages if the spool is
+        full.
+
+        Args:
+            topic (str): The MQTT topic of the message.
+            payload (bytes or str): The payload of the message.
+
+        Returns:
+            bool: False if the payload is larger than the spool.
+        """
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        length = len(payload)
+        if length > self.capacity:
+            self.dropped += 1
+            return False
+        offset = self._reserve(length)
+        self._buffer[offset:offset + length] = payload
+        self._entries.append((offset, length, topic, time.monotonic()))
+        self.size += length
+        return True
+
+    def _reserve(self, length):
+        """Return the offset for a payload of a length, dropping the oldest
+        messages that occupy it."""
+        offset = self._head
+        if offset + length > self.capacity:
+            # The oldest messages are the ones between the head and the end
+            # of the buffer, they go before the ones at the beginning.
+            while self._entries and self._entries[0][0] >= offset:
+                self._drop_oldest()
+            offset = 0
+        while self._entries and self._entries[0][0] < offset + length \
+                and self._entries[0][0] + self._entries[0][1] > offset:
+            self._drop_oldest()
+        self._head = offset + length
+        return offset
+
+    def _drop_oldest(self):
+        """Drop the oldest spooled message."""
+        _, length, _, _ = self._entries.popleft()
+        self.size -= length
+        self.dropped += 1
+
+    def drain(self):
+        """Remove all spooled messages, oldest first, and drop the stale
+        ones.
+
+        Yields:
+            tuple: The topic and the payload of each message that isn't
+            stale.
+        """
+        while self._entries:
+            offset, length, topic, spooled = self._entries.popleft()
+            self.size -= length
+            if self.max_age and time.monotonic() - spooled > self.max_age:
+                self.dropped += 1
+                continue
+            yield topic, bytes(self._buffer[offset:offset + length])
+        self._head = 0
+
+    def close(self):
+        """Drop the spooled messages and release the buffer."""
+        self._entries.clear()
+        self.size = 0
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,130 @@
+"""Module with a pool of open audio output streams."""
+from threading import Lock
+import time
+
+
+class OutputStreamPool:
+    """This class keeps audio output streams open between audio messages.
+
+    Streams are keyed by sample format, channels and rate, so back-to-back
+    audio messages with the same format reuse an open stream instead of
+    opening the audio device again. Streams that haven't been used for the
+    idle timeout are closed.
+
+    Attributes:
+        idle_timeout (float): Time in seconds after which an unused stream is
+            closed. Streams are closed right after use when this is 0.
+        opened (int): The number of streams opened by the pool.
+        reused (int): The number of times an open stream was reused.
+    """
+
+    def __init__(self, audio, device_index=-1, idle_timeout=5):
+        """Initialize an :class:`.OutputStreamPool` object.
+
+        Args:
+            audio (:class:`pyaudio.PyAudio`): The PyAudio object.
+            device_index (int, optional): The index of the output device. The
+                default output device is used when negative.
+            idle_timeout (float, optional): Time in seconds after which an
+                unused stream is closed. Defaults to 5.
+        """
+        self.audio = audio
+        self.device_index = device_index
+        self.idle_timeout = idle_timeout
+        self.opened = 0
+        self.reused = 0
+        self._streams = {}
+        self._lock = Lock()
+
+    def acquire(self, sample_format, channels, rate):
+        """Get an open output stream for an audio format.
+
+        Args:
+            sample_format (int): The PortAudio sample format.
+            channels (int): The number of channels.
+            rate (int): The sample rate.
+
+        Returns:
+            :class:`pyaudio.Stream`: An output stream that is ready for
+            writing. Give it back with :meth:`release` after use.
+        """
+        key = (sample_format, channels, rate)
+        with self._lock:
+            entry = self._streams.pop(key, None)
+        if entry is not None:
+            self.reused += 1
+            return entry[0]
+
+        options = {'format': sample_format,
+                   'channels': channels,
+                   'rate': rate,
+                   'output': True}
+        if self.device_index >= 0:
+            options['output_device_index'] = self.device_index
+        stream = self.audio.open(**options)
+        self.opened += 1
+        return stream
+
+    def release(self, stream, sample_format, channels, rate):
+        """Give back an output stream after use, once its audio has played.
+
+        Closing a stream plays out its buffered audio. A stream that stays
+        open is only given back after the time of its output latency, so
+        the tail of the audio has played before the caller reports that
+        playback finished and recording resumes.
+
+        Args:
+            stream (:class:`pyaudio.Stream`): The output stream.
+            sample_format (int): The PortAudio sample format of the stream.
+            channels (int): The number of channels of the stream.
+            rate (int): The sample rate of the stream.
+        """
+        if self.idle_timeout <= 0:
+            self._close_stream(stream)
+            return
+        self.drain(stream)
+        key = (sample_format, channels, rate)
+        with self._lock:
+            previous = self._streams.get(key)
+            self._streams[key] = (stream, time.monotonic())
+        if previous is not None:
+            self._close_stream(previous[0])
+
+    def close_idle(self):
+        """Close the streams that haven't been used for the idle timeout."""
+        deadline = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [key for key, (_, last_used) in self._streams.items()
+                    if last_used <= deadline]
+            streams = [self._streams.pop(key)[0] for key in idle]
+        for stream in streams:
+            self._close_stream(stream)
+
+    def close(self):
+        """Close all open streams in the pool."""
+        with self._lock:
+            streams = [stream for stream, _ in self._streams.values()]
+            self._streams.clear()
+        for stream in streams:
+            self._close_stream(stream)
+
+    def __len__(self):
+        """Return the number of open streams in the pool."""
+        return len(self._streams)
+
+    @staticmethod
+    def drain(stream):
+        """Wait until the audio written to an output stream has played.
+
+        A blocking write returns when its audio is in the buffers of the
+        audio device, which hold at most the output latency of the stream.
+        """
+        latency = stream.get_output_latency()
+        if latency > 0:
+            time.sleep(latency)
+
+    @staticmethod
+    def _close_stream(stream):
+        """Stop and close an output stream."""
+        stream.stop_stream()
+        stream.close()
@@ -0,0 +1,222 @@
+"""Module with a synthetic stand-in for PyAudio.
+
+The stand-in has one input and one output device. The input device loops
+a generated tone, noise or the audio of a WAV file at a configurable speed.
+The output device discards the audio, but takes as long to write it as a
+real device would take to play it. Benchmarks use it to drive the satellite
+without audio hardware.
+"""
+import math
+import random
+import struct
+import threading
+import time
+import wave
+
+from rhasspy_desktop_satellite.backends import MAX_CHANNELS, AudioBackend, \
+    BackendStream, WavConverter, device_info
+
+INPUT_DEVICE = 'Synthetic input'
+OUTPUT_DEVICE = 'Synthetic output'
+SOURCE_SECONDS = 1  # duration of the generated audio that is looped
+EXHAUSTED_DELAY = 0.01  # time in seconds a read waits when the source is exhausted
+MARKER = struct.Struct('<I')
+
+TONE = 'tone'
+NOISE = 'noise'
+
+
+def tone(seconds, rate, width=2, channels=1, frequency=440):
+    """Generate a sine tone.
+
+    Args:
+        seconds (float): The duration of the tone.
+        rate (int): The sample rate.
+        width (int, optional): The sample width in bytes. Defaults to 2.
+        channels (int, optional): The number of channels. Defaults to 1.
+        frequency (float, optional): The frequency of the tone in Hz.
+            Defaults to 440.
+
+    Returns:
+        bytes: The audio frames of the tone.
+    """
+    amplitude = (1 << (8 * width - 1)) // 2
+    frames = bytearray()
+    for index in range(int(seconds * rate)):
+        value = int(amplitude * math.sin(2 * math.pi * frequency * index / rate))
+        frames += struct.pack('<i', value)[:width] * channels
+    return bytes(frames)
+
+
+def noise(seconds, rate, width=2, channels=1, seed=0):
+    """Generate white noise at a quarter of the full scale.
+
+    Args:
+        seconds (float): The duration of the noise.
+        rate (int): The sample rate.
+        width (int, optional): The sample width in bytes. Defaults to 2.
+        channels (int, optional): The number of channels. Defaults to 1.
+        seed (int, optional): The seed of the random generator, so the
+            noise is the same in every run. Defaults to 0.
+
+    Returns:
+        bytes: The audio frames of the noise.
+    """
+    generator = random.Random(seed)
+    amplitude = (1 << (8 * width - 1)) // 4
+    frames = bytearray()
+    for _ in range(int(seconds * rate) * channels):
+        frames += struct.pack('<i', generator.randint(-amplitude, amplitude))[:width]
+    return bytes(frames)
+
+
+def wav_frames(filename, rate, width=2, channels=1):
+    """Read the audio of a WAV file in another audio format.
+
+    Args:
+        filename (str): The filename of the WAV file.
+        rate (int): The sample rate.
+        width (int, optional): The sample width in bytes. Defaults to 2.
+        channels (int, optional): The number of channels. Defaults to 1.
+
+    Returns:
+        bytes: The audio frames of the WAV file, downmixed to mono and
+        copied to every channel.
+    """
+    with wave.open(filename, 'rb') as wav:
+        converter = WavConverter(wav, rate, width, channels)
+        return converter.convert(wav.readframes(wav.getnframes()))
+
+
+def source_frames(source, rate, width=2, channels=1):
+    """Return the looped audio of a source.
+
+    Args:
+        source (str): 'tone', 'noise' or the filename of a WAV file.
+        rate (int): The sample rate.
+        width (int, optional): The sample width in bytes. Defaults to 2.
+        channels (int, optional): The number of channels. Defaults to 1.
+
+    Returns:
+        bytes: The audio frames.
+    """
+    if source == TONE:
+        return tone(SOURCE_SECONDS, rate, width, channels)
+    if source == NOISE:
+        return noise(SOURCE_SECONDS, rate, width, channels)
+    return wav_frames(source, rate, width, channels)
+
+
+class SyntheticStream(BackendStream):
+    """This class represents a stream of the synthetic stand-in."""
+
+    def __init__(self, audio, *args, **kwargs):
+        """Initialize a :class:`.SyntheticStream` object."""
+        self.position = 0
+        self.source = None
+        super().__init__(audio, *args, **kwargs)
+
+    def capture(self, num_frames):
+        """Produce the next audio frames of the source."""
+        if self.source is None:
+            # The source is set up on the first capture, since a callback
+            # stream starts capturing while the base class is initialized.
+            self.source = self.audio.frames(self.rate, self.width, self.channels)
+        length = num_frames * self.frame_bytes
+        chunk = bytearray()
+        while len(chunk) < length:
+            end = min(len(self.source), self.position + length - len(chunk))
+            chunk += self.source[self.position:end]
+            self.position = end % len(self.source)
+        self.audio.mark(chunk, num_frames / self.rate)
+        return chunk
+
+    def read(self, num_frames, exception_on_overflow=True):
+        """Read audio frames from an input stream, or no audio frames once
+        the backend has produced its limit."""
+        if self.audio.exhausted:
+            time.sleep(EXHAUSTED_DELAY)
+            return b''
+        return super().read(num_frames, exception_on_overflow)
+
+    def playback(self, frames):
+        """Keep the time of the write."""
+        self.audio.write_times.append(time.monotonic())
+
+
+class SyntheticAudio(AudioBackend):
+    """This class is a stand-in for :class:`pyaudio.PyAudio` with synthetic
+    audio devices.
+
+    When markers are enabled, the first four bytes of every chunk read from
+    an input stream hold a sequence number. The time the chunk was captured
+    is kept for that number, so a receiver of the audio can measure its
+    latency.
+
+    Attributes:
+        source (str): 'tone', 'noise' or the filename of a WAV file.
+        marker (bool): Whether chunks read from input streams are marked.
+        captured (dict): The capture time of each marked chunk.
+        produced_seconds (float): The duration of the audio read from input
+            streams.
+        limit (float): The duration of the audio after which input streams
+            produce no more audio, or `None` if there's no limit.
+        write_times (list): The time of every write to an output stream.
+    """
+
+    stream_class = SyntheticStream
+
+    def __init__(self, source=TONE, speed=1.0, marker=True, limit=None):
+        """Initialize a :class:`.SyntheticAudio` object.
+
+        Args:
+            source (str, optional): 'tone', 'noise' or the filename of a WAV
+                file. Defaults to 'tone'.
+            speed (float, optional): The speed of the audio relative to real
+                time. 0 runs as fast as possible. Defaults to 1.
+            marker (bool, optional): Whether chunks read from input streams
+                are marked with a sequence number. Defaults to True.
+            limit (float, optional): The duration of the audio in seconds
+                after which input streams produce no more audio, so a
+                benchmark without real-time pacing records a known amount of
+                audio. Defaults to `None`, which produces audio forever.
+        """
+        super().__init__([device_info(0, INPUT_DEVICE, input_channels=MAX_CHANNELS),
+                          device_info(1, OUTPUT_DEVICE, output_channels=MAX_CHANNELS)],
+                         speed)
+        self.source = source
+        self.marker = marker
+        self.captured = {}
+        self.produced_seconds = 0.0
+        self.limit = limit
+        self.write_times = []
+        self._sources = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self):
+        """Whether the input streams have produced the limit of audio."""
+        return self.limit is not None and self.produced_seconds >= self.limit
+
+    def frames(self, rate, width, channels):
+        """Return the looped audio of the source in an audio format."""
+        key = (rate, width, channels)
+        if key not in self._sources:
+            self._sources[key] = source_frames(self.source, rate, width, channels)
+        return self._sources[key]
+
+    def mark(self, chunk, seconds):
+        """Mark a captured chunk with the next sequence number.
+
+        Args:
+            chunk (bytearray): The chunk.
+            seconds (float): The duration of the chunk.
+        """
+        with self._lock:
+            sequence = self._sequence
+            self._sequence += 1
+            self.produced_seconds += seconds
+            if self.marker and len(chunk) >= MARKER.size:
+                MARKER.pack_into(chunk, 0, sequence)
+                self.captured[sequence] = time.monotonic()
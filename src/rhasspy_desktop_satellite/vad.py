@@ -0,0 +1,122 @@
+"""Module with the voice activity detection of the recorder."""
+import math
+
+ANY = 'any'
+MAJORITY = 'majority'
+RATIO = 'ratio'
+VAD_POLICIES = (ANY, MAJORITY, RATIO)
+
+VAD_FRAME_TIME = 30  # duration of audio frames for webrtcvad (ms)
+VAD_SAMPLE_WIDTH = 2  # sample width of audio frames for webrtcvad
+
+
+class VoiceActivityDetector:
+    """This class detects speech in chunks of 16-bit mono audio.
+
+    Every chunk is split in 30 ms frames for webrtcvad by walking through it
+    with memoryview offsets. A partial frame at the end of a chunk is carried
+    over to the next chunk. A chunk counts as speech according to a policy:
+
+    - 'any': at least one frame is speech.
+    - 'majority': more than half of the frames are speech.
+    - 'ratio': the fraction of speech frames is at least the ratio threshold.
+
+    Frames are only classified until the decision for the chunk is known.
+
+    Attributes:
+        rate (int): The sample rate of the audio: 8000, 16000, 32000 or
+            48000.
+        policy (str): The policy that decides whether a chunk is speech.
+        threshold (float): The minimum fraction of speech frames for the
+            'ratio' policy.
+        ratio (float): The fraction of speech frames among the frames
+            classified in the last chunk.
+    """
+
+    def __init__(self, mode, rate, policy=ANY, threshold=0.5):
+        """Initialize a :class:`.VoiceActivityDetector` object.
+
+        Args:
+            mode (int): Aggressiveness mode for webrtcvad, from 0 to 3.
+            rate (int): The sample rate of the audio.
+            policy (str, optional): The policy that decides whether a chunk
+                is speech. Defaults to 'any'.
+            threshold (float, optional): The minimum fraction of speech
+                frames for the 'ratio' policy. Defaults to 0.5.
+
+        Raises:
+            :exc:`ValueError`: If the policy is unknown.
+        """
+        if policy not in VAD_POLICIES:
+            raise ValueError('Unknown VAD policy {}'.format(policy))
+        # pylint: disable=import-outside-toplevel
+        import webrtcvad
+        self.vad = webrtcvad.Vad(mode)
+        self.rate = rate
+        self.policy = policy
+        self.threshold = threshold
+        self.frame_bytes = int(rate * VAD_FRAME_TIME / 1000) * VAD_SAMPLE_WIDTH
+        self.ratio = 0.0
+        self.speech = False
+        self._remainder = bytearray()
+
+    def reset(self):
+        """Forget the audio and the decision of previous chunks."""
+        self._remainder.clear()
+        self.ratio = 0.0
+        self.speech = False
+
+    def required(self, frames):
+        """Return the number of speech frames that makes a chunk speech.
+
+        Args:
+            frames (int): The number of frames in the chunk.
+        """
+        if self.policy == MAJORITY:
+            return frames // 2 + 1
+        if self.policy == RATIO:
+            return max(1, math.ceil(self.threshold * frames))
+        return 1
+
+    def is_speech(self, chunk):
+        """Detect speech in a chunk of audio.
+
+        Args:
+            chunk (bytes-like): 16-bit mono audio.
+
+        Returns:
+            bool: Whether the chunk is speech. A chunk too short to complete
+            a frame keeps the decision of the previous chunk.
+        """
+        view = memoryview(chunk)
+        frame_bytes = self.frame_bytes
+        offset = 0
+        first = None
+        if self._remainder:
+            offset = min(frame_bytes - len(self._remainder), len(view))
+            self._remainder += view[:offset]
+            if len(self._remainder) == frame_bytes:
+                first = bytes(self._remainder)
+                self._remainder.clear()
+        end = offset + (len(view) - offset) // frame_bytes * frame_bytes
+        self._remainder += view[end:]
+
+        frames = (end - offset) // frame_bytes + (first is not None)
+        if not frames:
+            return self.speech
+
+        required = self.required(frames)
+        speech = 0
+        classified = 0
+        if first is not None:
+            speech += self.vad.is_speech(first, self.rate)
+            classified += 1
+        for position in range(offset, end, frame_bytes):
+            if speech >= required or speech + frames - classified < required:
+                break
+            speech += self.vad.is_speech(view[position:position + frame_bytes], self.rate)
+            classified += 1
+
+        self.ratio = speech / classified
+        self.speech = speech >= required
+        return self.speech
@@ -0,0 +1,158 @@
+"""Module with the local wake word detection of the recorder.
+
+A wake word detector looks for the wake word in the recorded audio of a
+site, so the audio is only streamed to the MQTT broker after a detection.
+Detectors are subclasses of :class:`.WakewordDetector`. Besides the
+reference detector that ships with the satellite, a detector can be loaded
+from its module by a name of the form 'package.module.ClassName'.
+"""
+from array import array
+from importlib import import_module
+import math
+import sys
+
+ENERGY = 'energy'
+WAKEWORD_SAMPLE_WIDTH = 2  # sample width of the audio for the detectors
+
+
+class WakewordDetector:
+    """This class is the base class of the wake word detectors.
+
+    A detector gets the recorded audio as chunks of 16-bit mono audio at the
+    sample rate of the recorder.
+
+    Attributes:
+        rate (int): The sample rate of the audio.
+        sensitivity (float): The sensitivity of the detector, published with
+            a detection.
+        dsp: The DSP backend of the site, which is set after the detector
+            is created, or `None`.
+    """
+
+    sensitivity = 1.0
+    dsp = None
+
+    def __init__(self, rate):
+        """Initialize a wake word detector.
+
+        Args:
+            rate (int): The sample rate of the audio.
+        """
+        self.rate = rate
+
+    def reset(self):
+        """Forget the audio of previous chunks."""
+
+    def process(self, chunk):
+        """Look for the wake word in a chunk of audio.
+
+        Args:
+            chunk (bytes-like): 16-bit mono audio.
+
+        Returns:
+            bool: Whether the wake word was detected.
+        """
+        raise NotImplementedError
+
+
+class EnergyDetector(WakewordDetector):
+    """This class is a reference wake word detector that detects a loud
+    sound of a minimum duration.
+
+    It doesn't recognize words, but it lets the local wake word pipeline be
+    tested offline, for instance with a recording played by the file audio
+    backend.
+
+    Attributes:
+        threshold (float): The minimum RMS level of loud audio, as a fraction
+            of the full scale.
+        duration (float): The minimum duration of loud audio in seconds.
+    """
+
+    def __init__(self, rate, threshold=0.1, duration=0.3):
+        """Initialize an :class:`.EnergyDetector` object.
+
+        Args:
+            rate (int): The sample rate of the audio.
+            threshold (float, optional): The minimum RMS level of loud audio,
+                as a fraction of the full scale. Defaults to 0.1.
+            duration (float, optional): The minimum duration of loud audio
+                in seconds. Defaults to 0.3.
+        """
+        super().__init__(rate)
+        self.threshold = threshold
+        self.duration = duration
+        self.sensitivity = threshold
+        self._loud = 0
+
+    def reset(self):
+        """Forget the loud audio of previous chunks."""
+        self._loud = 0
+
+    def process(self, chunk):
+        """Detect loud audio in a chunk of audio.
+
+        Returns:
+            bool: Whether the audio was loud for at least the minimum
+            duration, including this chunk.
+        """
+        count = len(chunk) // WAKEWORD_SAMPLE_WIDTH
+        if not count:
+            return False
+        if self.dsp is not None:
+            rms = self.dsp.rms(chunk, WAKEWORD_SAMPLE_WIDTH)
+        else:
+            rms = pcm16_rms(chunk)
+        if rms >= self.threshold * 32768:
+            self._loud += count
+        else:
+            self._loud = 0
+        if self._loud >= self.duration * self.rate:
+            self._loud = 0
+            return True
+        return False
+
+
+def pcm16_rms(chunk):
+    """Return the root mean square of 16-bit little-endian audio in pure
+    Python, for detectors without a DSP backend."""
+    samples = array('h')
+    samples.frombytes(bytes(chunk))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+DETECTORS = {ENERGY: EnergyDetector}
+
+
+def create_wakeword_detector(detector, rate, options=None, dsp=None):
+    """Create a wake word detector.
+
+    Args:
+        detector (str): The name of a detector that ships with the
+            satellite, 'energy', or the name of a detector class of the form
+            'package.module.ClassName'.
+        rate (int): The sample rate of the audio.
+        options (dict, optional): The keyword arguments of the detector.
+        dsp (optional): The DSP backend the detector can use for its audio
+            processing.
+
+    Returns:
+        :class:`.WakewordDetector`: The wake word detector.
+
+    Raises:
+        :exc:`ValueError`: If the detector is unknown.
+        :exc:`ImportError`: If the module of the detector can't be imported.
+    """
+    detector_class = DETECTORS.get(detector)
+    if detector_class is None:
+        module, _, name = (detector or '').rpartition('.')
+        if not module:
+            raise ValueError('Unknown wake word detector {}'.format(detector))
+        detector_class = getattr(import_module(module), name, None)
+        if detector_class is None:
+            raise ValueError('Unknown wake word detector {}'.format(detector))
+    wakeword_detector = detector_class(rate, **(options or {}))
+    wakeword_detector.dsp = dsp
+    return wakeword_detector
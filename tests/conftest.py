@@ -0,0 +1,6 @@
+"""Configuration of the tests of rhasspy-desktop-satellite."""
+from pathlib import Path
+import sys
+
+# The tests run against the sources, without installing the package.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
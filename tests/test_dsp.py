@@ -0,0 +1,144 @@
+"""Parity tests of the NumPy DSP backend against the audioop backend.
+
+The NumPy backend promises the same output as :mod:`audioop`, so every
+operation is compared on the same audio for both backends.
+"""
+import random
+import warnings
+
+import pytest
+
+from rhasspy_desktop_satellite.dsp import AudioopDSP, NumpyDSP
+
+pytest.importorskip('numpy')
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore', DeprecationWarning)
+    pytest.importorskip('audioop')
+
+WIDTHS = (1, 2, 3, 4)
+FRAMES = 4801  # an odd number of frames, so chunks don't line up
+
+
+@pytest.fixture(scope='module')
+def numpy_dsp():
+    """Return the NumPy backend."""
+    return NumpyDSP()
+
+
+@pytest.fixture(scope='module')
+def audioop_dsp():
+    """Return the audioop backend."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        return AudioopDSP()
+
+
+def noise(width, channels=1, frames=FRAMES, seed=0):
+    """Return random audio frames, including full scale samples."""
+    generator = random.Random(seed * 10 + width)
+    data = bytearray(generator.randbytes(frames * width * channels))
+    # The extreme samples are where rounding and clipping differ.
+    data[:width] = b'\x00' * (width - 1) + b'\x80'
+    data[width:2 * width] = b'\xff' * (width - 1) + b'\x7f'
+    return bytes(data)
+
+
+def chunked(data, sizes):
+    """Split audio data into chunks of varying sizes."""
+    chunks = []
+    offset = 0
+    index = 0
+    while offset < len(data):
+        size = sizes[index % len(sizes)]
+        chunks.append(data[offset:offset + size])
+        offset += size
+        index += 1
+    return chunks
+
+
+@pytest.mark.parametrize('width', WIDTHS)
+@pytest.mark.parametrize('channels', (1, 2))
+def test_tomono(numpy_dsp, audioop_dsp, width, channels):
+    frames = noise(width, channels)
+    assert numpy_dsp.tomono(frames, width, channels) \
+        == audioop_dsp.tomono(frames, width, channels)
+
+
+@pytest.mark.parametrize('width', WIDTHS)
+@pytest.mark.parametrize('channels', (1, 2, 3))
+def test_tochannels(numpy_dsp, audioop_dsp, width, channels):
+    frames = noise(width)
+    assert numpy_dsp.tochannels(frames, width, channels) \
+        == audioop_dsp.tochannels(frames, width, channels)
+
+
+@pytest.mark.parametrize('width', WIDTHS)
+@pytest.mark.parametrize('new_width', WIDTHS)
+def test_lin2lin(numpy_dsp, audioop_dsp, width, new_width):
+    frames = noise(width)
+    assert numpy_dsp.lin2lin(frames, width, new_width) \
+        == audioop_dsp.lin2lin(frames, width, new_width)
+
+
+@pytest.mark.parametrize('new_width', WIDTHS)
+def test_lin2lin_unsigned_8bit(numpy_dsp, audioop_dsp, new_width):
+    frames = noise(1)
+    results = [dsp.lin2lin(dsp.bias(frames, 1, 128), 1, new_width)
+               for dsp in (numpy_dsp, audioop_dsp)]
+    assert results[0] == results[1]
+
+
+@pytest.mark.parametrize('width', WIDTHS)
+@pytest.mark.parametrize('bias', (128, -128, 1000, -(1 << 20)))
+def test_bias(numpy_dsp, audioop_dsp, width, bias):
+    frames = noise(width)
+    assert numpy_dsp.bias(frames, width, bias) == audioop_dsp.bias(frames, width, bias)
+
+
+@pytest.mark.parametrize('width', WIDTHS)
+@pytest.mark.parametrize('factor', (0.0, 0.3, 0.8, 1.0, 1.7, -1.0))
+def test_gain(numpy_dsp, audioop_dsp, width, factor):
+    frames = noise(width)
+    assert numpy_dsp.gain(frames, width, factor) == audioop_dsp.gain(frames, width, factor)
+
+
+@pytest.mark.parametrize('width', WIDTHS)
+@pytest.mark.parametrize('frames', (0, 1, 160, FRAMES))
+def test_rms(numpy_dsp, audioop_dsp, width, frames):
+    audio = noise(width, frames=frames)
+    assert numpy_dsp.rms(audio, width) == audioop_dsp.rms(audio, width)
+
+
+def test_ulaw(numpy_dsp, audioop_dsp):
+    # Every 16-bit sample and every μ-law byte.
+    samples = bytes(range(256)) * 512
+    ulaw = bytes(range(256))
+    assert numpy_dsp.lin2ulaw(samples) == audioop_dsp.lin2ulaw(samples)
+    assert numpy_dsp.ulaw2lin(ulaw) == audioop_dsp.ulaw2lin(ulaw)
+
+
+@pytest.mark.parametrize('width', (1, 2, 4))
+@pytest.mark.parametrize('channels', (1, 2))
+@pytest.mark.parametrize('in_rate,out_rate', [(44100, 16000), (16000, 44100),
+                                              (22050, 16000), (48000, 16000),
+                                              (11025, 8000), (8000, 11025),
+                                              (16000, 16000), (44100, 47999)])
+def test_resampler_across_chunks(numpy_dsp, audioop_dsp, width, channels, in_rate, out_rate):
+    frame_width = width * channels
+    audio = noise(width, channels)
+    # Chunks of odd numbers of frames, including a single frame.
+    chunks = chunked(audio, [frame_width * size for size in (1, 37, 441, 1000, 3)])
+    resamplers = [dsp.resampler(width, channels, in_rate, out_rate)
+                  for dsp in (numpy_dsp, audioop_dsp)]
+    for chunk in chunks:
+        converted = [resampler.convert(chunk) for resampler in resamplers]
+        assert converted[0] == converted[1]
+
+
+def test_resampler_reset(numpy_dsp, audioop_dsp):
+    audio = noise(2)
+    resamplers = [dsp.resampler(2, 1, 44100, 16000) for dsp in (numpy_dsp, audioop_dsp)]
+    for resampler in resamplers:
+        resampler.convert(audio[:1000])
+        resampler.reset()
+    assert resamplers[0].convert(audio) == resamplers[1].convert(audio)